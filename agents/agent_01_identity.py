@@ -1,11 +1,8 @@
 import json
-from google import genai
 
-def generate_corporate_identity(client, raw_input):
-    """
-    提供されたRAWテキストに基づき、法人格をGeminiに生成させる。
-    """
-    prompt = f"""
+def build_identity_prompt(raw_input):
+    """法人格を生成するプロンプトを組み立てる。"""
+    return f"""
     あなたは企業のアイデンティティ構築の専門家です。
     以下の「法人の核となる哲学とビジョン」を総合的に分析し、この法人の核となる「法人格（パーパス、ミッション、ビジョン）」を定義してください。
 
@@ -24,6 +21,12 @@ def generate_corporate_identity(client, raw_input):
     **法人格/トーン:** [この法人が対外的に持つべき個性、ブランドイメージ、コミュニケーションのトーンを定義]
     """
 
+def generate_corporate_identity(client, raw_input):
+    """
+    提供されたRAWテキストに基づき、法人格をGeminiに生成させる。
+    """
+    prompt = build_identity_prompt(raw_input)
+
     print("Geminiモデルで哲学テキストを分析し、法人格を形成しています...")
     try:
         response = client.models.generate_content(
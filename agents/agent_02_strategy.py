@@ -1,17 +1,35 @@
 import re
 import json
-from google import genai
-from google.genai import types
+from utils.json_stream import iter_completed_array_items
+from utils.json_repair import repair_json, split_complete, missing_fields
+
+# --- ターゲットページリストの応答スキーマ ---
+# スキーマで形を固定し、それでも壊れた応答（途中で切れた配列・余分なカンマ）はローカルで修復する。
+# 欠けたエントリや途中で切れた残りのページだけを、もう1回の呼び出しで補う。
+TARGET_PAGE_FIELDS = ("title", "file_name", "purpose")
+_TARGET_PAGE_ITEM_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {field: {"type": "STRING"} for field in TARGET_PAGE_FIELDS},
+    "required": list(TARGET_PAGE_FIELDS),
+}
+TARGET_PAGE_LIST_SCHEMA = {"type": "ARRAY", "items": _TARGET_PAGE_ITEM_SCHEMA}
+TARGET_PAGE_STREAM_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "nav": {"type": "ARRAY", "items": {
+            "type": "OBJECT",
+            "properties": {"title": {"type": "STRING"}, "file_name": {"type": "STRING"}},
+            "required": ["title", "file_name"],
+        }},
+        "pages": TARGET_PAGE_LIST_SCHEMA,
+    },
+    "required": ["nav", "pages"],
+}
 # from IPython.display import display, Markdown # .pyファイルからは削除
 
-def generate_final_sitemap(client, identity):
-    """
-    法人格に基づき、Webサイトの階層的なサイトマップを生成させる。
-    """
-    if client is None:
-        return "❌ Geminiクライアントが初期化されていません。"
-
-    prompt = f"""
+def build_sitemap_prompt(identity):
+    """サイトマップ生成用のプロンプトを組み立てる。"""
+    return f"""
     あなたはウェブサイトのUXアーキテクトです。
     以下の「法人のアイデンティティ」に基づき、ユーザーの論理的思考を助ける**階層的なサイトマップ**をMarkdown形式で生成してください。
 
@@ -25,6 +43,15 @@ def generate_final_sitemap(client, identity):
     {identity}
     """
 
+def generate_final_sitemap(client, identity):
+    """
+    法人格に基づき、Webサイトの階層的なサイトマップを生成させる。
+    """
+    if client is None:
+        return "❌ Geminiクライアントが初期化されていません。"
+
+    prompt = build_sitemap_prompt(identity)
+
     print("Geminiモデルで最終サイトマップの階層構造を生成しています...")
     try:
         response = client.models.generate_content(
@@ -35,14 +62,9 @@ def generate_final_sitemap(client, identity):
     except Exception as e:
         return f"❌ サイトマップの生成中にエラーが発生しました: {e}"
 
-def generate_content_strategy(client, identity, sitemap):
-    """
-    法人格とサイトマップに基づき、トップページと主要ページのコンテンツ戦略の骨子を生成させる。
-    """
-    if client is None:
-        return "❌ Geminiクライアントが初期化されていません。"
-
-    prompt = f"""
+def build_strategy_prompt(identity, sitemap):
+    """コンテンツ戦略生成用のプロンプトを組み立てる。"""
+    return f"""
     あなたはデータサイエンス企業のコンテンツストラテジストです。
     以下の「法人のアイデンティティ」と「サイトマップ」に基づき、トップページと主要ページのコンテンツ戦略（骨子）を策定してください。
 
@@ -74,6 +96,15 @@ def generate_content_strategy(client, identity, sitemap):
     - 「導入事例」で強調すべき成功のポイント:
     """
 
+def generate_content_strategy(client, identity, sitemap):
+    """
+    法人格とサイトマップに基づき、トップページと主要ページのコンテンツ戦略の骨子を生成させる。
+    """
+    if client is None:
+        return "❌ Geminiクライアントが初期化されていません。"
+
+    prompt = build_strategy_prompt(identity, sitemap)
+
     print("Geminiモデルでコンテンツ戦略を策定しています...")
     try:
         response = client.models.generate_content(
@@ -84,12 +115,9 @@ def generate_content_strategy(client, identity, sitemap):
     except Exception as e:
         return f"❌ コンテンツ戦略の生成中にエラーが発生しました: {e}"
 
-def generate_target_page_list(client, identity, strategy):
-    """
-    法人格と戦略に基づき、ナビゲーションに必要な全ページのリストをJSON形式で生成する。
-    (サブディレクトリ構造を反映するバージョン)
-    """
-    prompt_extract = f"""
+def build_target_page_list_prompt(identity, strategy):
+    """ターゲットページリスト生成用のプロンプトを組み立てる。"""
+    return f"""
     あなたは、Webサイトのアーキテクトです。以下の「法人格」と「コンテンツ戦略」に基づき、サイトのグローバルナビゲーションを構成する**全ての固定ページ（全10ページ程度）**のリストを、以下のJSONリスト形式で生成してください。
 
     ### 重要なルール
@@ -112,18 +140,114 @@ def generate_target_page_list(client, identity, strategy):
     {strategy}
     """
 
+def build_target_page_followup_prompt(identity, strategy, received, incomplete):
+    """前回の応答で欠けたエントリと、途中で切れて届かなかった残りのページだけを再要求するプロンプト。"""
+    received_names = [p['file_name'] for p in received]
+    incomplete_names = [p['file_name'] for p in incomplete if isinstance(p, dict) and p.get('file_name')]
+    return build_target_page_list_prompt(identity, strategy) + f"""
+    ### 追加の依頼（前回の出力の補完）
+    前回の出力は途中で切れたか、一部のエントリに欠けたフィールドがありました。
+    - 取得済みのページ（**再出力しないでください**）: {json.dumps(received_names, ensure_ascii=False)}
+    - フィールドが欠けていたページ（title / file_name / purpose を全て埋めて再出力してください）: {json.dumps(incomplete_names, ensure_ascii=False)}
+    上記の不完全なページと、まだ出力していない残りのページだけを、同じJSONリスト形式で出力してください。残りが無ければ [] を返してください。
+    """
+
+
+def _request_target_pages(client, prompt):
+    """ターゲットページリストを1回呼び出し、(完全なエントリ, 欠けのあるエントリ, 途中で切れたか) を返す。"""
+    from google.genai import types
+    response = client.models.generate_content(
+        model="gemini-2.5-flash",
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=TARGET_PAGE_LIST_SCHEMA
+        )
+    )
+    parsed, truncated = repair_json(response.text)
+    if not isinstance(parsed, list):
+        raise ValueError("JSONリストではありません。")
+    complete, incomplete = split_complete(parsed, TARGET_PAGE_FIELDS)
+    return complete, incomplete, truncated
+
+
+def generate_target_page_list(client, identity, strategy):
+    """
+    法人格と戦略に基づき、ナビゲーションに必要な全ページのリストをJSON形式で生成する。
+    (サブディレクトリ構造を反映するバージョン)
+    応答が途中で切れていたり、フィールドが欠けたエントリがあれば、その分だけを1回だけ再要求して補う。
+    """
+    prompt_extract = build_target_page_list_prompt(identity, strategy)
+
     print("\n📢 AIが戦略に基づき、ターゲットページリストを動的生成中...")
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt_extract,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
-            )
-        )
-        target_list = json.loads(response.text.strip())
-        print(f"✅ ターゲットリストの抽出と構造化に成功しました ({len(target_list)} 件)。")
-        return target_list
+        target_list, incomplete, truncated = _request_target_pages(client, prompt_extract)
     except Exception as e:
         print(f"❌ ターゲットリストの動的抽出に失敗しました: {e}")
         return []
+
+    if truncated or incomplete:
+        print(f"  > 🩹 応答を修復しました (途中で切れた: {'あり' if truncated else 'なし'} / 欠けのあるエントリ: {len(incomplete)} 件)。不足分だけを再要求します...")
+        try:
+            extra, still_incomplete, _ = _request_target_pages(
+                client, build_target_page_followup_prompt(identity, strategy, target_list, incomplete))
+            known = {p['file_name'] for p in target_list}
+            added = []
+            for page in extra:
+                if page['file_name'] not in known:
+                    known.add(page['file_name'])
+                    added.append(page)
+            target_list += added
+            # 補完されたエントリ（file_name かタイトルが一致するもの）は除外の警告から外す
+            titles = {p['title'] for p in target_list}
+            incomplete = [p for p in incomplete + still_incomplete
+                          if not (isinstance(p, dict) and (p.get('file_name') in known or p.get('title') in titles))]
+            print(f"  > ✅ {len(added)} 件を補完しました。")
+        except Exception as e:
+            print(f"⚠️ 不足分の再要求に失敗しました。取得済みの {len(target_list)} 件で続行します: {e}")
+        for page in incomplete:
+            print(f"⚠️ 欠けたフィールド {missing_fields(page, TARGET_PAGE_FIELDS)} のあるエントリを除外しました: {page}")
+
+    if not target_list:
+        print("❌ ターゲットリストの動的抽出に失敗しました: 有効なエントリがありません。")
+        return []
+    print(f"✅ ターゲットリストの抽出と構造化に成功しました ({len(target_list)} 件)。")
+    return target_list
+
+
+def generate_target_page_list_stream(client, identity, strategy):
+    """
+    ターゲットページリストをストリーミングで生成し、要素が確定した順に yield する。
+    - ('nav', [...])  : ナビゲーション構造（title / file_name のみ）。最初に一度だけ届く。
+    - ('page', {...}) : purpose を含む各ページのエントリ。完成した時点で1件ずつ届く。
+    ナビゲーションを先に確定させることで、呼び出し側は残りの計画を待たずにページ生成を開始できる。
+    """
+    from google.genai import types
+    prompt_stream = build_target_page_list_prompt(identity, strategy) + """
+    ### 出力順序（ストリーミング用）
+    最初に "nav" 配列（title と file_name のみ）で全ページを列挙し、その後に "pages" 配列で各ページの完全なエントリを出力してください。
+    {"nav": [{"title": "...", "file_name": "..."}, ...], "pages": [{"title": "...", "file_name": "...", "purpose": "..."}, ...]}
+    """
+
+    print("\n📢 AIが戦略に基づき、ターゲットページリストをストリーミング生成中...")
+    stream = client.models.generate_content_stream(
+        model="gemini-2.5-flash",
+        contents=prompt_stream,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=TARGET_PAGE_STREAM_SCHEMA
+        )
+    )
+    nav_items = []
+    nav_sent = False
+    page_count = 0
+    for key, item in iter_completed_array_items(chunk.text for chunk in stream):
+        if key == 'nav':
+            nav_items.append(item)
+            continue
+        if not nav_sent and nav_items:
+            nav_sent = True
+            yield 'nav', nav_items
+        page_count += 1
+        yield 'page', item
+    print(f"✅ ターゲットリストのストリーミング生成が完了しました ({page_count} 件)。")
@@ -1,28 +1,26 @@
 import re
 import os
 import json
-from google import genai
-from google.genai import types
+from concurrent.futures import ThreadPoolExecutor
+from utils.model_router import generate_routed, classify_page, is_json_list
+from utils.json_repair import repair_json
 
-# ⬇️ [修正] GTM_ID と ADSENSE_CLIENT_ID を受け取る
-def generate_single_page_html(client, target_page, identity, strategy_full, page_list, GTM_ID=None, ADSENSE_CLIENT_ID=None, retry_attempts=3):
-    """
-    ターゲットページ情報に基づいてプロンプトを動的に生成し、HTMLファイルを出力する。
-    GTMとAdSenseのスニペットを自動で挿入する。
-    """
-    if client is None:
-        return "❌ Geminiクライアントが利用できません。"
-
-    nav_structure = "\n".join([f' - {p.get("title", "N/A")} ({p.get("file_name", "N/A")})' for p in page_list])
+def announce_tag_instructions(GTM_ID=None, ADSENSE_CLIENT_ID=None):
+    """GTM / AdSense タグを挿入するかどうかを表示する（プロンプトの組み立てとは分け、生成時とドライランの開始時に呼ぶ）。"""
+    if GTM_ID:
+        print(f"  > GTM ID ({GTM_ID}) をHTMLに挿入します。")
+    else:
+        print(f"  > GTM ID が指定されていないため、GTMタグは挿入しません。")
+    if ADSENSE_CLIENT_ID:
+        print(f"  > AdSense Client ID ({ADSENSE_CLIENT_ID}) をHTMLに挿入します。")
+    else:
+        print(f"  > AdSense ID が指定されていないため、AdSenseタグは挿入しません。")
 
-    target_title = target_page['title']
-    target_filename = target_page['file_name']
-    target_purpose = target_page['purpose']
-    
+def _build_tag_instructions(GTM_ID=None, ADSENSE_CLIENT_ID=None):
+    """GTM / AdSense スニペットの挿入指示をプロンプト用に組み立てる（表示は announce_tag_instructions で行う）。"""
     # --- GTMスニペットの挿入指示 ---
     gtm_instructions = ""
     if GTM_ID:
-        print(f"  > GTM ID ({GTM_ID}) をHTMLに挿入します。")
         gtm_instructions = f"""
     5.  **GTM (Google Tag Manager) の挿入:**
         - <head> タグのできるだけ高い位置に以下のコードを挿入してください:
@@ -35,36 +33,44 @@ def generate_single_page_html(client, target_page, identity, strategy_full, page
         <noscript><iframe src="https://www.googletagmanager.com/ns.html?id={GTM_ID}"
         height="0" width="0" style="display:none;visibility:hidden"></iframe></noscript>
         """
-    else:
-         print(f"  > GTM ID が指定されていないため、GTMタグは挿入しません。")
-         
+
     # --- ⬇️ [追加] AdSenseスニペットの挿入指示 ---
     adsense_instructions = ""
     if ADSENSE_CLIENT_ID:
-        print(f"  > AdSense Client ID ({ADSENSE_CLIENT_ID}) をHTMLに挿入します。")
         adsense_instructions = f"""
     6.  **Google AdSense の挿入:**
         - <head> タグ内に以下のコードを挿入してください:
         <script async src="https://pagead2.googlesyndication.com/pagead/js/adsbygoogle.js?client={ADSENSE_CLIENT_ID}"
              crossorigin="anonymous"></script>
         """
-    else:
-        print(f"  > AdSense ID が指定されていないため、AdSenseタグは挿入しません。")
     # --- ⬆️ [追加] ここまで ---
 
-    if target_filename == 'index.html' or 'index.html' in target_filename:
-        content_instruction = f"このページはハブページ（目次）です。目的（{target_purpose}）を達成するため、**深い論理構成と具体的な記述**に焦点を当ててください。"
-    else:
-        content_instruction = f"このページは詳細記事です。目的（{target_purpose}）を達成するため、**深い論理構成と具体的なデータサイエンスの記述**に焦点を当ててください。"
-    
-    content_focus = f"**このページの具体的な目的と、必要なコンテンツの詳細:** {target_purpose}\n"
-    if strategy_full:
-        content_focus += f"\n--- 全体戦略の要約 ---\n{strategy_full}"
+    return gtm_instructions, adsense_instructions
 
+def extract_html_code(raw_output, closing_tag="</html>"):
+    """
+    モデル出力から ```html ... ```eof の間のコードを取り出す。
+    終了マーカーが無い（途中で切れた）場合は None を返す。
+    """
+    raw_output = (raw_output or "").strip()
+    if raw_output.endswith(f"{closing_tag}\n```eof"):
+        match = re.search(r"```html\s*(.*?)\s*```eof", raw_output, re.DOTALL)
+        if match:
+            return match.group(1).strip()
+    return None
 
-    prompt_template = f"""
+def build_page_prompt_prefix(identity, strategy_full, page_list, GTM_ID=None, ADSENSE_CLIENT_ID=None):
+    """
+    ページHTML生成プロンプトのうち、実行中の全ページで共通の部分（指示・法人格・全体戦略・ナビゲーション）。
+    この部分はコンテキストキャッシュに登録され、ページごとには送り直さない。
+    """
+    nav_structure = "\n".join([f' - {p.get("title", "N/A")} ({p.get("file_name", "N/A")})' for p in page_list])
+    gtm_instructions, adsense_instructions = _build_tag_instructions(GTM_ID, ADSENSE_CLIENT_ID)
+    strategy_summary = f"\n--- 全体戦略の要約 ---\n{strategy_full}" if strategy_full else "（なし）"
+
+    return f"""
     あなたはワールドクラスのウェブデザイナーであり、フロントエンドエンジニアです。
-    以下の「法人格/トーン」と「コンテンツ戦略」に基づき、**{target_title} ({target_filename}) 用の単一のモダンでレスポンシブなHTMLファイル**を生成してください。
+    以下の「法人格/トーン」と「コンテンツ戦略」に基づき、末尾の「ページ固有の入力データ」で指定されたページ用の**単一のモダンでレスポンシブなHTMLファイル**を生成してください。
 
     ### CRITICAL INSTRUCTION: 出力形式の厳守
     - **[START HTML CODE]** というマーカーからコードの記述を開始してください。
@@ -74,37 +80,72 @@ def generate_single_page_html(client, target_page, identity, strategy_full, page
     ### 必須要件 (CRITICAL REQUIREMENTS)
     1.  **デザインフレームの維持:** デザイン（配色、フォント、Tailwind CSS）を完全に維持してください。
     2.  **ナビゲーションの統合:** ヘッダーとフッターのリンクには、**ファイル名（例: vision/index.html）を正確に**使用してください。
-    3.  **コンテンツの役割:** {content_instruction}
+    3.  **コンテンツの役割:** 「ページ固有の入力データ」の「コンテンツの役割」に従ってください。
     4.  **Tailwind CSS:** CDNをロードし、全てのスタイリングにTailwindクラスを使用してください。
     {gtm_instructions}
     {adsense_instructions} 
 
+    ### 全体的な入力データ
+    - 法人格フレームワーク: {identity}
+    - コンテンツ戦略（全体戦略）：{strategy_summary}
+    - 確定した全ページリスト（ナビゲーション構造）:{nav_structure}
+    """
+
+def build_page_prompt_suffix(target_page):
+    """ページHTML生成プロンプトのうち、ページごとに異なる部分。"""
+    target_title = target_page['title']
+    target_filename = target_page['file_name']
+    target_purpose = target_page['purpose']
+
+    if target_filename == 'index.html' or 'index.html' in target_filename:
+        content_instruction = f"このページはハブページ（目次）です。目的（{target_purpose}）を達成するため、**深い論理構成と具体的な記述**に焦点を当ててください。"
+    else:
+        content_instruction = f"このページは詳細記事です。目的（{target_purpose}）を達成するため、**深い論理構成と具体的なデータサイエンスの記述**に焦点を当ててください。"
+
+    return f"""
     ### ページ固有の入力データ
     - ページのタイトル: {target_title}
     - ページのファイル名: {target_filename}
     - ページの目的: {target_purpose}
+    - コンテンツの役割: {content_instruction}
 
-    ### 全体的な入力データ
-    - 法人格フレームワーク: {identity}
-    - コンテンツ戦略（コンテンツ焦点）：{content_focus}
-    - 確定した全ページリスト（ナビゲーション構造）:{nav_structure}
-
+    {target_title} ({target_filename}) のHTMLを生成してください。
     [START HTML CODE]
     """
 
+def build_page_prompt(target_page, identity, strategy_full, page_list, GTM_ID=None, ADSENSE_CLIENT_ID=None):
+    """1ページ分のHTMLを一括生成するプロンプト全体（バッチ投入とドライランで使用）。"""
+    return (build_page_prompt_prefix(identity, strategy_full, page_list, GTM_ID, ADSENSE_CLIENT_ID)
+            + build_page_prompt_suffix(target_page))
+
+# ⬇️ [修正] GTM_ID と ADSENSE_CLIENT_ID を受け取る
+def generate_single_page_html(client, target_page, identity, strategy_full, page_list, GTM_ID=None, ADSENSE_CLIENT_ID=None, retry_attempts=3):
+    """
+    ターゲットページ情報に基づいてプロンプトを動的に生成し、HTMLファイルを出力する。
+    GTMとAdSenseのスニペットを自動で挿入する。
+    """
+    if client is None:
+        return "❌ Geminiクライアントが利用できません。"
+
+    target_filename = target_page['file_name']
+    announce_tag_instructions(GTM_ID, ADSENSE_CLIENT_ID)
+    # 共通部分はコンテキストキャッシュから参照し、ページ固有の部分だけを送る
+    prompt_prefix = build_page_prompt_prefix(identity, strategy_full, page_list, GTM_ID, ADSENSE_CLIENT_ID)
+    prompt_suffix = build_page_prompt_suffix(target_page)
+
     for attempt in range(retry_attempts):
         print(f"  > HTMLコードの生成を開始中... (試行 {attempt + 1}/{retry_attempts}) for {target_filename}")
         try:
-            response = client.models.generate_content(
-                model="gemini-2.5-pro",
-                contents=prompt_template
+            # 締め切り付きで呼び出し、遅い場合はヘッジし、最初に完全なHTMLを返した応答を採用する
+            response = generate_routed(
+                client, "page_html", prompt_suffix,
+                page_class=classify_page(target_filename),
+                validate=extract_html_code,
+                cached_prefix=prompt_prefix
             )
-            raw_output = response.text.strip()
-
-            if raw_output.endswith("</html>\n```eof"):
-                match = re.search(r"```html\s*(.*?)\s*```eof", raw_output, re.DOTALL)
-                if match:
-                    return match.group(1).strip()
+            html_code = extract_html_code(response.text)
+            if html_code:
+                return html_code
 
             print(f"警告: コードが途中で切れたか、終了マーカーが見つかりませんでした。 for {target_filename}")
 
@@ -112,3 +153,285 @@ def generate_single_page_html(client, target_page, identity, strategy_full, page
             print(f"エラーが発生しました: {e} for {target_filename}")
 
     return "❌ HTMLコードの生成に失敗しました。"
+
+
+# --- 章（セクション）並列生成モード ---
+MAIN_CONTENT_PLACEHOLDER = "<!-- MAIN_CONTENT -->"
+
+
+def build_outline_prompt(target_page, identity, strategy_full, section_count=5):
+    """章立て生成用のプロンプトを組み立てる。"""
+    return f"""
+    あなたはデータサイエンス企業のシニア編集者です。
+    以下の記事の目的を達成するための**章立て（{section_count}章前後）**を設計してください。
+
+    ### 記事
+    - タイトル: {target_page['title']}
+    - ファイル名: {target_page['file_name']}
+    - 目的: {target_page['purpose']}
+
+    ### 法人格
+    {identity}
+
+    ### 全体戦略（参考）
+    {strategy_full or '（なし）'}
+    ---
+    回答は以下のJSON配列形式のみで出力してください。
+    [
+      {{"heading": "章の見出し", "summary": "この章で扱う論点とデータサイエンスの具体的な記述内容"}},
+      ...
+    ]
+    """
+
+
+def generate_page_outline(client, target_page, identity, strategy_full, section_count=5):
+    """詳細記事の章立て（見出しと各章で扱う内容）をJSONで生成する。失敗時は空リスト。"""
+    prompt = build_outline_prompt(target_page, identity, strategy_full, section_count)
+    try:
+        response = generate_routed(
+            client, "page_outline", prompt,
+            validate=is_json_list,
+            response_mime_type="application/json"
+        )
+        outline, _ = repair_json(response.text)
+        return [s for s in outline if isinstance(s, dict) and s.get('heading')]
+    except Exception as e:
+        print(f"❌ 章立ての生成に失敗しました: {e} for {target_page['file_name']}")
+        return []
+
+
+def build_shell_prompt_prefix(identity, strategy_full, nav_structure, gtm_instructions, adsense_instructions):
+    """
+    外枠（head/header/footer）生成プロンプトのうち、実行中の全記事で共通の部分（指示・法人格・全体戦略・ナビゲーション）。
+    この部分はコンテキストキャッシュに登録され、記事ごとには送り直さない。
+    """
+    strategy_summary = f"\n--- 全体戦略の要約 ---\n{strategy_full}" if strategy_full else "（なし）"
+    return f"""
+    あなたはワールドクラスのウェブデザイナーであり、フロントエンドエンジニアです。
+    末尾の「対象ページ」で指定されたページ用の**単一のモダンでレスポンシブなHTMLファイルの「外枠」**を生成してください。
+    本文は別途生成して差し込むため、`<main>` 要素の中身は **`{MAIN_CONTENT_PLACEHOLDER}` の1行のみ** にしてください。
+
+    ### CRITICAL INSTRUCTION: 出力形式の厳守
+    - **必ず** `<!DOCTYPE html>` から `</html>` まで、全てのHTML構造を完全に記述してください。
+    - **必ず** `\n```eof` で出力を完全に終了してください。（コードブロックは```htmlで開始してください）
+
+    ### 必須要件 (CRITICAL REQUIREMENTS)
+    1.  **デザインフレームの維持:** デザイン（配色、フォント、Tailwind CSS）を完全に維持してください。
+    2.  **ナビゲーションの統合:** ヘッダーとフッターのリンクには、**ファイル名（例: vision/index.html）を正確に**使用してください。
+    3.  **<title> と meta description:** 「対象ページ」のタイトルと目的を反映してください。
+    4.  **Tailwind CSS:** CDNをロードし、全てのスタイリングにTailwindクラスを使用してください。
+    {gtm_instructions}
+    {adsense_instructions}
+
+    ### 入力データ
+    - 法人格フレームワーク: {identity}
+    - コンテンツ戦略（全体戦略）：{strategy_summary}
+    - 確定した全ページリスト（ナビゲーション構造）:{nav_structure}
+    """
+
+
+def build_shell_prompt_suffix(target_page):
+    """外枠生成プロンプトのうち、記事ごとに異なる部分。"""
+    return f"""
+    ### 対象ページ
+    - ページのタイトル: {target_page['title']}
+    - ページのファイル名: {target_page['file_name']}
+    - ページの目的: {target_page['purpose']}
+
+    {target_page['title']} ({target_page['file_name']}) の外枠HTMLを生成してください。
+    [START HTML CODE]
+    """
+
+
+def build_shell_prompt(target_page, identity, nav_structure, gtm_instructions, adsense_instructions, strategy_full=None):
+    """ページの外枠（head/header/footer）生成用のプロンプト全体（ドライランで使用）。"""
+    return (build_shell_prompt_prefix(identity, strategy_full, nav_structure, gtm_instructions, adsense_instructions)
+            + build_shell_prompt_suffix(target_page))
+
+
+def _generate_page_shell_html(client, target_page, identity, strategy_full, nav_structure, gtm_instructions, adsense_instructions, retry_attempts):
+    """<main> の中身だけをプレースホルダーにした、ページの外枠（head/header/footer）を生成する。"""
+    prompt_prefix = build_shell_prompt_prefix(identity, strategy_full, nav_structure, gtm_instructions, adsense_instructions)
+    prompt_suffix = build_shell_prompt_suffix(target_page)
+    for attempt in range(retry_attempts):
+        try:
+            response = generate_routed(
+                client, "page_shell", prompt_suffix,
+                validate=lambda text: MAIN_CONTENT_PLACEHOLDER in (extract_html_code(text) or ""),
+                cached_prefix=prompt_prefix
+            )
+            html_code = extract_html_code(response.text)
+            if html_code and MAIN_CONTENT_PLACEHOLDER in html_code:
+                return html_code
+            print(f"警告: 外枠HTMLが不完全です (試行 {attempt + 1}/{retry_attempts}) for {target_page['file_name']}")
+        except Exception as e:
+            print(f"エラーが発生しました: {e} for {target_page['file_name']} (外枠)")
+    return None
+
+
+def build_section_prompt_prefix(identity, strategy_full):
+    """章の生成プロンプトのうち、実行中の全記事・全章で共通の部分（指示・法人格・全体戦略）。"""
+    return f"""
+    あなたはデータサイエンス企業のテクニカルライター兼フロントエンドエンジニアです。
+    末尾で指定された記事の**指定された1章だけ**を、Tailwind CSS でスタイリングした1つの `<section>` 要素として記述してください。
+
+    ### CRITICAL INSTRUCTION: 出力形式の厳守
+    - `<section>` から `</section>` までのHTML断片のみを出力してください（<html>, <head>, <body>, <main> は不要）。
+    - 章の見出しは `<h2>` を1つだけ使い、小見出しには `<h3>` を使ってください。
+    - **必ず** `\n```eof` で出力を完全に終了してください。（コードブロックは```htmlで開始してください）
+
+    ### 法人格/トーン
+    {identity}
+
+    ### 全体戦略（参考）
+    {strategy_full or '（なし）'}
+    """
+
+
+def build_section_prompt_suffix(target_page, outline, index):
+    """章の生成プロンプトのうち、記事・章ごとに異なる部分。"""
+    section = outline[index]
+    outline_text = "\n".join([f" {i + 1}. {s['heading']}" for i, s in enumerate(outline)])
+    return f"""
+    ### 対象の記事と章
+    記事「{target_page['title']}」の第{index + 1}章を記述してください。
+
+    ### 記事全体の目的
+    {target_page['purpose']}
+
+    ### 記事全体の章立て（他の章と内容が重複しないこと）
+    {outline_text}
+
+    ### この章の見出しと内容
+    - 見出し: {section['heading']}
+    - 内容: {section.get('summary', '')}
+    """
+
+
+def build_section_prompt(target_page, outline, index, identity, strategy_full=None):
+    """章立ての index 番目の章を生成するプロンプト全体（ドライランで使用）。"""
+    return build_section_prompt_prefix(identity, strategy_full) + build_section_prompt_suffix(target_page, outline, index)
+
+
+def _generate_section_html(client, target_page, outline, index, identity, strategy_full, retry_attempts):
+    """章立ての index 番目の章を <section> 要素として生成する。"""
+    prompt_prefix = build_section_prompt_prefix(identity, strategy_full)
+    prompt_suffix = build_section_prompt_suffix(target_page, outline, index)
+    for attempt in range(retry_attempts):
+        try:
+            response = generate_routed(
+                client, "page_section", prompt_suffix,
+                validate=lambda text: extract_html_code(text, closing_tag="</section>"),
+                cached_prefix=prompt_prefix
+            )
+            html_code = extract_html_code(response.text, closing_tag="</section>")
+            if html_code:
+                return html_code
+            print(f"警告: 第{index + 1}章が途中で切れました (試行 {attempt + 1}/{retry_attempts}) for {target_page['file_name']}")
+        except Exception as e:
+            print(f"エラーが発生しました: {e} for {target_page['file_name']} (第{index + 1}章)")
+    return None
+
+
+def harmonize_section_headings(client, target_page, sections_html):
+    """
+    章ごとに独立して生成した本文の、見出しと章間のつなぎの文だけを整える（本文は変更しない）。
+    失敗した場合は元の本文をそのまま返す。
+    """
+    from google.genai import types
+    from bs4 import BeautifulSoup
+    soups = [BeautifulSoup(html, 'html.parser') for html in sections_html]
+    digest = []
+    for i, soup in enumerate(soups):
+        h2 = soup.find('h2')
+        paragraphs = soup.find_all('p')
+        digest.append({
+            "index": i,
+            "heading": h2.get_text().strip() if h2 else "",
+            "opening": paragraphs[0].get_text().strip()[:120] if paragraphs else "",
+            "closing": paragraphs[-1].get_text().strip()[-120:] if paragraphs else "",
+        })
+
+    prompt = f"""
+    あなたは編集者です。記事「{target_page['title']}」は章ごとに別々に執筆されました。
+    以下の各章の見出しと冒頭・末尾を読み、**見出しの表現の統一**と、**次の章へ自然につなぐ1文（最終章は不要）**だけを提案してください。
+    本文の内容には触れないでください。
+
+    ### 各章の要約
+    {json.dumps(digest, ensure_ascii=False, indent=2)}
+    ---
+    回答は以下のJSON配列形式のみで出力してください。
+    [
+      {{"index": 0, "heading": "統一後の見出し", "transition": "次の章へのつなぎの1文（不要なら空文字）"}},
+      ...
+    ]
+    """
+    try:
+        response = client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=prompt,
+            config=types.GenerateContentConfig(response_mime_type="application/json")
+        )
+        edits = json.loads(response.text.strip().replace("```json", "").replace("```", ""))
+    except Exception as e:
+        print(f"⚠️ 見出し・つなぎの調整をスキップしました: {e}")
+        return sections_html
+
+    for edit in edits:
+        i = edit.get('index')
+        if not isinstance(i, int) or not 0 <= i < len(soups):
+            continue
+        h2 = soups[i].find('h2')
+        if h2 and edit.get('heading'):
+            h2.string = edit['heading']
+        section_tag = soups[i].find('section')
+        if section_tag and edit.get('transition') and i < len(soups) - 1:
+            transition = soups[i].new_tag('p', attrs={'class': 'mt-6 text-text-muted italic'})
+            transition.string = edit['transition']
+            section_tag.append(transition)
+    return [str(soup) for soup in soups]
+
+
+def generate_single_page_html_chunked(client, target_page, identity, strategy_full, page_list, GTM_ID=None, ADSENSE_CLIENT_ID=None, retry_attempts=3, max_workers=6):
+    """
+    長い詳細記事を「章立て → 各章と外枠を並列生成 → 見出し・つなぎの調整 → <main> に結合」の順で生成する。
+    ページ単位の待ち時間は、記事全体ではなく最も長い章の生成時間で頭打ちになる。
+    章立てや外枠の生成に失敗した場合は、通常の一括生成にフォールバックする。
+    """
+    if client is None:
+        return "❌ Geminiクライアントが利用できません。"
+
+    def fallback(reason):
+        print(f"⚠️ {reason}。一括生成モードにフォールバックします。 for {target_page['file_name']}")
+        return generate_single_page_html(client, target_page, identity, strategy_full, page_list,
+                                         GTM_ID=GTM_ID, ADSENSE_CLIENT_ID=ADSENSE_CLIENT_ID, retry_attempts=retry_attempts)
+
+    outline = generate_page_outline(client, target_page, identity, strategy_full)
+    if not outline:
+        return fallback("章立てを取得できませんでした")
+    print(f"  > 章立て {len(outline)} 章を並列生成します。 for {target_page['file_name']}")
+
+    nav_structure = "\n".join([f' - {p.get("title", "N/A")} ({p.get("file_name", "N/A")})' for p in page_list])
+    announce_tag_instructions(GTM_ID, ADSENSE_CLIENT_ID)
+    gtm_instructions, adsense_instructions = _build_tag_instructions(GTM_ID, ADSENSE_CLIENT_ID)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        shell_future = executor.submit(
+            _generate_page_shell_html, client, target_page, identity, strategy_full, nav_structure,
+            gtm_instructions, adsense_instructions, retry_attempts
+        )
+        section_futures = [
+            executor.submit(_generate_section_html, client, target_page, outline, i, identity, strategy_full, retry_attempts)
+            for i in range(len(outline))
+        ]
+        shell_html = shell_future.result()
+        sections_html = [f.result() for f in section_futures]
+
+    if shell_html is None:
+        return fallback("外枠HTMLの生成に失敗しました")
+    failed = [i + 1 for i, html in enumerate(sections_html) if html is None]
+    if failed:
+        return fallback(f"第{', '.join(map(str, failed))}章の生成に失敗しました")
+
+    sections_html = harmonize_section_headings(client, target_page, sections_html)
+    return shell_html.replace(MAIN_CONTENT_PLACEHOLDER, "\n".join(sections_html), 1)
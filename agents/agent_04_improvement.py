@@ -1,69 +1,112 @@
 import os
 import re
 import json
-import pandas as pd
-from bs4 import BeautifulSoup
-from google import genai
-from google.genai import types
+
+from utils.model_router import generate_routed, is_json_list
+from utils.json_repair import repair_json, split_complete
+
+# --- 構造化出力のスキーマ ---
+# 最優先セクションは候補のファイル名の enum で縛り、記事企画は3フィールドを必須にする。
+# 記事企画が途中で切れたり欠けたりした場合は、足りない件数だけを再要求する。
+ARTICLE_PLAN_FIELDS = ("title", "summary", "file_name")
+ARTICLE_TITLES_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {field: {"type": "STRING"} for field in ARTICLE_PLAN_FIELDS},
+        "required": list(ARTICLE_PLAN_FIELDS),
+    },
+}
+MAX_ARTICLE_TITLE_FOLLOWUPS = 1
+
+
+def build_priority_section_schema(target_pages_list):
+    """最優先セクション選定の応答スキーマ（file_name は候補ページのファイル名のいずれか）。"""
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "file_name": {"type": "STRING", "enum": [p['file_name'] for p in target_pages_list]},
+            "reason": {"type": "STRING"},
+        },
+        "required": ["file_name", "reason"],
+    }
+
 
 # (analyze_article_structure, generate_article_purpose は変更なし)
+def extract_article_text(content, fallback_title=""):
+    """
+    HTML文字列から、タイトル、<main> 内の見出し、本文テキスト（script/style/nav/header/footer を除く）を抽出する。
+    記事の構造解析とサイト内検索インデックスの作成で共用する。
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    page_title = soup.find('title').get_text() if soup.find('title') else fallback_title
+    main_content_area = soup.find('main')
+    headings = []
+    if main_content_area:
+        for tag in main_content_area.find_all(['h1', 'h2', 'h3']):
+            headings.append((tag.name, tag.get_text().strip()))
+    for tag in soup.find_all(["script", "style", "nav", "header", "footer"]):
+        tag.decompose()
+    return {
+        "page_title": page_title.split('|')[0].strip(),
+        "headings": headings,
+        "text": soup.get_text(separator='\n', strip=True)
+    }
+
 def analyze_article_structure(file_path):
     """HTMLファイルを読み込み、タイトル、見出し構造、本文テキストを抽出する。"""
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
-            soup = BeautifulSoup(content, 'html.parser')
-        page_title = soup.find('title').get_text() if soup.find('title') else os.path.basename(file_path)
-        main_content_area = soup.find('main')
-        temp_soup = BeautifulSoup(content, 'html.parser')
-        for tag in temp_soup.find_all(["script", "style", "nav", "header", "footer"]):
-            tag.decompose()
-        headings = []
-        if main_content_area:
-            for tag in main_content_area.find_all(['h1', 'h2', 'h3']):
-                headings.append(f"<{tag.name}> {tag.get_text().strip()}")
-        clean_text = temp_soup.get_text(separator='\n', strip=True)
+        extracted = extract_article_text(content, os.path.basename(file_path))
         return {
-            "page_title": page_title.split('|')[0].strip(),
-            "structure": "\n".join(headings),
-            "full_text_excerpt": clean_text[:500].replace('\n', ' ').strip() + "..."
+            "page_title": extracted["page_title"],
+            "structure": "\n".join(f"<{name}> {text}" for name, text in extracted["headings"]),
+            "full_text_excerpt": extracted["text"][:500].replace('\n', ' ').strip() + "..."
         }, None
     except Exception as e:
         return None, f"❌ 解析エラー: {e}"
 
-def generate_article_purpose(client, article_data, identity):
-    """記事の構造とテキストを分析し、戦略的目的 (Purpose) を生成する。"""
-    if client is None: return "❌ クライアント未設定"
-    prompt = f"""
+def build_article_purpose_prompt_prefix(identity):
+    """目的 (Purpose) 生成プロンプトのうち、全記事で共通の部分（指示と法人格）。"""
+    return f"""
     あなたは、Webサイトのコンテンツ戦略家です。
-    以下の「法人の哲学」と「記事の現在の構造・内容」を分析し、**サイト全体の戦略に照らして、この記事が持つべき戦略的目的 (Purpose)** を1文で生成してください。
+    以下の「法人の哲学」と、末尾の「記事の現在の構造・内容」を分析し、**サイト全体の戦略に照らして、この記事が持つべき戦略的目的 (Purpose)** を1文で生成してください。
     【重要】回答は生成された「Purpose」の**文字列のみ**を返してください。
     ### 法人の哲学 (CORPORATE IDENTITY)
     {identity}
+    """
+
+def build_article_purpose_prompt_suffix(article_data):
+    """目的 (Purpose) 生成プロンプトのうち、記事ごとに異なる部分。"""
+    return f"""
     ### 対象記事の現状分析
     - 記事タイトル: {article_data['page_title']}
     - 見出し構造: {article_data['structure']}
     - 本文抜粋: {article_data['full_text_excerpt']}
     生成するPurpose (1文):
     """
+
+def build_article_purpose_prompt(article_data, identity):
+    """記事の戦略的目的 (Purpose) を生成するプロンプト全体（バッチ投入とドライランで使用）。"""
+    return build_article_purpose_prompt_prefix(identity) + build_article_purpose_prompt_suffix(article_data)
+
+def generate_article_purpose(client, article_data, identity):
+    """記事の構造とテキストを分析し、戦略的目的 (Purpose) を生成する。"""
+    if client is None: return "❌ クライアント未設定"
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+        response = generate_routed(
+            client, "article_purpose", build_article_purpose_prompt_suffix(article_data),
+            cached_prefix=build_article_purpose_prompt_prefix(identity)
         )
         return response.text.strip()
     except Exception as e:
         return f"❌ AI生成失敗: {e}"
 
-# ⬇️ [修正] AIの「Vision偏愛」を治すため、プロンプトを「戦略的バランス」重視に変更
-def select_priority_section_by_data(client, df_all_data, identity, target_pages_list, balance_report):
-    """
-    AIの「偏愛」を防ぐため、サイトの「記事数バランス」を数値化し、
-    AIに最も記事が少ないハブを選定させる。
-    """
-    if client is None:
-        return {'file_name': 'solutions/index.html', 'reason': 'クライアント未設定のため、戦略的基盤であるSOLUTIONSをフォールバックしました。'}
-    
+def build_priority_section_prompt(df_all_data, identity, target_pages_list, balance_report):
+    """優先セクション選定用のプロンプトを組み立てる。"""
+    import pandas as pd
     data_markdown = df_all_data.to_markdown()
     
     # 目的リストもプロンプトに含める（参考情報として）
@@ -84,6 +127,7 @@ def select_priority_section_by_data(client, df_all_data, identity, target_pages_
     1. **戦略的バランスの分析:** 以下の「サイトの戦略的バランス（現状の記事数）」レポートを分析してください。
     2. **選定基準:** 「理念（VISION）」セクションは既に充実している可能性が高いです。**記事数が最も少ない**、または VISION との差が最も大きい**コア戦略セクション**（例: SOLUTIONS, INSIGHTS）を選定してください。
     3. **除外対象:** ユーティリティページ（legal/, contact/）は選定対象から除外してください。
+    4. **ページの重さ:** 記事数が同程度のセクション同士では、予算超過 (Budget_Violations) の少ないセクションを優先してください（重いハブに記事を追加すると体感速度がさらに悪化するため）。
 
     ### サイトの戦略的バランス（現状の記事数）
     {balance_report}
@@ -94,36 +138,87 @@ def select_priority_section_by_data(client, df_all_data, identity, target_pages_
     ### 分析対象ページリスト (参考: 全ページの目的)
     {df_target_pages.to_markdown(index=False)}
 
-    ### パフォーマンスデータ (参考: データは均一)
+    ### パフォーマンスデータ (参考: トラフィックは均一な仮の値。Page_KB / DOM_Nodes / Render_Blocking / Budget_Violations はページの実測値)
     {data_markdown}
     ---
     回答は以下のJSON形式のみで出力し、理由には**「なぜそのセクションが戦略的バランスの観点から最適か」**を記述してください。
     {{"file_name": "[選定したファイル名]", "reason": "[選定した論理的根拠を記述]"}}
     """
+    return prompt
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(response_mime_type="application/json")
+def build_priority_section_followup_prompt(df_all_data, identity, target_pages_list, balance_report, previous):
+    """file_name が欠けた・候補に無い応答の後に、候補から1つを選び直させるプロンプト。"""
+    candidates = [p.get('file_name') for p in target_pages_list if p.get('file_name')]
+    return build_priority_section_prompt(df_all_data, identity, target_pages_list, balance_report) + f"""
+    ### 追加の依頼（前回の出力の修正）
+    前回の出力の file_name が欠けているか、候補にありませんでした: {json.dumps(previous, ensure_ascii=False)}
+    file_name は必ず次の候補のいずれか1つをそのまま記入してください: {json.dumps(candidates, ensure_ascii=False)}
+    """
+
+
+def _request_priority_section(client, prompt, target_pages_list):
+    """
+    優先セクションを1回呼び出し、(file_name が候補にある選定結果, 応答) を返す。
+    file_name が欠けた・候補に無い応答は (None, 応答) を返す。
+    """
+    from google.genai import types
+    response = client.models.generate_content(
+        model="gemini-2.5-flash",
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=build_priority_section_schema(target_pages_list)
         )
-        parsed_json = json.loads(response.text.strip().replace("```json", "").replace("```", ""))
-        if any(p.get('file_name') == parsed_json.get('file_name') for p in target_pages_list):
-            return parsed_json
-        else:
-            # [修正] フォールバック先を vision ではなく solutions に変更
-            return {'file_name': 'solutions/index.html', 'reason': 'AIの選定結果が不適切なため、次に重要なSOLUTIONSをフォールバックしました。'}
-    except Exception as e:
-        print(f"❌ AI選定エラー: {e}")
-        return {'file_name': 'solutions/index.html', 'reason': 'API接続エラーまたはJSONパース失敗のため、SOLUTIONSをフォールバックします。'}
+    )
+    parsed_json, _ = repair_json(response.text)
+    if not isinstance(parsed_json, dict):
+        raise ValueError("JSONオブジェクトではありません。")
+    if not any(p.get('file_name') == parsed_json.get('file_name') for p in target_pages_list):
+        return None, parsed_json
+    # 理由だけが欠けた（途中で切れた）応答は、選定結果を活かして再呼び出ししない
+    parsed_json.setdefault('reason', 'AIの選定理由は応答から欠落していました。')
+    return parsed_json, parsed_json
 
-# ⬇️ [修正] KeyError: 'generated_purpose' を防ぐため、両方のキーに対応
-def generate_priority_article_titles(client, section_info, identity, count, start_number):
+
+# ⬇️ [修正] AIの「Vision偏愛」を治すため、プロンプトを「戦略的バランス」重視に変更
+def select_priority_section_by_data(client, df_all_data, identity, target_pages_list, balance_report):
     """
-    最優先セクションの目的を満たす、具体的な記事タイトル、要約、スラッグを企画する。
+    AIの「偏愛」を防ぐため、サイトの「記事数バランス」を数値化し、
+    AIに最も記事が少ないハブを選定させる。
+    file_name が欠けた・候補に無い応答（またはエラー）の場合は、候補の enum を示して1回だけ選び直させ、
+    それでも選べなければ警告を表示して solutions/index.html にフォールバックする。
     """
-    if client is None: return "❌ Geminiクライアントが初期化されていません。", []
-    
+    fallback = 'solutions/index.html'
+    if client is None:
+        print(f"⚠️ クライアント未設定のため、最優先セクションを {fallback} にフォールバックします。")
+        return {'file_name': fallback, 'reason': 'クライアント未設定のため、戦略的基盤であるSOLUTIONSをフォールバックしました。'}
+
+    prompt = build_priority_section_prompt(df_all_data, identity, target_pages_list, balance_report)
+
+    previous = None
+    try:
+        selected, previous = _request_priority_section(client, prompt, target_pages_list)
+        if selected:
+            return selected
+        print(f"  > 🩹 AIの選定結果の file_name が欠けているか候補にありません ({previous.get('file_name')})。候補から選び直させます...")
+    except Exception as e:
+        print(f"  > 🩹 AI選定エラー: {e}。候補から選び直させます...")
+
+    try:
+        selected, previous = _request_priority_section(
+            client, build_priority_section_followup_prompt(df_all_data, identity, target_pages_list, balance_report, previous),
+            target_pages_list)
+        if selected:
+            return selected
+        reason = f"再要求でも file_name が欠けているか候補にありませんでした ({previous.get('file_name')})"
+    except Exception as e:
+        reason = f"再要求でも API接続エラーまたはJSONパース失敗 ({e})"
+    # [修正] フォールバック先を vision ではなく solutions に変更
+    print(f"⚠️ 最優先セクションを選定できませんでした（{reason}）。{fallback} にフォールバックします。")
+    return {'file_name': fallback, 'reason': f'AIの選定に失敗したため（{reason}）、次に重要なSOLUTIONSをフォールバックしました。'}
+
+def build_article_titles_prompt(section_info, identity, count, start_number):
+    """記事企画（タイトル・要約・スラッグ）用のプロンプトを組み立てる。"""
     # ⬅️ [修正] 'generated_purpose' と 'summary' の両方に対応
     section_purpose = section_info.get('summary', section_info.get('generated_purpose', ''))
     
@@ -149,17 +244,117 @@ def generate_priority_article_titles(client, section_info, identity, count, star
       ... ({count}件分)
     ]
     """
+    return prompt
+
+def build_article_titles_followup_prompt(section_info, identity, count, start_number, received):
+    """足りない件数の記事企画だけを再要求するプロンプト（取得済みの企画とは重複させない）。"""
+    return build_article_titles_prompt(section_info, identity, count, start_number) + f"""
+    ### 追加の依頼（前回の出力の補完）
+    以下の記事は既に企画済みです。これらと重複しない記事を {count} 件だけ出力してください。
+    {json.dumps([{"title": p['title'], "file_name": p['file_name']} for p in received], ensure_ascii=False, indent=2)}
+    """
+
+
+def _request_article_plans(client, prompt):
+    """記事企画を1回呼び出し、(完全な企画, 欠けのある企画の件数, 途中で切れたか) を返す。"""
+    response = generate_routed(
+        client, "article_titles", prompt,
+        validate=is_json_list,
+        response_mime_type="application/json",
+        response_schema=ARTICLE_TITLES_SCHEMA
+    )
+    parsed, truncated = repair_json(response.text)
+    if not isinstance(parsed, list):
+        raise ValueError("JSON配列ではありません。")
+    complete, incomplete = split_complete(parsed, ARTICLE_PLAN_FIELDS)
+    return complete, len(incomplete), truncated
+
+
+# ⬇️ [修正] KeyError: 'generated_purpose' を防ぐため、両方のキーに対応
+def generate_priority_article_titles(client, section_info, identity, count, start_number):
+    """
+    最優先セクションの目的を満たす、具体的な記事タイトル、要約、スラッグを企画する。
+    途中で切れた・フィールドが欠けた企画は捨て、足りない件数だけを連番を進めて再要求する。
+    """
+    if client is None: return "❌ Geminiクライアントが初期化されていません。", []
+
+    prompt = build_article_titles_prompt(section_info, identity, count, start_number)
 
     print(f"📢 AIに {section_info['title']} セクション用の記事 {count} 件の企画を依頼中...")
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=prompt,
-            config=types.GenerateContentConfig(response_mime_type="application/json")
-        )
-        parsed_list = json.loads(response.text.strip().replace("```json", "").replace("```", ""))
-        print("✅ 記事企画の生成に成功しました。")
-        return "", parsed_list
+        parsed_list, dropped, truncated = _request_article_plans(client, prompt)
     except Exception as e:
         print(f"❌ APIまたはJSONパースエラー: {e}")
         return str(e), []
+
+    for _ in range(MAX_ARTICLE_TITLE_FOLLOWUPS):
+        missing = count - len(parsed_list)
+        if missing <= 0:
+            break
+        # 欠けた企画が使う予定だった連番も飛ばし、既存のスラッグと衝突させない
+        next_number = start_number + len(parsed_list) + dropped
+        print(f"  > 🩹 記事企画が {missing} 件不足しています (途中で切れた: {'あり' if truncated else 'なし'} / 欠けのある企画: {dropped} 件)。不足分だけを再要求します...")
+        try:
+            extra, extra_dropped, truncated = _request_article_plans(
+                client, build_article_titles_followup_prompt(section_info, identity, missing, next_number, parsed_list))
+        except Exception as e:
+            print(f"⚠️ 不足分の再要求に失敗しました: {e}")
+            break
+        known = {p['file_name'] for p in parsed_list}
+        parsed_list += [p for p in extra if p['file_name'] not in known][:missing]
+        dropped += extra_dropped
+
+    if not parsed_list:
+        return "有効な記事企画がありません。", []
+    print(f"✅ 記事企画の生成に成功しました ({len(parsed_list)} 件)。")
+    return "", parsed_list[:count]
+
+def generate_article_patch_ops(client, article_data, section_digest, change_goal, identity):
+    """
+    既存記事の構造と変更目標から、章単位の編集操作 (replace_section / insert_after_heading など) を生成する。
+    ページ全体を再生成せず、変更が必要な章のHTML断片だけを出力させる。
+    """
+    if client is None: return "❌ Geminiクライアントが初期化されていません。", []
+
+    prompt = f"""
+    あなたは、Webサイトのコンテンツ編集者です。
+    以下の「既存記事の構造」に対し、「変更目標」を達成するための**最小限の章単位の編集操作**をJSON配列で出力してください。
+    ページ全体を書き直さず、変更が必要な章だけを対象にしてください。
+
+    ### 利用できる操作
+    - {{"op": "replace_section", "heading": "既存の見出し", "html": "見出し直後から次の見出しまでを置き換えるHTML断片"}}
+    - {{"op": "insert_after_heading", "heading": "既存の見出し", "html": "見出しの直後に挿入するHTML断片"}}
+    - {{"op": "insert_section_after", "heading": "既存の見出し", "html": "その章の末尾の後ろに挿入する新しい章（見出しを含む）"}}
+    - {{"op": "rename_heading", "heading": "既存の見出し", "new_heading": "新しい見出し"}}
+    - {{"op": "remove_section", "heading": "既存の見出し"}}
+
+    ### CRITICAL要件
+    1. `heading` には、下記の「章の一覧」にある見出しを**そのまま**指定してください。
+    2. HTML断片は既存デザインに合わせて Tailwind CSS のクラスを使用してください。
+    3. 変更が不要な場合は空配列 [] を返してください。
+
+    ### 変更目標
+    {change_goal}
+
+    ### 既存記事
+    - 記事タイトル: {article_data['page_title']}
+    - 見出し構造: {article_data['structure']}
+    - 本文抜粋: {article_data['full_text_excerpt']}
+
+    ### 章の一覧（見出しと本文の冒頭）
+    {json.dumps(section_digest, ensure_ascii=False, indent=2)}
+
+    ### 法人格
+    {identity}
+    """
+
+    try:
+        response = generate_routed(
+            client, "patch_ops", prompt,
+            response_mime_type="application/json"
+        )
+        ops = json.loads(response.text.strip().replace("```json", "").replace("```", ""))
+        return "", ops
+    except Exception as e:
+        print(f"❌ 編集操作の生成に失敗しました: {e}")
+        return str(e), []
@@ -0,0 +1,58 @@
+import json
+
+from utils.model_router import generate_routed
+from utils.translation_utils import TARGET_LANGUAGE_NAMES
+
+
+def build_translation_prompt(strings, target_lang="en"):
+    """ページから抽出した文字列（番号付き）を翻訳させるプロンプトを組み立てる。"""
+    numbered = {str(i + 1): text for i, text in enumerate(strings)}
+    language = TARGET_LANGUAGE_NAMES.get(target_lang, target_lang)
+    return f"""
+    あなたは、企業Webサイトのプロの翻訳者です。
+    以下のJSONオブジェクトの各値は、日本語の企業サイトのHTMLから抽出したテキスト（本文・見出し・ナビゲーション・ボタン・画像の代替テキストなど）です。
+    各値を {language} に翻訳してください。
+
+    ### CRITICAL要件
+    1. 回答は、入力と**同じキー**を持つJSONオブジェクトのみで出力してください。キーの追加・省略は禁止です。
+    2. 1つの値は1つのテキストノードです。前後の値と結合したり、分割したりしないでください。
+    3. 社名・製品名・固有名詞・URL・メールアドレス・数値・記号（「|」「→」など）はそのまま保持してください。
+    4. ナビゲーションやボタンなどの短い文字列は、英語サイトで一般的な簡潔な表現にしてください。
+
+    ### 翻訳対象
+    {json.dumps(numbered, ensure_ascii=False, indent=2)}
+    """
+
+
+def _parse_translations(text, count):
+    """応答を読み、範囲内の番号の空でない訳文だけを {番号: 訳文} で返す。"""
+    parsed = json.loads((text or "").strip().replace("```json", "").replace("```", ""))
+    if not isinstance(parsed, dict):
+        raise ValueError("JSONオブジェクトではありません。")
+    return {key: value for key, value in parsed.items() if isinstance(value, str) and value.strip()
+            and key.isdigit() and 1 <= int(key) <= count}
+
+
+def translate_strings(client, strings, target_lang="en"):
+    """
+    文字列のリストを1回の呼び出しで翻訳し、(エラーメッセージ, {原文: 訳文}) を返す。
+    一部の番号が欠けた応答は上位モデルに引き上げて再度呼び出し、それでも欠けた分は返さない（次回に再送される）。
+    """
+    if client is None: return "❌ Geminiクライアントが初期化されていません。", {}
+    prompt = build_translation_prompt(strings, target_lang)
+
+    def is_complete(text):
+        try:
+            return len(_parse_translations(text, len(strings))) == len(strings)
+        except ValueError:
+            return False
+
+    try:
+        response = generate_routed(
+            client, "translate_strings", prompt, validate=is_complete,
+            response_mime_type="application/json"
+        )
+        parsed = _parse_translations(response.text, len(strings))
+        return "", {strings[int(key) - 1]: value for key, value in parsed.items()}
+    except Exception as e:
+        return f"❌ 翻訳失敗: {e}", {}
@@ -0,0 +1 @@
+# This file intentionally left blank to mark the directory as a Python package.
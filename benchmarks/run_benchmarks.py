@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import contextlib
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_site import generate_synthetic_site
+
+# --- 0. 設定 ---
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SITES_DIR = os.path.join(BENCH_DIR, ".sites")
+RESULTS_FILE = os.path.join(BENCH_DIR, "results", "latest.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baselines.json")
+DEFAULT_SCALES = [1000, 10000]       # 100000 は --scales で明示的に指定する
+REGRESSION_TOLERANCE = 0.25          # ベースラインから 25% 以上遅くなったら回帰とみなす
+FAKE_LLM_LATENCY_SEC = 0.0
+
+
+# --- ベンチマーク対象（子プロセス内で実行され、処理したファイル/行数を返す） ---
+def _html_files(docs_dir):
+    for root, _, files in os.walk(docs_dir):
+        for filename in files:
+            if filename.lower().endswith(('.html', '.htm')):
+                yield os.path.join(root, filename)
+
+
+def case_analyze_article_structure(site):
+    from agents.agent_04_improvement import analyze_article_structure
+    count = 0
+    for path in _html_files(os.path.join(site, "docs")):
+        analyze_article_structure(path)
+        count += 1
+    return count
+
+
+def case_phase5a_walk(site):
+    from main_02_improvement_cycle import scan_existing_site
+    from utils.fake_client import FakeClient
+    return len(scan_existing_site(FakeClient(FAKE_LLM_LATENCY_SEC), os.path.join(site, "docs"), "ダミー法人格"))
+
+
+def case_hub_balance(site):
+    from utils.file_utils import load_markdown_table_to_list
+    from utils.analysis_utils import build_hub_balance
+    articles = load_markdown_table_to_list(os.path.join(site, "reports", "planned_articles.md"))
+    build_hub_balance(articles)
+    return len(articles)
+
+
+def case_load_markdown_table(site):
+    from utils.file_utils import load_markdown_table_to_list
+    return len(load_markdown_table_to_list(os.path.join(site, "reports", "planned_articles.md")))
+
+
+def case_save_markdown_table(site):
+    from utils.file_utils import load_markdown_table_to_list, save_to_markdown
+    articles = load_markdown_table_to_list(os.path.join(site, "reports", "planned_articles.md"))
+    save_to_markdown(articles, os.path.join(site, "reports", "planned_articles_copy.md"))
+    return len(articles)
+
+
+def case_get_existing_article_count(site):
+    from utils.file_utils import get_existing_article_count
+    return get_existing_article_count(os.path.join(site, "docs"))
+
+
+def case_inject_tags(site):
+    from main_03_inject_tags import inject_tags
+    processed, skipped = inject_tags(os.path.join(site, "docs"), "GTM-BENCH000", "ca-pub-0000000000000000")
+    return processed + skipped
+
+
+def case_pipeline_build(site):
+    from main_01_initial_build import run_initial_build
+    from utils.fake_client import FakeClient
+    out = os.path.join(site, "pipeline_build")
+    opinion = os.path.join(site, "opinion.txt")
+    with open(opinion, 'w', encoding='utf-8') as f:
+        f.write("データで個人の生活を最適化する。")
+    results = run_initial_build(FakeClient(FAKE_LLM_LATENCY_SEC), opinion_file=opinion,
+                                output_dir=os.path.join(out, "site"), reports_dir=os.path.join(out, "reports"),
+                                zip_filename=os.path.join(out, "site.zip"))
+    return len(results or {})
+
+
+def case_pipeline_improve(site):
+    from main_02_improvement_cycle import run_improvement_cycle
+    from utils.fake_client import FakeClient
+    run_improvement_cycle(FakeClient(FAKE_LLM_LATENCY_SEC), base_dir=os.path.join(site, "docs"),
+                          reports_dir=os.path.join(site, "reports"))
+    return 1
+
+
+# 実行順（inject_tags と pipeline_improve はサイトを書き換えるため最後に置く）
+CASES = {
+    "analyze_article_structure": case_analyze_article_structure,
+    "phase5a_walk": case_phase5a_walk,
+    "hub_balance": case_hub_balance,
+    "load_markdown_table": case_load_markdown_table,
+    "save_markdown_table": case_save_markdown_table,
+    "get_existing_article_count": case_get_existing_article_count,
+    "inject_tags": case_inject_tags,
+    "pipeline_build": case_pipeline_build,
+    "pipeline_improve": case_pipeline_improve,
+}
+
+
+def _run_case_in_child(case_name, site, queue):
+    """子プロセスでケースを1つ実行し、経過時間・ピークRSS・処理件数を返す。"""
+    import resource
+    os.chdir(os.path.dirname(BENCH_DIR))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        try:
+            items = CASES[case_name](site)
+            error = None
+        except BaseException as e:
+            items, error = 0, f"{type(e).__name__}: {e}"
+        wall = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put({"wall_sec": wall, "peak_rss_mb": peak_rss_mb, "items": items, "error": error})
+
+
+def run_case(case_name, site):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_case_in_child, args=(case_name, site, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    result["files_per_sec"] = result["items"] / result["wall_sec"] if result["wall_sec"] > 0 else 0.0
+    return result
+
+
+def prepare_site(scale, regenerate=False):
+    """スケールごとの合成サイトを用意する（既存のものは再利用し、ケース実行前に毎回コピーする）。"""
+    pristine = os.path.join(SITES_DIR, f"pristine-{scale}")
+    if regenerate and os.path.exists(pristine):
+        shutil.rmtree(pristine)
+    if not os.path.exists(pristine):
+        print(f"🏗️ 合成サイトを生成中: {scale} ページ")
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            generate_synthetic_site(pristine, scale)
+    work = os.path.join(SITES_DIR, f"work-{scale}")
+    if os.path.exists(work):
+        shutil.rmtree(work)
+    shutil.copytree(pristine, work)
+    return work
+
+
+def compare_with_baseline(results, baselines, tolerance):
+    """ベースラインより tolerance 以上遅いケースを回帰として返す。"""
+    regressions = []
+    for key, result in results.items():
+        base = baselines.get(key)
+        if not base or result.get("error"):
+            continue
+        if result["wall_sec"] > base["wall_sec"] * (1 + tolerance) and result["wall_sec"] - base["wall_sec"] > 0.05:
+            regressions.append((key, base["wall_sec"], result["wall_sec"]))
+    return regressions
+
+
+def run_suite(scales, cases=None, update_baseline=False, tolerance=REGRESSION_TOLERANCE, regenerate=False):
+    cases = cases or list(CASES)
+    results = {}
+    print(f"--- ⏱️ ベンチマークスイート (スケール: {', '.join(map(str, scales))}) ---")
+    for scale in scales:
+        site = prepare_site(scale, regenerate)
+        for case_name in cases:
+            result = run_case(case_name, site)
+            key = f"{case_name}@{scale}"
+            results[key] = result
+            if result["error"]:
+                print(f"  ❌ {key.ljust(36)} {result['error']}")
+            else:
+                print(f"  {key.ljust(36)} {result['wall_sec']:9.3f} s  {result['peak_rss_mb']:8.1f} MB  "
+                      f"{result['files_per_sec']:10.1f} 件/s")
+
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    if update_baseline:
+        baselines.update({k: v for k, v in results.items() if not v.get("error")})
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"✅ ベースラインを更新しました: {BASELINE_FILE}")
+        return 0
+
+    unchecked = [key for key, result in results.items() if key not in baselines and not result.get("error")]
+    if unchecked:
+        # ベースラインはマシンごとに異なるためリポジトリには含めない。最初に --update-baseline で作成する
+        print(f"  ⚠️ ベースラインが無いため回帰を判定できません ({len(unchecked)} 件): {', '.join(unchecked)}")
+        print(f"     先に --update-baseline を付けて実行し、{BASELINE_FILE} を作成してください。")
+    regressions = compare_with_baseline(results, baselines, tolerance)
+    for key, base, now in regressions:
+        print(f"  ⚠️ 回帰: {key} {base:.3f}s → {now:.3f}s (+{(now / base - 1) * 100:.0f}%)")
+    failed = regressions or any(r.get("error") for r in results.values())
+    print("✅ ベンチマークスイート完了" if not failed else "❌ 回帰またはエラーがあります")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成サイトによるローカル処理のベンチマーク")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES))
+    parser.add_argument("--update-baseline", action="store_true", help="今回の結果をベースラインとして保存する")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--regenerate", action="store_true", help="合成サイトを作り直す")
+    args = parser.parse_args(argv)
+    return run_suite(args.scales, args.cases, args.update_baseline, args.tolerance, args.regenerate)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
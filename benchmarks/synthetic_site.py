@@ -0,0 +1,93 @@
+import os
+import re
+import random
+
+from utils.file_utils import save_to_markdown
+
+# --- 合成サイトの設定 ---
+# 実サイト (docs/) の記事ページをテンプレートとし、タイトル・見出し・本文だけを差し替えたページを大量に生成する。
+TEMPLATE_PAGE = "docs/vision/philosophy-human-centric-ai-ethics-5.html"
+CONTENT_SECTIONS = ['vision', 'solutions', 'insights', 'collaboration']
+UTILITY_PAGES = ['legal/privacy-policy.html', 'contact/index.html']
+SAMPLE_WORDS = ['データ', '最適化', '意思決定', 'ライフログ', '倫理', '透明性', 'パーソナライズ', 'Society 5.0',
+                '行動分析', 'QOL', 'プライバシー', 'XAI', 'PDCA', '生活者', '科学的根拠', 'AI']
+
+FALLBACK_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8"/>
+<title>__SYNTHETIC_TITLE__ | PEOPLE OPT</title>
+<script src="https://cdn.tailwindcss.com"></script>
+<link href="https://fonts.googleapis.com/css2?family=Noto+Sans+JP:wght@400;700&display=swap" rel="stylesheet"/>
+</head>
+<body>
+<header><nav><a href="../index.html">ホーム</a></nav></header>
+<main>
+__SYNTHETIC_BODY__
+</main>
+<footer><p>&copy; PEOPLE OPT</p></footer>
+</body>
+</html>
+"""
+
+
+def _load_template():
+    """実ページの <main> をプレースホルダーに置き換えたテンプレートを返す。"""
+    if os.path.exists(TEMPLATE_PAGE):
+        with open(TEMPLATE_PAGE, 'r', encoding='utf-8') as f:
+            html = f.read()
+        html = re.sub(r"<title>.*?</title>", "<title>__SYNTHETIC_TITLE__ | PEOPLE OPT</title>", html, count=1, flags=re.DOTALL)
+        html, replaced = re.subn(r"<main[^>]*>.*?</main>", "<main>\n__SYNTHETIC_BODY__\n</main>", html, count=1, flags=re.DOTALL)
+        if replaced:
+            return html
+    return FALLBACK_TEMPLATE
+
+
+def _sentence(rng, words=24):
+    return "".join(rng.choice(SAMPLE_WORDS) + ("、" if rng.random() < 0.2 else "") for _ in range(words)) + "。"
+
+
+def _article_body(rng, title, sections=4):
+    parts = [f'<h1 class="text-4xl font-bold">{title}</h1>']
+    for i in range(sections):
+        parts.append(f'<section class="mb-12"><h2 class="text-2xl font-bold">{i + 1}. {_sentence(rng, 4)}</h2>')
+        for _ in range(3):
+            parts.append(f'<p class="mb-4">{_sentence(rng)}</p>')
+        parts.append(f'<h3 class="text-xl">{_sentence(rng, 3)}</h3><p>{_sentence(rng)}</p></section>')
+    return "\n".join(parts)
+
+
+def generate_synthetic_site(root, page_count, seed=0):
+    """
+    root/docs に page_count ページの合成サイトを、root/reports に法人格と計画ファイルを生成する。
+    戻り値: 計画ファイルに記載したページ情報のリスト
+    """
+    rng = random.Random(seed)
+    template = _load_template()
+    docs_dir = os.path.join(root, "docs")
+    reports_dir = os.path.join(root, "reports")
+    os.makedirs(reports_dir, exist_ok=True)
+
+    pages = [{"file_name": "index.html", "title": "ホーム", "summary": "サイトの顔。"}]
+    pages += [{"file_name": f"{s}/index.html", "title": s.upper(), "summary": f"{s} セクションのハブ。"} for s in CONTENT_SECTIONS]
+    pages += [{"file_name": p, "title": p, "summary": "ユーティリティページ。"} for p in UTILITY_PAGES]
+    article_count = max(page_count - len(pages), 0)
+    for n in range(1, article_count + 1):
+        section = CONTENT_SECTIONS[n % len(CONTENT_SECTIONS)]
+        pages.append({
+            "file_name": f"{section}/synthetic-article-{n}.html",
+            "title": f"合成記事 {n}: {_sentence(rng, 3)}",
+            "summary": _sentence(rng, 12),
+        })
+
+    for page in pages:
+        path = os.path.join(docs_dir, page['file_name'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        html = template.replace("__SYNTHETIC_TITLE__", page['title']).replace("__SYNTHETIC_BODY__", _article_body(rng, page['title']))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    with open(os.path.join(reports_dir, "01_corporate_identity.md"), 'w', encoding='utf-8') as f:
+        f.write("**パーパス:** データによる個人の生活最適化。\n**法人格/トーン:** 論理的、先進的。\n")
+    save_to_markdown(pages, os.path.join(reports_dir, "planned_articles.md"))
+    return pages
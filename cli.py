@@ -0,0 +1,486 @@
+"""
+hp-generation-agent の統合CLI。
+
+    python cli.py build [--incremental] [--watch] [--batch] [--dry-run] [--metrics-port 9464]
+    python cli.py improve [--batch] [--dry-run] [--metrics-port 9464]
+    python cli.py inject-tags --gtm-id GTM-XXXX --adsense-client-id ca-pub-XXXX
+    python cli.py refresh --goal "変更目標" [--target solutions]
+    python cli.py sites [config/sites.json]
+    python cli.py translate [--lang en] [--dry-run]
+    python cli.py hubs [--all] [--batch] [--dry-run]
+    python cli.py search-index [--docs-dir docs]
+    python cli.py sitemap [--docs-dir docs] [--base-url URL]
+    python cli.py audit [--docs-dir docs] [--budgets config/page_budgets.json]
+    python cli.py pages log [--docs-dir docs] [--page PATH] [--reports-dir output_reports]
+    python cli.py pages rollback (--page PATH | --section DIR | --run RUN_ID [--force]) [--docs-dir docs] [--reports-dir output_reports]
+    python cli.py pages gc [--keep N] [--reports-dir output_reports]
+    python cli.py status
+    python cli.py bench [--suite --scales 1000 10000]
+
+起動を速く保つため、google.genai / pandas / bs4 などの重い依存は
+各サブコマンドの関数内でのみインポートする（このモジュールの先頭では標準ライブラリしか読み込まない）。
+"""
+import os
+import sys
+import json
+import argparse
+
+# --- 0. 設定 ---
+BENCH_MODULES = ['cli', 'main_01_initial_build', 'main_02_improvement_cycle', 'main_03_inject_tags', 'utils.file_utils']
+HEAVY_MODULES = ['google.genai', 'pandas', 'numpy', 'bs4']
+IMPORT_TIME_BUDGET_MS = 150 # `import cli` の許容時間（コールドスタート）
+BENCH_REPEAT = 5
+
+
+def _print_dry_run(calls, title, count_with_api, setup_client):
+    """ドライランの見積もりを表示する。--count-tokens の場合のみクライアントを初期化して count_tokens を使う。"""
+    from utils.cost_planner import estimate_calls, print_plan
+    client = setup_client() if count_with_api else None
+    print_plan(estimate_calls(calls, client), title)
+    return 0
+
+
+def _enable_metrics_port(args):
+    """--metrics-port を環境変数で utils/metrics.py に渡す（run_* の開始時に読まれる）。"""
+    if getattr(args, "metrics_port", None):
+        from utils.metrics import METRICS_PORT_ENV
+        os.environ[METRICS_PORT_ENV] = str(args.metrics_port)
+
+
+def cmd_build(args):
+    _enable_metrics_port(args)
+    if args.dry_run:
+        from main_01_initial_build import setup_client, plan_initial_build, OPINION_FILE, REPORTS_DIR
+        calls = plan_initial_build(args.opinion_file or OPINION_FILE, args.reports_dir or REPORTS_DIR)
+        return _print_dry_run(calls, "初回構築 (main_01)", args.count_tokens, setup_client)
+
+    if args.incremental or args.watch:
+        from main_04_incremental_build import run_incremental_build, watch
+        if args.watch:
+            watch()
+        else:
+            run_incremental_build(rebuild_all=args.rebuild_all)
+        return 0
+
+    from main_01_initial_build import setup_client, run_initial_build, OPINION_FILE, OUTPUT_DIR, REPORTS_DIR
+    gemini_client = setup_client()
+    if gemini_client is None:
+        return 1
+    from utils.errors import PipelineError
+    output_dir = args.output_dir or OUTPUT_DIR
+    try:
+        run_initial_build(
+            gemini_client,
+            opinion_file=args.opinion_file or OPINION_FILE,
+            output_dir=output_dir,
+            reports_dir=args.reports_dir or REPORTS_DIR,
+            zip_filename=output_dir.rstrip('/') + '.zip',
+            batch_mode=args.batch
+        )
+    except PipelineError:
+        return 1
+    return 0
+
+
+def cmd_improve(args):
+    _enable_metrics_port(args)
+    from main_02_improvement_cycle import setup_client, run_improvement_cycle, BASE_DIR, REPORTS_DIR, DEFAULT_ARTICLE_COUNT
+    if args.dry_run:
+        from main_02_improvement_cycle import plan_improvement_cycle
+        calls = plan_improvement_cycle(args.docs_dir or BASE_DIR, args.reports_dir or REPORTS_DIR,
+                                       article_count=args.count or DEFAULT_ARTICLE_COUNT)
+        return _print_dry_run(calls, "改善サイクル (main_02)", args.count_tokens, setup_client)
+    gemini_client = setup_client()
+    if gemini_client is None:
+        return 1
+    from utils.errors import PipelineError
+    try:
+        run_improvement_cycle(
+            gemini_client,
+            base_dir=args.docs_dir or BASE_DIR,
+            reports_dir=args.reports_dir or REPORTS_DIR,
+            article_count=args.count or DEFAULT_ARTICLE_COUNT,
+            batch_mode=args.batch
+        )
+    except PipelineError:
+        return 1
+    return 0
+
+
+def cmd_inject_tags(args):
+    from main_03_inject_tags import inject_tags, BASE_DIR
+    if not args.gtm_id and not args.adsense_client_id:
+        print("❌ --gtm-id と --adsense-client-id のどちらかを指定してください。")
+        return 1
+    base_dir = args.docs_dir or BASE_DIR
+    if not os.path.isdir(base_dir):
+        print(f"❌ サイトディレクトリ ({base_dir}) が見つかりません。")
+        return 1
+    from main_02_improvement_cycle import REPORTS_DIR
+    from utils.page_store import store_dir_for
+    files_processed, files_skipped = inject_tags(base_dir, args.gtm_id, args.adsense_client_id,
+                                                 store_dir_for(args.reports_dir or REPORTS_DIR))
+    print(f"✅ 合計 {files_processed} 件のHTMLファイルにタグを挿入/修正しました。")
+    print(f"ℹ️ 合計 {files_skipped} 件のHTMLファイルは変更ありませんでした。")
+    return 0
+
+
+def cmd_refresh(args):
+    from main_05_refresh_articles import setup_client, run_refresh, BASE_DIR, REPORTS_DIR
+    if not args.goal:
+        print("❌ --goal で変更目標を指定してください。")
+        return 1
+    gemini_client = setup_client()
+    if gemini_client is None:
+        return 1
+    results = run_refresh(gemini_client, args.target or "", args.goal,
+                          base_dir=args.docs_dir or BASE_DIR, reports_dir=args.reports_dir or REPORTS_DIR)
+    return 0 if results and not any(status.startswith("❌") for status in results.values()) else 1
+
+
+def cmd_sites(args):
+    _enable_metrics_port(args)
+    from main_06_multi_site import setup_client, load_manifest, run_sites
+    try:
+        manifest = load_manifest(args.manifest)
+    except Exception as e:
+        print(f"❌ マニフェスト ({args.manifest}) の読み込みに失敗: {e}")
+        return 1
+    gemini_client = setup_client()
+    if gemini_client is None:
+        return 1
+    all_stats = run_sites(manifest, gemini_client)
+    return 1 if any(s.status == "failed" for s in all_stats) else 0
+
+
+def cmd_translate(args):
+    from main_07_translate import setup_client, run_translation, BASE_DIR, REPORTS_DIR
+    base_dir = args.docs_dir or BASE_DIR
+    if not os.path.isdir(base_dir):
+        print(f"❌ サイトディレクトリ ({base_dir}) が見つかりません。")
+        return 1
+    gemini_client = None if args.dry_run else setup_client()
+    if gemini_client is None and not args.dry_run:
+        return 1
+    from utils.errors import PipelineError
+    try:
+        run_translation(gemini_client, base_dir=base_dir, reports_dir=args.reports_dir or REPORTS_DIR,
+                        target_lang=args.lang, dry_run=args.dry_run)
+    except PipelineError:
+        return 1
+    return 0
+
+
+def cmd_hubs(args):
+    _enable_metrics_port(args)
+    from main_08_hub_maintenance import setup_client, run_hub_maintenance, BASE_DIR, REPORTS_DIR
+    from utils.errors import PipelineError
+    base_dir = args.docs_dir or BASE_DIR
+    if not os.path.isdir(base_dir):
+        print(f"❌ サイトディレクトリ ({base_dir}) が見つかりません。")
+        return 1
+    gemini_client = None if args.dry_run else setup_client()
+    if gemini_client is None and not args.dry_run:
+        return 1
+    try:
+        run_hub_maintenance(gemini_client, base_dir=base_dir, reports_dir=args.reports_dir or REPORTS_DIR,
+                            force=args.all, batch_mode=args.batch, dry_run=args.dry_run)
+    except PipelineError:
+        return 1
+    return 0
+
+
+def cmd_search_index(args):
+    from utils.search_index import build_search_index, STATE_FILE
+    base_dir = args.docs_dir or "docs"
+    if not os.path.isdir(base_dir):
+        print(f"❌ サイトディレクトリ ({base_dir}) が見つかりません。")
+        return 1
+    state_file = os.path.join(args.reports_dir, os.path.basename(STATE_FILE)) if args.reports_dir else STATE_FILE
+    build_search_index(base_dir, state_file)
+    return 0
+
+
+def cmd_sitemap(args):
+    from utils.sitemap_utils import update_sitemap, STATE_FILE, BASE_URL
+    base_dir = args.docs_dir or "docs"
+    if not os.path.isdir(base_dir):
+        print(f"❌ サイトディレクトリ ({base_dir}) が見つかりません。")
+        return 1
+    state_file = os.path.join(args.reports_dir, os.path.basename(STATE_FILE)) if args.reports_dir else STATE_FILE
+    base_url = args.base_url or BASE_URL
+    update_sitemap(base_dir, state_file, base_url if base_url.endswith('/') else base_url + '/')
+    return 0
+
+
+def cmd_audit(args):
+    """ページの重さ・レンダリングブロックを監査する。予算を超えたページがあれば終了コード 1 を返す。"""
+    from utils.page_audit import run_page_audit, REPORT_FILE, BUDGETS_FILE
+    base_dir = args.docs_dir or "docs"
+    if not os.path.isdir(base_dir):
+        print(f"❌ サイトディレクトリ ({base_dir}) が見つかりません。")
+        return 1
+    report_file = os.path.join(args.reports_dir, os.path.basename(REPORT_FILE)) if args.reports_dir else REPORT_FILE
+    _, over_budget = run_page_audit(base_dir, report_file, args.budgets or BUDGETS_FILE)
+    return 1 if over_budget else 0
+
+
+def cmd_pages(args):
+    """ページストアの履歴表示・ロールバック・不要オブジェクトの削除。APIは呼ばない。"""
+    from utils import page_store
+    base_dir = args.docs_dir or "docs"
+    store_dir = page_store.store_dir_for(args.reports_dir or "output_reports")
+    if args.action == "log":
+        page_store.print_page_log(base_dir, args.page, store_dir)
+        return 0
+    if args.action == "gc":
+        runs, objects, freed = page_store.gc(page_store.KEEP_RUNS if args.keep is None else args.keep, store_dir)
+        print(f"✅ 古い実行 {runs} 件と、参照されないオブジェクト {objects} 件 ({freed / 1024:.1f} KB) を削除しました。")
+        return 0
+    if args.page:
+        results = {args.page: page_store.rollback_page(base_dir, args.page, store_dir)}
+    elif args.section:
+        results = page_store.rollback_section(base_dir, args.section, store_dir)
+    elif args.run:
+        results = page_store.rollback_run(args.run, store_dir, force=args.force)
+    else:
+        print("❌ --page / --section / --run のいずれかを指定してください。")
+        return 1
+    if not results:
+        print("ℹ️ 戻せるページの記録がありません。")
+    for path, status in results.items():
+        print(f"  {path}: {status}")
+    return 1 if any(status.startswith(("❌", "⚠️")) for status in results.values()) else 0
+
+
+def cmd_status(args):
+    """レポート・公開サイト・ビルド状態を、APIやHTMLパーサーを使わずに一覧表示する。"""
+    from utils.file_utils import get_existing_article_count, load_markdown_table_to_list
+    from utils.build_graph import load_build_state
+
+    reports_dir = args.reports_dir or "output_reports"
+    docs_dir = args.docs_dir or "docs"
+
+    print(f"--- 📋 ステータス ---")
+    print(f"[レポート] {reports_dir}")
+    for name in ["01_corporate_identity.md", "02_sitemap.md", "03_content_strategy.md", "04_target_pages_list.json", "planned_articles.md"]:
+        path = os.path.join(reports_dir, name)
+        mark = "✅" if os.path.exists(path) else "❌"
+        size = f"{os.path.getsize(path):,} bytes" if os.path.exists(path) else "なし"
+        print(f"  {mark} {name.ljust(28)} {size}")
+
+    plan_file = os.path.join(reports_dir, "planned_articles.md")
+    if os.path.exists(plan_file):
+        plans = load_markdown_table_to_list(plan_file) or []
+        print(f"  計画済みページ: {len(plans)} 件")
+
+    print(f"[公開サイト] {docs_dir}")
+    if os.path.isdir(docs_dir):
+        hubs = {}
+        for root, _, files in os.walk(docs_dir):
+            section = os.path.relpath(root, docs_dir).split(os.path.sep)[0]
+            count = sum(1 for f in files if f.lower().endswith(('.html', '.htm')))
+            if count:
+                hubs[section] = hubs.get(section, 0) + count
+        for section, count in sorted(hubs.items()):
+            print(f"  - {('(root)' if section == '.' else section).ljust(20)} {count} ページ")
+        print(f"  詳細記事数 (index.html 以外): {get_existing_article_count(docs_dir)} 件")
+    else:
+        print("  ❌ ディレクトリが見つかりません。")
+
+    state = load_build_state(os.path.join(reports_dir, ".build_state.json"))
+    pages = sum(1 for n in state if n.startswith('page:'))
+    print(f"[インクリメンタルビルド] 記録済みノード {len(state)} 件 (ページ {pages} 件)")
+
+    status_file = os.path.join(reports_dir, "status.json")
+    if os.path.exists(status_file):
+        with open(status_file, 'r', encoding='utf-8') as f:
+            live = json.load(f)
+        eta = f" / 完了予測 {live['projected_completion']}" if live.get('projected_completion') else ""
+        print(f"[進捗] {live.get('updated_at')} 時点 (経過 {live.get('elapsed_sec', 0):.0f}s{eta})")
+        for row in live.get('phases', []):
+            print(f"  - {row['site']} {row['phase'].ljust(10)} 完了 {row['done']}/{row['total']} / 失敗 {row['failed']} / 実行中 {row['in_flight']}")
+        for row in live.get('models', []):
+            print(f"  - {row['model'].ljust(20)} 成功 {row['ok']} / 失敗 {row['error']} / 再試行 {row['retries']} / 平均 {row['avg_latency_sec'] or 0:.1f}s")
+
+    batch_root = os.path.join(reports_dir, "batch")
+    pending = sorted(d for d in os.listdir(batch_root) if '.done-' not in d) if os.path.isdir(batch_root) else []
+    print(f"[バッチ] 未完了 {len(pending)} 件")
+    for name in pending:
+        job_dir = os.path.join(batch_root, name)
+        total = _count_lines(os.path.join(job_dir, "requests.jsonl"))
+        done = _count_lines(os.path.join(job_dir, "results.jsonl"))
+        print(f"  - {name.ljust(24)} リクエスト {total} 件 / 取り込み記録 {done} 件")
+    return 0
+
+
+def _count_lines(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'r', encoding='utf-8') as f:
+        return sum(1 for line in f if line.strip())
+
+
+def measure_import_time(module, repeat=BENCH_REPEAT):
+    """新しいPythonプロセスで module をインポートし、最短時間(ms)と読み込まれた重い依存を返す。"""
+    import subprocess
+    code = (
+        "import sys, time, json\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = (time.perf_counter() - t) * 1000\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'ms': elapsed, 'heavy': heavy}))\n"
+    )
+    best, heavy, error = None, [], None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+            break
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+        best = data['ms'] if best is None else min(best, data['ms'])
+        heavy = data['heavy']
+    return best, heavy, error
+
+
+def cmd_bench(args):
+    """インポート時間のベンチマーク。`import cli` が予算を超えるか、重い依存を読み込んだら失敗とする。"""
+    if args.suite:
+        from benchmarks.run_benchmarks import run_suite, DEFAULT_SCALES
+        return run_suite(args.scales or DEFAULT_SCALES, update_baseline=args.update_baseline)
+
+    print(f"--- ⏱️ インポート時間ベンチマーク (各 {args.repeat} 回の最短値) ---")
+    failed = False
+    for module in BENCH_MODULES:
+        ms, heavy, error = measure_import_time(module, args.repeat)
+        if error:
+            print(f"  ❌ {module.ljust(28)} インポート失敗: {error}")
+            failed = True
+            continue
+        note = f" (重い依存: {', '.join(heavy)})" if heavy else ""
+        print(f"  {module.ljust(28)} {ms:8.1f} ms{note}")
+        if module == 'cli':
+            if ms > args.budget_ms:
+                print(f"  ❌ cli のコールドスタートが予算 {args.budget_ms} ms を超えました。")
+                failed = True
+            if heavy:
+                print(f"  ❌ cli の起動時に重い依存が読み込まれています: {', '.join(heavy)}")
+                failed = True
+    print("✅ ベンチマーク合格" if not failed else "❌ ベンチマーク不合格")
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="hp-generation-agent 統合CLI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="サイトを初回構築する (main_01)")
+    p.add_argument("--incremental", action="store_true", help="依存グラフに基づき、変更の影響を受けたノードだけを再生成する")
+    p.add_argument("--watch", action="store_true", help="ソースの変更を監視して自動で再ビルドする")
+    p.add_argument("--rebuild-all", action="store_true", help="(--incremental) ハッシュを無視して全ノードを再生成する")
+    p.add_argument("--batch", action="store_true", help="全ページの生成をバッチジョブとして投入する（再実行で未完了分から再開）")
+    p.add_argument("--dry-run", action="store_true", help="APIを呼ばずに全プロンプトを組み立て、トークン数・コスト・所要時間を見積もる")
+    p.add_argument("--count-tokens", action="store_true", help="(--dry-run) ローカルの見積もりではなく count_tokens API で数える")
+    p.add_argument("--opinion-file")
+    p.add_argument("--output-dir")
+    p.add_argument("--reports-dir")
+    p.add_argument("--metrics-port", type=int, help="進捗とメトリクスを http://127.0.0.1:<port>/metrics (Prometheus) と /status で公開する")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("improve", help="改善サイクルを実行する (main_02)")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir")
+    p.add_argument("--count", type=int, help="企画する記事数")
+    p.add_argument("--batch", action="store_true", help="目的の再定義と記事・ハブの生成をバッチジョブとして投入する（再実行で未完了分から再開）")
+    p.add_argument("--dry-run", action="store_true", help="APIを呼ばずに全プロンプトを組み立て、トークン数・コスト・所要時間を見積もる")
+    p.add_argument("--count-tokens", action="store_true", help="(--dry-run) ローカルの見積もりではなく count_tokens API で数える")
+    p.add_argument("--metrics-port", type=int, help="進捗とメトリクスを http://127.0.0.1:<port>/metrics (Prometheus) と /status で公開する")
+    p.set_defaults(func=cmd_improve)
+
+    p = sub.add_parser("inject-tags", help="GTM / AdSense タグを挿入する (main_03)")
+    p.add_argument("--gtm-id")
+    p.add_argument("--adsense-client-id")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir", help="書き込みを記録するページストアのレポートディレクトリ（既定: output_reports）")
+    p.set_defaults(func=cmd_inject_tags)
+
+    p = sub.add_parser("refresh", help="既存記事を章単位で差分更新する (main_05)")
+    p.add_argument("--goal", help="変更目標 (例: 2025年の最新動向を反映する)")
+    p.add_argument("--target", help="更新対象のファイルまたはディレクトリ (docs-dir からの相対パス、省略時は全体)")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir")
+    p.set_defaults(func=cmd_refresh)
+
+    p = sub.add_parser("sites", help="マニフェストの複数サイトを1プロセスで実行する (main_06)")
+    p.add_argument("manifest", nargs="?", default="config/sites.json")
+    p.add_argument("--metrics-port", type=int, help="進捗とメトリクスを http://127.0.0.1:<port>/metrics (Prometheus) と /status で公開する")
+    p.set_defaults(func=cmd_sites)
+
+    p = sub.add_parser("translate", help="公開サイトを翻訳し <docs>/<lang>/ に書き出す (main_07)")
+    p.add_argument("--lang", default="en", help="翻訳先の言語コード（既定: en。utils/translation_utils.py の TARGET_LANGUAGE_NAMES にある言語）")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir")
+    p.add_argument("--dry-run", action="store_true", help="APIを呼ばずに、送信が必要な文字列数とトークン数を表示する")
+    p.set_defaults(func=cmd_translate)
+
+    p = sub.add_parser("hubs", help="所属記事が変わったハブをまとめて再生成し、全て揃ってから書き込む (main_08)")
+    p.add_argument("--all", action="store_true", help="変化の有無にかかわらず全ハブを再生成する")
+    p.add_argument("--batch", action="store_true", help="全ハブを1つのバッチジョブとして投入する（再実行で未完了分から再開）")
+    p.add_argument("--dry-run", action="store_true", help="APIを呼ばずに、再生成が必要なハブを表示する")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir")
+    p.add_argument("--metrics-port", type=int, help="進捗とメトリクスを http://127.0.0.1:<port>/metrics (Prometheus) と /status で公開する")
+    p.set_defaults(func=cmd_hubs)
+
+    p = sub.add_parser("search-index", help="公開サイトのサイト内検索インデックスを更新する（変更のあったページのみ再解析）")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir")
+    p.set_defaults(func=cmd_search_index)
+
+    p = sub.add_parser("sitemap", help="sitemap.xml / robots.txt を本文の変更に基づいて更新する")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir")
+    p.add_argument("--base-url", help="公開URLのルート（既定: utils/sitemap_utils.py の BASE_URL）")
+    p.set_defaults(func=cmd_sitemap)
+
+    p = sub.add_parser("audit", help="ページの重さ・レンダリングブロックを予算と比較する（超過があれば終了コード 1）")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir")
+    p.add_argument("--budgets", help="予算設定のJSON（既定: config/page_budgets.json）")
+    p.set_defaults(func=cmd_audit)
+
+    p = sub.add_parser("pages", help="ページストアの履歴・ロールバック・不要オブジェクトの削除")
+    p.add_argument("action", choices=["log", "rollback", "gc"])
+    p.add_argument("--docs-dir", help="対象サイトのディレクトリ（既定: docs。初回構築の出力は output_website/...）")
+    p.add_argument("--page", help="(log / rollback) docs-dir からの相対パス")
+    p.add_argument("--section", help="(rollback) 配下の全ページを戻すディレクトリ（例: solutions）")
+    p.add_argument("--run", help="(rollback) 書き込んだ全ページを戻す実行ID（pages log で確認）")
+    p.add_argument("--force", action="store_true", help="(rollback --run) 実行の後に変更されたページも戻す")
+    p.add_argument("--keep", type=int, help="(gc) 保持する直近の実行数（既定: utils/page_store.py の KEEP_RUNS）")
+    p.add_argument("--reports-dir", help="ページストアのあるレポートディレクトリ（既定: output_reports。ストアは <reports-dir>/page_store）")
+    p.set_defaults(func=cmd_pages)
+
+    p = sub.add_parser("status", help="レポート・公開サイト・ビルド状態を表示する")
+    p.add_argument("--docs-dir")
+    p.add_argument("--reports-dir")
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser("bench", help="インポート時間（コールドスタート）のベンチマーク")
+    p.add_argument("--repeat", type=int, default=BENCH_REPEAT)
+    p.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    p.add_argument("--suite", action="store_true", help="合成サイト (1k/10k/100k ページ) によるローカル処理のベンチマークスイートを実行する")
+    p.add_argument("--scales", type=int, nargs="+", help="(--suite) 合成サイトのページ数")
+    p.add_argument("--update-baseline", action="store_true", help="(--suite) 今回の結果をベースラインとして保存する")
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,58 +2,220 @@ import os
 import sys
 import json
 import shutil
-from google import genai
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # モジュールをインポート
-from agents.agent_01_identity import generate_corporate_identity
+from agents.agent_01_identity import generate_corporate_identity, build_identity_prompt
 from agents.agent_02_strategy import (
     generate_final_sitemap,
     generate_content_strategy,
-    generate_target_page_list
+    generate_target_page_list,
+    generate_target_page_list_stream,
+    build_sitemap_prompt,
+    build_strategy_prompt,
+    build_target_page_list_prompt
 )
-from agents.agent_03_generation import generate_single_page_html
+from agents.agent_03_generation import (generate_single_page_html, build_page_prompt, build_page_prompt_prefix,
+                                        announce_tag_instructions, extract_html_code)
+from utils.llm_resilience import print_resilience_report
+from utils.client_utils import setup_client
+from utils.errors import PipelineError, InputNotFoundError, GenerationError
+from utils.context_cache import print_cache_report, release_caches
+from utils.model_router import load_model_stats, save_model_stats, stats_file_for, route, classify_page, config_dict, last_generation
+from utils.batch_utils import batch_dir_for, load_batch_requests, make_request, run_batch, archive_batch
+from utils.cost_planner import planned_call
+from utils.page_store import write_page, capture_site, store_dir_for, STORE_DIR
+from utils.metrics import METRICS, STATUS_FILE, instrument_client, run_tracked, start_reporting, stop_reporting
 
 # --- 0. 設定 ---
 OPINION_FILE = "config/opinion.txt"
 REPORTS_DIR = "output_reports" # 👈 [追加] レポート保存先
 OUTPUT_DIR = "output_website/PEOPLE-OPT-Unified-Site"
 ZIP_FILENAME = "output_website/people_opt_site_unified.zip"
+MAX_CONCURRENT_PAGES = 4 # 同時に生成するページ数
+BATCH_NAME = "initial_build_pages" # バッチ投入モードのジョブ名
+DRY_RUN_FALLBACK_PAGE_COUNT = 10 # ドライランで過去のターゲットリストが無い場合に想定するページ数
 
-def setup_client():
-    """Geminiクライアントを初期化"""
+def generate_and_write_page(client, page, identity, strategy, nav_list, output_dir, store_dir=STORE_DIR):
+    """1ページ分のHTMLを生成して書き込み、結果のステータス文字列を返す。"""
+    final_html_code = generate_single_page_html(
+        client,
+        page,
+        identity,
+        strategy,
+        nav_list,
+        retry_attempts=3
+    )
+
+    if "❌" in final_html_code:
+        return final_html_code
+    return write_page_file(page, final_html_code, output_dir, last_generation(), store_dir)
+
+def write_page_file(page, final_html_code, output_dir, provenance=None, store_dir=STORE_DIR):
+    """
+    生成済みのHTMLを output_dir に書き込み、結果のステータス文字列を返す。
+    書き込みはページストアを経由し、provenance（model / prompt_hash）と共に記録される。
+    """
+    target_file_path = os.path.join(output_dir, page['file_name'])
     try:
-        # Colab環境を想定
-        from google.colab import userdata
-        GOOGLE_API_KEY = userdata.get('GEMINI_API_KEY')
-        if not GOOGLE_API_KEY:
-            raise ValueError("GEMINI_API_KEY が Colab Secrets に設定されていません。")
-        return genai.Client(api_key=GOOGLE_API_KEY)
-    except ImportError:
-        # ローカル環境を想定
-        GOOGLE_API_KEY = os.environ.get('GEMINI_API_KEY')
-        if not GOOGLE_API_KEY:
-            raise EnvironmentError("GEMINI_API_KEY が環境変数に設定されていません。")
-        return genai.Client(api_key=GOOGLE_API_KEY)
+        write_page(output_dir, page['file_name'], final_html_code, store_dir=store_dir, **(provenance or {}))
+        return f"✅ 生成完了: {target_file_path}"
     except Exception as e:
-        print(f"❌ クライアント初期化エラー: {e}")
-        return None
+        return f"❌ ファイル書き込みエラー: {e}"
 
-def main():
-    print("--- 🚀 HP初回構築エージェント (フェーズ1-4) 開始 ---")
+def page_batch_request(page, identity, strategy, nav_list):
+    """1ページ分の生成をバッチの1リクエストにする（モデルと設定は同期生成と同じルーティングに従う）。"""
+    selected = route("page_html", classify_page(page['file_name']))
+    return make_request(
+        page['file_name'], selected['model'],
+        build_page_prompt(page, identity, strategy, nav_list),
+        config=config_dict(selected), meta=page
+    )
 
-    # --- 0. クライアント初期化 ---
-    gemini_client = setup_client()
-    if gemini_client is None:
-        sys.exit(1)
+def generate_pages_batch(client, requests, output_dir, job_dir, store_dir=STORE_DIR):
+    """
+    ページ生成リクエストをバッチとして実行し、結果を通常の検証・書き込み経路で取り込む。
+    結果が揃わなかったページは、再実行時に未完了分だけが再開される。
+    """
+    results = run_batch(client, job_dir, requests, validate=extract_html_code)
+    generated_files = {}
+    METRICS.add_phase_total(output_dir, "pages", len(requests))
+    for request in requests:
+        text = results.get(request['key'])
+        if text is None:
+            generated_files[request['key']] = "⏳ バッチ結果なし（再実行で再開します）"
+            continue
+        generated_files[request['key']] = write_page_file(
+            request['meta'], extract_html_code(text), output_dir,
+            {"model": request['model'], "prompt_hash": request['prompt_hash']}, store_dir
+        )
+        METRICS.page_finished(output_dir, "pages", "❌" not in generated_files[request['key']], was_in_flight=False)
+    if len(results) == len(requests):
+        archive_batch(job_dir)
+    return generated_files
+
+def save_strategy_reports(reports_dir, identity, sitemap, strategy, target_pages_list):
+    """法人格・サイトマップ・戦略・ターゲットリストをレポートとして保存する。"""
+    os.makedirs(reports_dir, exist_ok=True)
+    try:
+        with open(os.path.join(reports_dir, "01_corporate_identity.md"), 'w', encoding='utf-8') as f:
+            f.write(identity)
+        with open(os.path.join(reports_dir, "02_sitemap.md"), 'w', encoding='utf-8') as f:
+            f.write(sitemap)
+        with open(os.path.join(reports_dir, "03_content_strategy.md"), 'w', encoding='utf-8') as f:
+            f.write(strategy)
+
+        # ターゲットリストもJSONで保存
+        with open(os.path.join(reports_dir, "04_target_pages_list.json"), 'w', encoding='utf-8') as f:
+            json.dump(target_pages_list, f, indent=2, ensure_ascii=False)
+
+        print(f"✅ [レポート] 法人格と戦略を {reports_dir} に保存しました。")
+    except Exception as e:
+        print(f"⚠️ [レポート] 戦略ファイルの保存中にエラー: {e}")
+
+def finish_build(generated_files, output_dir, zip_filename, gemini_client=None, reports_dir=REPORTS_DIR):
+    """生成結果のサマリーを表示し、この実行のキャッシュを削除して、出力ディレクトリをZIP化する。"""
+    print("\n--- 🎉 全ページ生成結果サマリー ---")
+    for filename, status in generated_files.items():
+        print(f"{filename.ljust(30)}: {status}")
+    print_resilience_report()
+    print_cache_report(gemini_client)
+    release_caches(gemini_client)
+    save_model_stats(stats_file_for(reports_dir), gemini_client)
+
+    # --- ZIP化 ---
+    print(f"\n--- 📦 {zip_filename} にZIP圧縮中 ---")
+    try:
+        shutil.make_archive(zip_filename.replace('.zip', ''), 'zip', output_dir)
+        print(f"✅ ZIPファイルの作成が完了しました: {zip_filename}")
+    except Exception as e:
+        print(f"❌ ZIPファイルの作成中にエラーが発生しました: {e}")
+
+def _read_report(reports_dir, name, default):
+    try:
+        with open(os.path.join(reports_dir, name), 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return default
+
+def plan_initial_build(opinion_file=OPINION_FILE, reports_dir=REPORTS_DIR):
+    """
+    [ドライラン] run_initial_build が送るはずの全プロンプトを、APIを呼ばずに組み立てて返す。
+    法人格・戦略・ターゲットリストは前回のレポートがあればそれを代わりに使い、
+    無ければ意見ファイルや想定ページ数から近似する。
+    """
+    load_model_stats(stats_file_for(reports_dir))
+    with open(opinion_file, 'r', encoding='utf-8') as f:
+        raw_input = f.read()
+    identity = _read_report(reports_dir, "01_corporate_identity.md", raw_input)
+    sitemap = _read_report(reports_dir, "02_sitemap.md", identity)
+    strategy = _read_report(reports_dir, "03_content_strategy.md", sitemap)
+    try:
+        pages = json.loads(_read_report(reports_dir, "04_target_pages_list.json", "[]"))
+    except ValueError:
+        pages = []
+    if not pages:
+        print(f"ℹ️ 前回のターゲットリストが無いため、{DRY_RUN_FALLBACK_PAGE_COUNT} ページと仮定して見積もります。")
+        pages = [{"title": f"ページ {i + 1}", "file_name": f"section-{i + 1}/index.html", "purpose": strategy[:200]}
+                 for i in range(DRY_RUN_FALLBACK_PAGE_COUNT)]
+
+    calls = [
+        planned_call("2 法人格", "法人格", "identity", build_identity_prompt(raw_input), model="gemini-2.5-flash"),
+        planned_call("3 サイトマップ", "サイトマップ", "sitemap", build_sitemap_prompt(identity), model="gemini-2.5-flash"),
+        planned_call("3 コンテンツ戦略", "コンテンツ戦略", "strategy", build_strategy_prompt(identity, sitemap), model="gemini-2.5-flash"),
+        planned_call("4 ターゲットリスト", "ターゲットリスト", "target_list", build_target_page_list_prompt(identity, strategy), model="gemini-2.5-flash"),
+    ]
+    nav_structure = "\n".join([f' - {p.get("title", "N/A")} ({p.get("file_name", "N/A")})' for p in pages])
+    announce_tag_instructions()
+    page_prefix = build_page_prompt_prefix(identity, strategy, pages)
+    for page in pages:
+        calls.append(planned_call(
+            "4 ページ生成", page['file_name'], "page_html",
+            build_page_prompt(page, identity, strategy, pages),
+            page_class=classify_page(page['file_name']), concurrency=MAX_CONCURRENT_PAGES,
+            components={"法人格": identity, "全体戦略": strategy, "ナビゲーション": nav_structure},
+            cached_prefix=page_prefix
+        ))
+    return calls
+
+def run_initial_build(gemini_client, opinion_file=OPINION_FILE, output_dir=OUTPUT_DIR, reports_dir=REPORTS_DIR, zip_filename=ZIP_FILENAME, batch_mode=False):
+    """
+    フェーズ1-4（法人格 → 戦略 → ターゲットリスト → 全ページ生成 → ZIP化）を実行する。
+    パスを引数で受け取るため、複数サイトを1プロセスで構築する場合にも使用できる。
+    batch_mode=True の場合、全ページの生成を1つのバッチとして投入する（未完了のバッチがあれば再開する）。
+    実行中は reports_dir/status.json（と、設定されていればHTTPエンドポイント）に進捗とメトリクスを出力する。
+    入力が見つからない・生成結果が使えないなどで続行できない場合は PipelineError（のサブクラス）を送出する。
+    """
+    load_model_stats(stats_file_for(reports_dir))
+    status_file = os.path.join(reports_dir, os.path.basename(STATUS_FILE))
+    start_reporting(status_file, site=output_dir)
+    client = instrument_client(gemini_client, site=output_dir)
+    try:
+        return _run_initial_build(client, opinion_file, output_dir, reports_dir, zip_filename, batch_mode)
+    finally:
+        if client is not None:
+            release_caches(client)  # 中断した場合も、この実行のキャッシュと集計を残さない
+        stop_reporting(status_file)
+
+def _run_initial_build(gemini_client, opinion_file, output_dir, reports_dir, zip_filename, batch_mode):
+    job_dir = batch_dir_for(reports_dir, BATCH_NAME)
+    store_dir = store_dir_for(reports_dir)
+    if batch_mode:
+        pending_requests = load_batch_requests(job_dir)
+        if pending_requests:
+            print(f"⏳ 未完了のバッチ ({job_dir}) を再開します。（フェーズ1-3はスキップ）")
+            generated_files = generate_pages_batch(gemini_client, pending_requests, output_dir, job_dir, store_dir)
+            finish_build(generated_files, output_dir, zip_filename, gemini_client, reports_dir)
+            return generated_files
 
     # --- 1. 個人の意見をロード ---
     try:
-        with open(OPINION_FILE, 'r', encoding='utf-8') as f:
+        with open(opinion_file, 'r', encoding='utf-8') as f:
             RAW_VISION_INPUT = f.read()
-        print(f"✅ [フェーズ1] {OPINION_FILE} を読み込みました。")
+        print(f"✅ [フェーズ1] {opinion_file} を読み込みました。")
     except Exception as e:
-        print(f"❌ {OPINION_FILE} の読み込みに失敗: {e}")
-        sys.exit(1)
+        print(f"❌ {opinion_file} の読み込みに失敗: {e}")
+        raise InputNotFoundError(f"{opinion_file} の読み込みに失敗: {e}") from e
 
     # --- 2. 法人格の生成 ---
     CORPORATE_IDENTITY = generate_corporate_identity(gemini_client, RAW_VISION_INPUT)
@@ -62,76 +224,104 @@ def main():
     # --- 3. 戦略の生成 ---
     sitemap_result = generate_final_sitemap(gemini_client, CORPORATE_IDENTITY)
     content_strategy_result = generate_content_strategy(gemini_client, CORPORATE_IDENTITY, sitemap_result)
-    TARGET_PAGES_LIST = generate_target_page_list(gemini_client, CORPORATE_IDENTITY, content_strategy_result)
+    print("✅ [フェーズ3] サイトマップとコンテンツ戦略を生成しました。")
 
-    if not TARGET_PAGES_LIST:
-        print("❌ ターゲットリストの生成に失敗したため、処理を中断します。")
-        sys.exit(1)
-    print("✅ [フェーズ3] サイト戦略とターゲットリストを生成しました。")
+    # --- 4. ターゲットリストのストリーミング受信と、全体（ハブページ）の並行生成 ---
+    # ターゲットリストの各エントリが確定した時点でページ生成を投入し、
+    # 残りの計画（リストの後半）と最初のページ生成をオーバーラップさせる。
+    print("\n--- [フェーズ4] ターゲットリストを受信しながら、全体（ハブページ）のHTML生成を開始 ---")
+    if os.path.exists(output_dir):
+        capture_site(output_dir, source="rebuild", store_dir=store_dir) # 作り直す前の全ページをページストアに残す（ロールバック用）
+        shutil.rmtree(output_dir)
 
-    # --- 🔽 [修正] 戦略レポートをファイルに保存 ---
-    os.makedirs(REPORTS_DIR, exist_ok=True)
-    try:
-        with open(os.path.join(REPORTS_DIR, "01_corporate_identity.md"), 'w', encoding='utf-8') as f:
-            f.write(CORPORATE_IDENTITY)
-        with open(os.path.join(REPORTS_DIR, "02_sitemap.md"), 'w', encoding='utf-8') as f:
-            f.write(sitemap_result)
-        with open(os.path.join(REPORTS_DIR, "03_content_strategy.md"), 'w', encoding='utf-8') as f:
-            f.write(content_strategy_result)
+    if batch_mode:
+        TARGET_PAGES_LIST = generate_target_page_list(gemini_client, CORPORATE_IDENTITY, content_strategy_result)
+        if not TARGET_PAGES_LIST:
+            print("❌ ターゲットリストの生成に失敗したため、処理を中断します。")
+            raise GenerationError("ターゲットリストの生成に失敗しました。")
+        save_strategy_reports(reports_dir, CORPORATE_IDENTITY, sitemap_result, content_strategy_result, TARGET_PAGES_LIST)
+        requests = [page_batch_request(p, CORPORATE_IDENTITY, content_strategy_result, TARGET_PAGES_LIST) for p in TARGET_PAGES_LIST]
+        generated_files = generate_pages_batch(gemini_client, requests, output_dir, job_dir, store_dir)
+        finish_build(generated_files, output_dir, zip_filename, gemini_client, reports_dir)
+        return generated_files
 
-        # ターゲットリストもJSONで保存
-        with open(os.path.join(REPORTS_DIR, "04_target_pages_list.json"), 'w', encoding='utf-8') as f:
-            json.dump(TARGET_PAGES_LIST, f, indent=2, ensure_ascii=False)
+    generated_files = {}
+    TARGET_PAGES_LIST = []
+    nav_list = None
+    pending_pages = []
+    futures = {}
 
-        print(f"✅ [レポート] 法人格と戦略を {REPORTS_DIR} に保存しました。")
-    except Exception as e:
-        print(f"⚠️ [レポート] 戦略ファイルの保存中にエラー: {e}")
-    # --- 🔼 [修正] ここまで ---
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PAGES) as executor:
+        def dispatch(page):
+            if page['file_name'] in futures.values():
+                return
+            print(f"\n--- 🏭 ページ生成を投入: {page['title']} ({page['file_name']}) ---")
+            METRICS.add_phase_total(output_dir, "pages")
+            future = executor.submit(
+                run_tracked, output_dir, "pages", generate_and_write_page,
+                gemini_client, page, CORPORATE_IDENTITY, content_strategy_result, nav_list, output_dir, store_dir
+            )
+            futures[future] = page['file_name']
 
-    # --- 4. 全体（ハブページ）の生成 ---
-    print("\n--- [フェーズ4] 全体（ハブページ）のHTML生成を開始 ---")
-    if os.path.exists(OUTPUT_DIR):
-        shutil.rmtree(OUTPUT_DIR)
+        try:
+            for kind, value in generate_target_page_list_stream(gemini_client, CORPORATE_IDENTITY, content_strategy_result):
+                if kind == 'nav':
+                    nav_list = value
+                    for page in pending_pages:
+                        dispatch(page)
+                    pending_pages = []
+                elif nav_list is None:
+                    TARGET_PAGES_LIST.append(value)
+                    pending_pages.append(value)
+                else:
+                    TARGET_PAGES_LIST.append(value)
+                    dispatch(value)
+        except Exception as e:
+            print(f"⚠️ ターゲットリストのストリーミング生成に失敗しました ({e})。通常モードで再取得します。")
+            TARGET_PAGES_LIST = generate_target_page_list(gemini_client, CORPORATE_IDENTITY, content_strategy_result)
+            nav_list = None
+            pending_pages = list(TARGET_PAGES_LIST)
 
-    generated_files = {}
+        if not TARGET_PAGES_LIST:
+            print("❌ ターゲットリストの生成に失敗したため、処理を中断します。")
+            raise GenerationError("ターゲットリストの生成に失敗しました。")
 
-    for page in TARGET_PAGES_LIST:
-        print(f"\n--- 🏭 ページ生成: {page['title']} ({page['file_name']}) ---")
+        if nav_list is None:
+            nav_list = TARGET_PAGES_LIST
+        for page in pending_pages:
+            dispatch(page)
 
-        final_html_code = generate_single_page_html(
-            gemini_client,
-            page,
-            CORPORATE_IDENTITY,
-            content_strategy_result,
-            TARGET_PAGES_LIST,
-            retry_attempts=3
-        )
+        missing = {p.get('file_name') for p in nav_list} - {p['file_name'] for p in TARGET_PAGES_LIST}
+        if missing:
+            print(f"⚠️ ナビゲーションにあるがエントリが届かなかったページ: {', '.join(sorted(missing))}")
+        print(f"✅ [フェーズ4] ターゲットリストを受信しました ({len(TARGET_PAGES_LIST)} 件)。残りのページ生成を待機中...")
 
-        if "❌" not in final_html_code:
-            target_file_path = os.path.join(OUTPUT_DIR, page['file_name'])
-            target_dir = os.path.dirname(target_file_path)
-            os.makedirs(target_dir, exist_ok=True)
+        # --- 戦略レポートをファイルに保存（ページ生成と並行） ---
+        save_strategy_reports(reports_dir, CORPORATE_IDENTITY, sitemap_result, content_strategy_result, TARGET_PAGES_LIST)
 
+        for future in as_completed(futures):
+            file_name = futures[future]
             try:
-                with open(target_file_path, "w", encoding="utf-8") as f:
-                    f.write(final_html_code)
-                generated_files[page['file_name']] = f"✅ 生成完了: {target_file_path}"
+                generated_files[file_name] = future.result()
             except Exception as e:
-                generated_files[page['file_name']] = f"❌ ファイル書き込みエラー: {e}"
-        else:
-            generated_files[page['file_name']] = final_html_code
+                generated_files[file_name] = f"❌ 生成中にエラー: {e}"
 
-    print("\n--- 🎉 全ページ生成結果サマリー ---")
-    for filename, status in generated_files.items():
-        print(f"{filename.ljust(30)}: {status}")
+    finish_build(generated_files, output_dir, zip_filename, gemini_client, reports_dir)
+
+    return generated_files
+
+def main():
+    print("--- 🚀 HP初回構築エージェント (フェーズ1-4) 開始 ---")
+
+    # --- 0. クライアント初期化 ---
+    gemini_client = setup_client()
+    if gemini_client is None:
+        sys.exit(1)
 
-    # --- ZIP化 ---
-    print(f"\n--- 📦 {ZIP_FILENAME} にZIP圧縮中 ---")
     try:
-        shutil.make_archive(ZIP_FILENAME.replace('.zip', ''), 'zip', OUTPUT_DIR)
-        print(f"✅ ZIPファイルの作成が完了しました: {ZIP_FILENAME}")
-    except Exception as e:
-        print(f"❌ ZIPファイルの作成中にエラーが発生しました: {e}")
+        run_initial_build(gemini_client)
+    except PipelineError:
+        sys.exit(1)
 
     print("--- 🚀 HP初回構築エージェント 完了 ---")
 
@@ -2,54 +2,73 @@ import os
 import sys
 import json
 import shutil
-from google import genai
 # from IPython.display import display, Markdown # .pyファイルからは削除
 
 # モジュールをインポート
-from agents.agent_03_generation import generate_single_page_html
+from agents.agent_03_generation import (
+    generate_single_page_html,
+    generate_single_page_html_chunked,
+    build_page_prompt,
+    build_page_prompt_prefix,
+    build_outline_prompt,
+    build_shell_prompt,
+    build_shell_prompt_prefix,
+    build_section_prompt,
+    build_section_prompt_prefix,
+    announce_tag_instructions,
+    extract_html_code
+)
 from agents.agent_04_improvement import (
     analyze_article_structure,
     generate_article_purpose,
+    build_article_purpose_prompt,
+    build_article_purpose_prompt_prefix,
     select_priority_section_by_data,
-    generate_priority_article_titles
+    generate_priority_article_titles,
+    build_priority_section_prompt,
+    build_article_titles_prompt
 )
 from utils.file_utils import (
     get_existing_article_count,
     integrate_content_data,
     save_to_markdown,
-    load_markdown_table_to_list
+    load_markdown_table_to_list,
+    list_site_pages,
+    DERIVED_SITE_DIRS
 )
-from utils.analysis_utils import create_placeholder_data
+from utils.analysis_utils import create_placeholder_data, build_hub_balance
+from utils.llm_resilience import print_resilience_report
+from utils.client_utils import setup_client
+from utils.errors import PipelineError, InputNotFoundError, GenerationError
+from utils.context_cache import print_cache_report, release_caches
+from utils.model_router import load_model_stats, save_model_stats, stats_file_for, route, classify_page, config_dict, last_generation
+from utils.batch_utils import batch_dir_for, load_batch_requests, make_request, run_batch, archive_batch
+from utils.cost_planner import planned_call
+from utils.search_index import build_search_index, STATE_FILE as SEARCH_STATE_FILE
+from utils.sitemap_utils import update_sitemap, STATE_FILE as SITEMAP_STATE_FILE
+from utils.page_audit import run_page_audit, REPORT_FILE as AUDIT_REPORT_FILE
+from utils.page_store import write_page, store_dir_for, STORE_DIR
+from utils.hub_planner import section_members, record_hubs
+from utils.metrics import METRICS, STATUS_FILE, instrument_client, run_tracked, start_reporting, stop_reporting
 
 # --- 0. 設定 ---
 BASE_DIR = "docs"
 REPORTS_DIR = "output_reports"
 REPORT_FILE = os.path.join(REPORTS_DIR, "planned_articles.md")
+OPINION_FILE = "config/opinion.txt"
 DEFAULT_ARTICLE_COUNT = 3
-
-def setup_client():
-    """Geminiクライアントを初期化"""
-    try:
-        from google.colab import userdata
-        GOOGLE_API_KEY = userdata.get('GEMINI_API_KEY')
-        if not GOOGLE_API_KEY:
-            raise ValueError("GEMINI_API_KEY が Colab Secrets に設定されていません。")
-        return genai.Client(api_key=GOOGLE_API_KEY)
-    except ImportError:
-        GOOGLE_API_KEY = os.environ.get('GEMINI_API_KEY')
-        if not GOOGLE_API_KEY:
-            raise EnvironmentError("GEMINI_API_KEY が環境変数に設定されていません。")
-        return genai.Client(api_key=GOOGLE_API_KEY)
-    except Exception as e:
-        print(f"❌ クライアント初期化エラー: {e}")
-        return None
+ARTICLE_GENERATION_MODE = "chunked" # "chunked": 章ごとの並列生成 / "single": 一括生成
+PURPOSE_BATCH_NAME = "improve_purposes" # バッチ投入モードのジョブ名
+PAGES_BATCH_NAME = "improve_pages"
+DRY_RUN_SECTION_COUNT = 5 # ドライランで想定する1記事あたりの章数
+CHUNKED_MAX_WORKERS = 6 # 章ごとの並列生成の同時実行数 (generate_single_page_html_chunked の既定値)
 
 # ⬇️ [修正] 法人格をファイルから読み込むように変更
-def load_corporate_identity():
+def load_corporate_identity(reports_dir=REPORTS_DIR, opinion_file=OPINION_FILE, client=None):
     """
     'main_01' が保存した法人格レポートをファイルから読み込む。
     """
-    identity_file = os.path.join(REPORTS_DIR, "01_corporate_identity.md")
+    identity_file = os.path.join(reports_dir, "01_corporate_identity.md")
     try:
         with open(identity_file, 'r', encoding='utf-8') as f:
             identity = f.read()
@@ -60,9 +79,9 @@ def load_corporate_identity():
         # (フォールバック)
         try:
             from agents.agent_01_identity import generate_corporate_identity
-            with open("config/opinion.txt", 'r', encoding='utf-8') as f:
+            with open(opinion_file, 'r', encoding='utf-8') as f:
                 RAW_VISION_INPUT = f.read()
-            client = setup_client()
+            client = client or setup_client()
             if client:
                 print("⚠️ [フォールバック] 法人格をAPIで再生成します。")
                 return generate_corporate_identity(client, RAW_VISION_INPUT)
@@ -72,79 +91,307 @@ def load_corporate_identity():
             print(f"❌ 代替処理も失敗: {e_fallback}。ダミーを使用します。")
             return "パーパス: データによる個人の生活最適化。 トーン: 論理的、先進的。"
 
-def main():
-    print(f"--- 🔄 HP改善サイクル (フェーズ5-8) [戦略的バランスモード] 開始 ---")
+def scan_existing_site(gemini_client, base_dir, identity, job_dir=None):
+    """
+    [フェーズ5a 代替] base_dir 配下の全HTMLを解析し、各ページの目的をAPIで再定義する。
+    job_dir を指定した場合は、目的の生成を1つのバッチとして投入する。
+    """
+    analyzed = []
+    for file_name, full_path in list_site_pages(base_dir, DERIVED_SITE_DIRS).items():
+        article_data, error = analyze_article_structure(full_path)
+        if article_data:
+            analyzed.append((file_name, article_data))
+
+    if job_dir:
+        requests = [
+            make_request(file_name, "gemini-2.5-flash", build_article_purpose_prompt(article_data, identity))
+            for file_name, article_data in analyzed
+        ]
+        results = run_batch(gemini_client, job_dir, requests)
+        if len(results) == len(requests):
+            archive_batch(job_dir)
+        purposes = {k: v.strip() for k, v in results.items()}
+    else:
+        purposes = {}
+
+    processed_articles = []
+    if not job_dir:
+        METRICS.add_phase_total(base_dir, "purpose", len(analyzed))
+    for file_name, article_data in analyzed:
+        if job_dir:
+            purpose = purposes.get(file_name, "❌ バッチ結果なし（再実行で再開します）")
+        else:
+            purpose = run_tracked(base_dir, "purpose", generate_article_purpose, gemini_client, article_data, identity)
+        processed_articles.append({
+            "file_name": file_name,
+            "title": article_data['page_title'],
+            "summary": purpose # ⬅️ [修正] 'summary' キーで保存
+        })
+    return processed_articles
+
+def build_nav_list(all_content_plans):
+    """ページ生成に渡すナビゲーション（全ページのファイル名・タイトル・目的）を組み立てる。"""
+    return [
+        {
+            "file_name": p['file_name'],
+            "title": p['title'],
+            "purpose": p.get('summary', p.get('generated_purpose', '')) 
+        } for p in all_content_plans
+    ]
 
-    # --- 0. クライアント初期化 ---
-    gemini_client = setup_client()
-    if gemini_client is None: sys.exit(1)
+def build_hub_regeneration_page(all_content_plans, hub_path_to_update, nav_list=None):
+    """
+    [フェーズ8] ハブページを、配下の全詳細記事（新旧含む）への導線を持つページとして再生成するための
+    ページ情報とナビゲーションを組み立てる。計画リストにハブが無い場合は (None, None)。
+    複数のハブをまとめて再生成する場合は、1回だけ組み立てた nav_list を渡すと全ハブで共有される。
+    """
+    hub_dir = os.path.dirname(hub_path_to_update)
+    try:
+        parent_page_info = next(p for p in all_content_plans if p['file_name'] == hub_path_to_update)
+    except StopIteration:
+        return None, None
+
+    parent_page_info_for_regeneration = {
+        'file_name': parent_page_info['file_name'],
+        'title': parent_page_info['title'],
+        'purpose': parent_page_info.get('summary', parent_page_info.get('generated_purpose')) 
+    }
+
+    all_articles_in_section = []
+    for plan in all_content_plans:
+        if (os.path.dirname(plan['file_name']) == hub_dir) and \
+           (plan['file_name'] != hub_path_to_update):
+            all_articles_in_section.append(plan)
+
+    print(f"  -> {len(all_articles_in_section)} 件の詳細記事（新旧含む）をスキャンしました。")
+
+    new_article_links_html = "<ul>"
+    if not all_articles_in_section:
+        new_article_links_html = "<p>（現在、このセクションの詳細記事はありません）</p>"
+    else:
+        for plan in all_articles_in_section:
+            link_path = os.path.basename(plan['file_name'])
+            article_summary = plan.get('summary', plan.get('generated_purpose', '')) 
+            new_article_links_html += f"<li><a href='{link_path}' class='text-blue-500 hover:underline'>{plan['title']}</a>: {article_summary}</li>"
+        new_article_links_html += "</ul>"
+
+    parent_page_info_for_regeneration['purpose'] = f"""
+    このページ（{parent_page_info_for_regeneration['title']}）は、以下の「{len(all_articles_in_section)}件の全詳細記事」への導線を含むハブページとして機能します。
+    元の目的（{parent_page_info_for_regeneration['purpose']}）を要約しつつ、これらの新しい記事への明確な導線（目次）を提供してください。
+
+    【{hub_dir} セクションの全詳細記事リスト】
+    {new_article_links_html}
+    """
+
+    nav_list_for_generation = nav_list if nav_list is not None else build_nav_list(all_content_plans)
+    return parent_page_info_for_regeneration, nav_list_for_generation
+
+def write_generated_page(base_dir, file_name, html_code, provenance=None, store_dir=STORE_DIR):
+    """生成したHTMLをページストア経由で base_dir/file_name に書き込む。成功したら True。"""
+    generate_file_path = os.path.join(base_dir, file_name)
+    try:
+        write_page(base_dir, file_name, html_code, store_dir=store_dir, **(provenance or {}))
+        print(f"✅ ファイルを保存しました: {generate_file_path}")
+        return True
+    except Exception as e:
+        print(f"❌ ファイル書き込みエラー: {e}")
+        return False
+
+def _page_batch_request(page, identity, nav_list, meta):
+    selected = route("page_html", classify_page(page['file_name']))
+    return make_request(page['file_name'], selected['model'], build_page_prompt(page, identity, None, nav_list),
+                        config=config_dict(selected), meta=meta)
+
+def ingest_pages_batch(gemini_client, base_dir, requests, job_dir, reports_dir=REPORTS_DIR):
+    """
+    [フェーズ7-8 バッチ] 記事とハブの生成リクエストをバッチとして実行し、検証を通ったものを書き込む。
+    生成できた新規記事の計画のリストを返す。書き込んだハブの所属記事は reports_dir に記録する。
+    """
+    results = run_batch(gemini_client, job_dir, requests, validate=extract_html_code)
+    new_article_files_generated = []
+    METRICS.add_phase_total(base_dir, "articles", len(requests))
+    for request in requests:
+        text = results.get(request['key'])
+        if text is None:
+            print(f"⏳ [バッチ] 結果が揃っていません（再実行で再開します）: {request['key']}")
+            continue
+        provenance = {"model": request['model'], "prompt_hash": request['prompt_hash']}
+        written = write_generated_page(base_dir, request['key'], extract_html_code(text), provenance,
+                                       store_dir_for(reports_dir))
+        METRICS.page_finished(base_dir, "articles", written, was_in_flight=False)
+        if written and request['meta'].get('plan'):
+            new_article_files_generated.append(request['meta']['plan'])
+        if written and request['meta'].get('hub'):
+            record_hubs(reports_dir, {request['meta']['hub']: request['meta']['hub_members']})
+    if len(results) == len(requests):
+        archive_batch(job_dir)
+    return new_article_files_generated
+
+def refresh_site_indexes(base_dir, reports_dir=REPORTS_DIR):
+    """書き込んだページに合わせて、サイト内検索インデックスと sitemap.xml を差分更新する（変更の無いページは再解析しない）。"""
+    build_search_index(base_dir, os.path.join(reports_dir, os.path.basename(SEARCH_STATE_FILE)))
+    update_sitemap(base_dir, os.path.join(reports_dir, os.path.basename(SITEMAP_STATE_FILE)))
+
+def plan_improvement_cycle(base_dir=BASE_DIR, reports_dir=REPORTS_DIR, opinion_file=OPINION_FILE, article_count=DEFAULT_ARTICLE_COUNT):
+    """
+    [ドライラン] run_improvement_cycle が送るはずの全プロンプトを、APIを呼ばずに組み立てて返す。
+    最優先セクションは記事数が最も少ないハブと仮定し、企画前の記事はそのハブの目的を持つ仮の記事として見積もる。
+    （章ごとの並列生成での見出し調整の呼び出しは、入力が小さいため含めない）
+    """
+    load_model_stats(stats_file_for(reports_dir))
+    identity_file = os.path.join(reports_dir, "01_corporate_identity.md")
+    source = identity_file if os.path.exists(identity_file) else opinion_file
+    with open(source, 'r', encoding='utf-8') as f:
+        identity = f.read()
+    shared = {"法人格": identity}
+
+    calls = []
+    report_file = os.path.join(reports_dir, "planned_articles.md")
+    processed_articles = load_markdown_table_to_list(report_file) if os.path.exists(report_file) else None
+    if not processed_articles:
+        processed_articles = []
+        for file_name, full_path in list_site_pages(base_dir, DERIVED_SITE_DIRS).items():
+            article_data, _ = analyze_article_structure(full_path)
+            if article_data:
+                calls.append(planned_call("5a 目的の再定義", file_name, "article_purpose",
+                                          build_article_purpose_prompt(article_data, identity),
+                                          model="gemini-2.5-flash", components=shared,
+                                          cached_prefix=build_article_purpose_prompt_prefix(identity)))
+                processed_articles.append({"file_name": file_name, "title": article_data['page_title'],
+                                           "summary": article_data['full_text_excerpt']})
+
+    hub_counts, balance_report, content_hubs = build_hub_balance(processed_articles)
+    candidates = content_hubs or list(hub_counts)
+    if not candidates:
+        print("❌ ハブページが見つからないため、フェーズ5b以降は見積もれません。")
+        return calls
+    priority_file = min(candidates, key=lambda hub: hub_counts[hub])
+    priority_section_info = next(p for p in processed_articles if p['file_name'] == priority_file)
+
+    calls.append(planned_call("5b 優先セクション", "優先セクションの選定", "priority_section",
+                              build_priority_section_prompt(create_placeholder_data(processed_articles), identity,
+                                                            processed_articles, balance_report),
+                              model="gemini-2.5-flash", components={"法人格": identity}))
+    start_number = get_existing_article_count(base_dir) + 1 if os.path.isdir(base_dir) else 1
+    calls.append(planned_call("6 記事企画", "記事企画", "article_titles",
+                              build_article_titles_prompt(priority_section_info, identity, article_count, start_number),
+                              components={"法人格": identity}))
+
+    hub_dir = os.path.dirname(priority_file)
+    article_plans = [
+        {"title": f"企画予定の記事 {start_number + i}", "summary": priority_section_info.get('summary', ''),
+         "file_name": f"{hub_dir}/planned-article-{start_number + i}.html".lstrip('/')}
+        for i in range(article_count)
+    ]
+    nav_list = [{"file_name": p['file_name'], "title": p['title'], "purpose": p.get('summary', '')} for p in processed_articles]
+    nav_structure = "\n".join([f' - {p["title"]} ({p["file_name"]})' for p in nav_list])
+    announce_tag_instructions()
+    for i, plan in enumerate(article_plans):
+        page = {'title': plan['title'], 'file_name': plan['file_name'], 'purpose': plan['summary']}
+        if ARTICLE_GENERATION_MODE == "chunked":
+            outline = [{"heading": f"第{n + 1}章", "summary": plan['summary']} for n in range(DRY_RUN_SECTION_COUNT)]
+            calls.append(planned_call(f"7 記事{i + 1} 章立て", plan['file_name'], "page_outline",
+                                      build_outline_prompt(page, identity, None), components=shared))
+            stage = f"7 記事{i + 1} 本文"
+            calls.append(planned_call(stage, f"{plan['file_name']} (外枠)", "page_shell",
+                                      build_shell_prompt(page, identity, nav_structure, "", ""),
+                                      concurrency=CHUNKED_MAX_WORKERS,
+                                      components=dict(shared, ナビゲーション=nav_structure),
+                                      cached_prefix=build_shell_prompt_prefix(identity, None, nav_structure, "", "")))
+            for n in range(len(outline)):
+                calls.append(planned_call(stage, f"{plan['file_name']} (第{n + 1}章)", "page_section",
+                                          build_section_prompt(page, outline, n, identity),
+                                          concurrency=CHUNKED_MAX_WORKERS, components=shared,
+                                          cached_prefix=build_section_prompt_prefix(identity, None)))
+        else:
+            calls.append(planned_call("7 記事生成", plan['file_name'], "page_html",
+                                      build_page_prompt(page, identity, None, nav_list), page_class="article",
+                                      components=dict(shared, ナビゲーション=nav_structure),
+                                      cached_prefix=build_page_prompt_prefix(identity, None, nav_list)))
+
+    all_content_plans = integrate_content_data(processed_articles, article_plans)
+    hub_page, hub_nav = build_hub_regeneration_page(all_content_plans, priority_file)
+    if hub_page:
+        hub_nav_structure = "\n".join([f' - {p["title"]} ({p["file_name"]})' for p in hub_nav])
+        calls.append(planned_call("8 ハブ更新", priority_file, "page_html",
+                                  build_page_prompt(hub_page, identity, None, hub_nav), page_class="hub",
+                                  components=dict(shared, ナビゲーション=hub_nav_structure),
+                                  cached_prefix=build_page_prompt_prefix(identity, None, hub_nav)))
+    return calls
+
+def run_improvement_cycle(gemini_client, base_dir=BASE_DIR, reports_dir=REPORTS_DIR, opinion_file=OPINION_FILE, article_count=DEFAULT_ARTICLE_COUNT, batch_mode=False):
+    """
+    フェーズ5-8（AS-IS分析 → 優先セクション決定 → 記事企画・生成 → ハブ更新）を実行する。
+    パスを引数で受け取るため、複数サイトを1プロセスで改善する場合にも使用できる。
+    batch_mode=True の場合、フェーズ5aの目的の再定義と、フェーズ7-8の記事・ハブの生成をそれぞれ1つのバッチとして投入する。
+    実行中は reports_dir/status.json（と、設定されていればHTTPエンドポイント）に進捗とメトリクスを出力する。
+    入力が見つからない・生成結果が使えないなどで続行できない場合は PipelineError（のサブクラス）を送出する。
+    """
+    load_model_stats(stats_file_for(reports_dir))
+    status_file = os.path.join(reports_dir, os.path.basename(STATUS_FILE))
+    start_reporting(status_file, site=base_dir)
+    client = instrument_client(gemini_client, site=base_dir)
+    try:
+        return _run_improvement_cycle(client, base_dir, reports_dir, opinion_file, article_count, batch_mode)
+    finally:
+        if client is not None:
+            release_caches(client)  # 中断した場合も、この実行のキャッシュと集計を残さない
+        stop_reporting(status_file)
+
+def _run_improvement_cycle(gemini_client, base_dir, reports_dir, opinion_file, article_count, batch_mode):
+    report_file = os.path.join(reports_dir, "planned_articles.md")
+    pages_job_dir = batch_dir_for(reports_dir, PAGES_BATCH_NAME)
+
+    if batch_mode:
+        pending_requests = load_batch_requests(pages_job_dir)
+        if pending_requests:
+            # 計画 (planned_articles.md) は投入時に保存済みのため、結果の取り込みだけを行う
+            print(f"⏳ 未完了のバッチ ({pages_job_dir}) を再開します。（フェーズ5-6はスキップ）")
+            new_article_files_generated = ingest_pages_batch(gemini_client, base_dir, pending_requests, pages_job_dir, reports_dir)
+            refresh_site_indexes(base_dir, reports_dir)
+            print_resilience_report()
+            print_cache_report(gemini_client)
+            release_caches(gemini_client)
+            save_model_stats(stats_file_for(reports_dir), gemini_client)
+            return new_article_files_generated
 
     # --- (前提) 法人格の取得 ---
-    CORPORATE_IDENTITY = load_corporate_identity()
+    CORPORATE_IDENTITY = load_corporate_identity(reports_dir, opinion_file, gemini_client)
 
     # --- 5a. 戦略（AS-IS分析）---
-    print(f"\n--- [フェーズ5a: AS-IS分析] 計画ファイル ({REPORT_FILE}) を読み込み中 ---")
+    print(f"\n--- [フェーズ5a: AS-IS分析] 計画ファイル ({report_file}) を読み込み中 ---")
     processed_articles = None
-    if os.path.exists(REPORT_FILE):
-        processed_articles = load_markdown_table_to_list(REPORT_FILE)
+    if os.path.exists(report_file):
+        processed_articles = load_markdown_table_to_list(report_file)
 
     if processed_articles:
         print(f"✅ 既存の計画ファイルから {len(processed_articles)} 件の目的を読み込みました。（APIコールをスキップ）")
     else:
         # (フォールバック)
         print(f"⚠️ 計画ファイルが見つからないか、読み込みに失敗しました。")
-        print(f"--- [フェーズ5a 代替] 既存サイト ({BASE_DIR}) をスキャン中 ---")
-        processed_articles = []
-        TARGET_EXTENSIONS = ('.html', '.htm')
-        if not os.path.isdir(BASE_DIR):
-            print(f"❌ 分析対象ディレクトリ {BASE_DIR} が見つかりません。")
-            sys.exit(1)
-        for root, _, files in os.walk(BASE_DIR):
-            for filename in files:
-                if filename.lower().endswith(TARGET_EXTENSIONS):
-                    full_path = os.path.join(root, filename)
-                    article_data, error = analyze_article_structure(full_path)
-                    if article_data:
-                        purpose = generate_article_purpose(gemini_client, article_data, CORPORATE_IDENTITY)
-                        processed_articles.append({
-                            "file_name": os.path.relpath(full_path, BASE_DIR).replace(os.path.sep, '/'),
-                            "title": article_data['page_title'],
-                            "summary": purpose # ⬅️ [修正] 'summary' キーで保存
-                        })
+        print(f"--- [フェーズ5a 代替] 既存サイト ({base_dir}) をスキャン中 ---")
+        if not os.path.isdir(base_dir):
+            print(f"❌ 分析対象ディレクトリ {base_dir} が見つかりません。")
+            raise InputNotFoundError(f"分析対象ディレクトリ {base_dir} が見つかりません。")
+        purpose_job_dir = batch_dir_for(reports_dir, PURPOSE_BATCH_NAME) if batch_mode else None
+        processed_articles = scan_existing_site(gemini_client, base_dir, CORPORATE_IDENTITY, job_dir=purpose_job_dir)
+        if batch_mode and any(p['summary'].startswith("❌") for p in processed_articles):
+            print(f"⏳ 目的の再定義バッチが完了していません。再実行すると未完了分から再開します。")
+            return []
         print(f"\n✅ [フェーズ5a 代替完了] 合計 {len(processed_articles)} 件の目的をAPIで再定義しました。")
         
     # ⬇️ [修正] 5a-2. 「戦略的バランス」の数値化
     print(f"\n--- [フェーズ5a-2: 戦略的バランスの分析] ---")
-    hub_counts = {}
-    all_hubs = []
-    
-    # 1. ハブを特定
-    for p in processed_articles:
-        if p.get('file_name', '').endswith('index.html'):
-            hub_counts[p['file_name']] = 0 # カウントを0で初期化
-            all_hubs.append(p['file_name'])
-
-    # 2. ハブ配下の記事をカウント
-    for p in processed_articles:
-        if not p.get('file_name', '').endswith('index.html'):
-            parent_dir = os.path.dirname(p.get('file_name', ''))
-            parent_hub = os.path.join(parent_dir, 'index.html').replace(os.path.sep, '/')
-            if parent_hub in hub_counts:
-                hub_counts[parent_hub] += 1
-    
-    # 3. AIに渡すためのバランスレポートを作成
-    balance_report = "| ハブページ | 配下の詳細記事数 |\n| :--- | :--- |\n"
+    hub_counts, balance_report, content_hubs = build_hub_balance(processed_articles)
     print("✅ 現在のサイトバランス:")
-    for hub, count in hub_counts.items():
-        # ユーティリティページはレポートから除外
-        if 'legal/' not in hub and 'contact/' not in hub and 'about-us/' not in hub:
-             balance_report += f"| {hub} | {count} |\n"
-             print(f"  - {hub}: {count} 件")
+    for hub in content_hubs: # ユーティリティページは表示しない
+        print(f"  - {hub}: {hub_counts[hub]} 件")
     # ⬆️ [修正] ここまで
 
     # --- 5b. 戦略的優先度の決定 ---
     print("\n--- [フェーズ5b: 戦略的優先度の決定] AIが分析中 ---")
-    df_all_data = create_placeholder_data(processed_articles)
+    page_audit, _ = run_page_audit(base_dir, os.path.join(reports_dir, os.path.basename(AUDIT_REPORT_FILE)))
+    df_all_data = create_placeholder_data(processed_articles, page_audit)
     
     # ⬇️ [修正] 'balance_report' を引数として渡す
     priority_result = select_priority_section_by_data(
@@ -164,16 +411,16 @@ def main():
 
     # --- 6. 詳細記事の企画 ---
     print("\n--- [フェーズ6: 詳細記事の企画] AIが企画中 ---")
-    start_number = get_existing_article_count(BASE_DIR) + 1
+    start_number = get_existing_article_count(base_dir) + 1
     
     # ⬇️ [修正] 'summary' キーを持つ辞書を渡す
     error_msg, article_plans = generate_priority_article_titles(
-        gemini_client, priority_section_info, CORPORATE_IDENTITY, DEFAULT_ARTICLE_COUNT, start_number
+        gemini_client, priority_section_info, CORPORATE_IDENTITY, article_count, start_number
     )
 
     if not article_plans:
         print(f"❌ 記事の企画に失敗しました: {error_msg}")
-        sys.exit(1)
+        raise GenerationError(f"記事の企画に失敗しました: {error_msg}")
 
     print(f"✅ [フェーズ6 完了] {len(article_plans)} 件の新規記事を企画しました。")
 
@@ -182,12 +429,47 @@ def main():
 
     new_article_files_generated = []
 
+    target_dir = os.path.dirname(priority_section_info['file_name'])
     for i, plan in enumerate(article_plans):
-        target_dir = os.path.dirname(priority_section_info['file_name'])
         file_name = os.path.join(target_dir, plan.get('file_name', f'error-slug-{i}.html'))
-        file_name = file_name.replace(os.path.sep, '/')
+        article_plans[i]['file_name'] = file_name.replace(os.path.sep, '/')
 
-        article_plans[i]['file_name'] = file_name
+    if batch_mode:
+        # 記事とハブは計画だけに依存するため、フェーズ7-8をまとめて1つのバッチとして投入する
+        article_nav = [
+            {"file_name": p['file_name'], "title": p['title'], "purpose": p.get('summary', p.get('generated_purpose', ''))}
+            for p in processed_articles
+        ]
+        requests = [
+            _page_batch_request({'title': plan['title'], 'file_name': plan['file_name'], 'purpose': plan['summary']},
+                                CORPORATE_IDENTITY, article_nav, meta={'plan': plan})
+            for plan in article_plans
+        ]
+        all_content_plans = integrate_content_data(processed_articles, article_plans)
+        hub_page, hub_nav = build_hub_regeneration_page(all_content_plans, priority_file)
+        if hub_page:
+            requests.append(_page_batch_request(hub_page, CORPORATE_IDENTITY, hub_nav, meta={
+                'hub': priority_file, 'hub_members': section_members(all_content_plans, priority_file)
+            }))
+        else:
+            print(f"⚠️ 計画リストに親ハブ ({priority_file}) が見つからないため、ハブの更新はバッチに含めません。")
+
+        # 再開時はフェーズ5-6をスキップするため、計画は投入前に保存しておく
+        os.makedirs(reports_dir, exist_ok=True)
+        save_to_markdown(all_content_plans, report_file)
+        print(f"✅ 全体計画を {report_file} に保存しました。")
+
+        new_article_files_generated = ingest_pages_batch(gemini_client, base_dir, requests, pages_job_dir, reports_dir)
+        refresh_site_indexes(base_dir, reports_dir)
+        print_resilience_report()
+        print_cache_report(gemini_client)
+        release_caches(gemini_client)
+        save_model_stats(stats_file_for(reports_dir), gemini_client)
+        return new_article_files_generated
+
+    METRICS.add_phase_total(base_dir, "articles", len(article_plans))
+    for plan in article_plans:
+        file_name = plan['file_name']
 
         print(f"\n--- 🏭 [本番生成] {plan['title']} ---")
 
@@ -205,7 +487,12 @@ def main():
             } for p in processed_articles
         ]
 
-        final_html_code = generate_single_page_html(
+        generate_article_html = (
+            generate_single_page_html_chunked if ARTICLE_GENERATION_MODE == "chunked"
+            else generate_single_page_html
+        )
+        final_html_code = run_tracked(
+            base_dir, "articles", generate_article_html,
             gemini_client,
             target_page_for_generation,
             CORPORATE_IDENTITY,
@@ -215,11 +502,9 @@ def main():
         )
 
         if "❌" not in final_html_code:
-            generate_file_path = os.path.join(BASE_DIR, file_name)
-            os.makedirs(os.path.dirname(generate_file_path), exist_ok=True)
+            generate_file_path = os.path.join(base_dir, file_name)
             try:
-                with open(generate_file_path, 'w', encoding='utf-8') as f:
-                    f.write(final_html_code)
+                write_page(base_dir, file_name, final_html_code, store_dir=store_dir_for(reports_dir), **last_generation())
                 print(f"✅ [本番生成] ファイル作成成功: {generate_file_path}")
                 new_article_files_generated.append(plan)
             except Exception as e:
@@ -233,57 +518,17 @@ def main():
     all_content_plans = integrate_content_data(processed_articles, article_plans)
 
     hub_path_to_update = priority_file
-    hub_dir = os.path.dirname(hub_path_to_update)
 
     print(f"🏭 {hub_path_to_update} をスキャンし、配下の全記事リンクを組み込みます。")
 
-    try:
-        parent_page_info = next(p for p in all_content_plans if p['file_name'] == hub_path_to_update)
-    except StopIteration:
+    parent_page_info_for_regeneration, nav_list_for_generation = build_hub_regeneration_page(all_content_plans, hub_path_to_update)
+    if parent_page_info_for_regeneration is None:
         print(f"❌ [ハブ更新失敗] 計画リストに親ハブ ({hub_path_to_update}) が見つかりません。")
-        sys.exit(1)
-
-    parent_page_info_for_regeneration = {
-        'file_name': parent_page_info['file_name'],
-        'title': parent_page_info['title'],
-        'purpose': parent_page_info.get('summary', parent_page_info.get('generated_purpose')) 
-    }
+        raise GenerationError(f"計画リストに親ハブ ({hub_path_to_update}) が見つかりません。")
 
-    all_articles_in_section = []
-    for plan in all_content_plans:
-        if (os.path.dirname(plan['file_name']) == hub_dir) and \
-           (plan['file_name'] != hub_path_to_update):
-            all_articles_in_section.append(plan)
-
-    print(f"  -> {len(all_articles_in_section)} 件の詳細記事（新旧含む）をスキャンしました。")
-
-    new_article_links_html = "<ul>"
-    if not all_articles_in_section:
-        new_article_links_html = "<p>（現在、このセクションの詳細記事はありません）</p>"
-    else:
-        for plan in all_articles_in_section:
-            link_path = os.path.basename(plan['file_name'])
-            article_summary = plan.get('summary', plan.get('generated_purpose', '')) 
-            new_article_links_html += f"<li><a href='{link_path}' class='text-blue-500 hover:underline'>{plan['title']}</a>: {article_summary}</li>"
-        new_article_links_html += "</ul>"
-
-    parent_page_info_for_regeneration['purpose'] = f"""
-    このページ（{parent_page_info_for_regeneration['title']}）は、以下の「{len(all_articles_in_section)}件の全詳細記事」への導線を含むハブページとして機能します。
-    元の目的（{parent_page_info_for_regeneration['purpose']}）を要約しつつ、これらの新しい記事への明確な導線（目次）を提供してください。
-
-    【{hub_dir} セクションの全詳細記事リスト】
-    {new_article_links_html}
-    """
-
-    nav_list_for_generation = [
-        {
-            "file_name": p['file_name'],
-            "title": p['title'],
-            "purpose": p.get('summary', p.get('generated_purpose', '')) 
-        } for p in all_content_plans
-    ]
-
-    final_hub_code = generate_single_page_html(
+    METRICS.add_phase_total(base_dir, "hub")
+    final_hub_code = run_tracked(
+        base_dir, "hub", generate_single_page_html,
         gemini_client,
         parent_page_info_for_regeneration,
         CORPORATE_IDENTITY,
@@ -293,11 +538,12 @@ def main():
     )
 
     if "❌" not in final_hub_code:
-        hub_file_path = os.path.join(BASE_DIR, parent_page_info_for_regeneration['file_name'])
+        hub_file_path = os.path.join(base_dir, parent_page_info_for_regeneration['file_name'])
         try:
-            with open(hub_file_path, "w", encoding="utf-8") as f:
-                f.write(final_hub_code)
+            write_page(base_dir, parent_page_info_for_regeneration['file_name'], final_hub_code,
+                       store_dir=store_dir_for(reports_dir), **last_generation())
             print(f"✅ [ハブ更新完了] ファイルを上書き保存しました: {hub_file_path}")
+            record_hubs(reports_dir, {hub_path_to_update: section_members(all_content_plans, hub_path_to_update)})
         except Exception as e:
             print(f"❌ [ハブ更新失敗] ファイル書き込みエラー: {e}")
     else:
@@ -305,11 +551,31 @@ def main():
 
     # --- 9. (レポート) 全体計画をMDファイルに保存 ---
     print("\n--- [最終処理: 全体計画の保存] ---")
-    os.makedirs(REPORTS_DIR, exist_ok=True)
+    os.makedirs(reports_dir, exist_ok=True)
+
+    save_to_markdown(all_content_plans, report_file)
+
+    print(f"✅ 全体計画を {report_file} に保存しました。")
+    refresh_site_indexes(base_dir, reports_dir)
+    print_resilience_report()
+    print_cache_report(gemini_client)
+    release_caches(gemini_client)
+    save_model_stats(stats_file_for(reports_dir), gemini_client)
+
+    return new_article_files_generated
 
-    save_to_markdown(all_content_plans, REPORT_FILE)
+def main():
+    print(f"--- 🔄 HP改善サイクル (フェーズ5-8) [戦略的バランスモード] 開始 ---")
+
+    # --- 0. クライアント初期化 ---
+    gemini_client = setup_client()
+    if gemini_client is None: sys.exit(1)
+
+    try:
+        run_improvement_cycle(gemini_client)
+    except PipelineError:
+        sys.exit(1)
 
-    print(f"✅ 全体計画を {REPORT_FILE} に保存しました。")
     print("--- 🔄 HP改善サイクルエージェント 完了 ---")
 
 if __name__ == "__main__":
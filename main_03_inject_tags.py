@@ -1,7 +1,8 @@
 import os
 import sys
 import re
-from bs4 import BeautifulSoup
+
+from utils.page_store import write_page, STORE_DIR
 
 # --- 0. 設定 ---
 BASE_DIR = "docs"
@@ -47,13 +48,27 @@ def main():
         print(f"❌ サイトディレクトリ ({BASE_DIR}) が見つかりません。")
         sys.exit(1)
 
+    files_processed, files_skipped = inject_tags(BASE_DIR, GTM_ID, ADSENSE_CLIENT_ID)
+
+    print(f"\n--- 🏷️ スクリプト完了 ---")
+    print(f"✅ 合計 {files_processed} 件のHTMLファイルにタグを挿入/修正しました。")
+    print(f"ℹ️ 合計 {files_skipped} 件のHTMLファイルは変更ありませんでした。")
+
+
+def inject_tags(base_dir, GTM_ID=None, ADSENSE_CLIENT_ID=None, store_dir=STORE_DIR):
+    """
+    base_dir 配下の全HTMLファイルに GTM / AdSense タグを挿入（既存タグは置換）する。
+    書き込みは store_dir のページストアに記録する（サイトの reports_dir/page_store）。
+    戻り値: (変更したファイル数, 変更不要だったファイル数)
+    """
+    from bs4 import BeautifulSoup
     files_processed = 0
     files_skipped = 0
     TARGET_EXTENSIONS = ('.html', '.htm')
 
-    print(f"--- 🏭 {BASE_DIR} 配下の全HTMLファイルをスキャン・処理中 ---")
+    print(f"--- 🏭 {base_dir} 配下の全HTMLファイルをスキャン・処理中 ---")
 
-    for root, _, files in os.walk(BASE_DIR):
+    for root, _, files in os.walk(base_dir):
         for filename in files:
             if filename.lower().endswith(TARGET_EXTENSIONS):
                 full_path = os.path.join(root, filename)
@@ -122,9 +137,8 @@ def main():
                         # [修正] crossorigin="" も同様に置換
                         html_output = re.sub(r'crossorigin=""', 'crossorigin', html_output)
 
-                        with open(full_path, 'w', encoding='utf-8') as f:
-                            f.write(html_output)
-                            
+                        write_page(base_dir, os.path.relpath(full_path, base_dir), html_output, source="inject_tags", store_dir=store_dir)
+
                         print(f"✅ タグ挿入/修正完了: {full_path}")
                         files_processed += 1
                     else:
@@ -133,9 +147,7 @@ def main():
                 except Exception as e:
                     print(f"❌ エラー ({full_path}): {e}")
 
-    print(f"\n--- 🏷️ スクリプト完了 ---")
-    print(f"✅ 合計 {files_processed} 件のHTMLファイルにタグを挿入/修正しました。")
-    print(f"ℹ️ 合計 {files_skipped} 件のHTMLファイルは変更ありませんでした。")
+    return files_processed, files_skipped
 
 
 if __name__ == "__main__":
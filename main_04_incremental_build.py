@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import argparse
+
+# モジュールをインポート
+from agents.agent_01_identity import generate_corporate_identity
+from agents.agent_02_strategy import (
+    generate_final_sitemap,
+    generate_content_strategy,
+    generate_target_page_list
+)
+from agents.agent_03_generation import generate_single_page_html
+from main_01_initial_build import setup_client, OPINION_FILE, REPORTS_DIR, OUTPUT_DIR
+from utils.model_router import last_generation
+from utils.page_store import write_page, remove_page, store_dir_for
+from utils.build_graph import (
+    compute_hash,
+    load_build_state,
+    save_build_state,
+    node_status,
+    record_node,
+    page_node_name,
+    nav_structure_for,
+    snapshot_mtimes
+)
+
+# --- 0. 設定 ---
+STATE_FILE = os.path.join(REPORTS_DIR, ".build_state.json")
+IDENTITY_FILE = os.path.join(REPORTS_DIR, "01_corporate_identity.md")
+SITEMAP_FILE = os.path.join(REPORTS_DIR, "02_sitemap.md")
+STRATEGY_FILE = os.path.join(REPORTS_DIR, "03_content_strategy.md")
+TARGET_LIST_FILE = os.path.join(REPORTS_DIR, "04_target_pages_list.json")
+PAGE_STORE_DIR = store_dir_for(REPORTS_DIR)
+WATCH_INTERVAL_SEC = 2.0
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+class _LazyClient:
+    """再生成が必要になった時点で初めてGeminiクライアントを初期化する。"""
+    def __init__(self):
+        self._client = None
+
+    def get(self):
+        if self._client is None:
+            self._client = setup_client()
+            if self._client is None:
+                raise RuntimeError("Geminiクライアントの初期化に失敗しました。")
+        return self._client
+
+
+def _build_text_node(state, name, input_hash, artifact_path, build_fn, rebuild_all):
+    """テキスト成果物ノードを必要な場合のみ再生成する。再生成したら True を返す。"""
+    status = 'stale' if rebuild_all else node_status(state, name, input_hash, artifact_path)
+    if status == 'fresh':
+        return False
+    if status == 'adopt':
+        print(f"ℹ️ [{name}] 既存の成果物をベースラインとして採用します。")
+    elif status == 'edited':
+        print(f"✏️ [{name}] 手動編集を検出しました。ソースとして扱い、再生成しません。")
+    else:
+        print(f"🔁 [{name}] 入力が変わったため再生成します。")
+        result = build_fn()
+        if result.startswith("❌"):
+            raise RuntimeError(f"[{name}] の再生成に失敗しました: {result}")
+        _write(artifact_path, result)
+    record_node(state, name, input_hash, artifact_path)
+    return status == 'stale'
+
+
+def run_incremental_build(rebuild_all=False):
+    """依存グラフを上流から順に辿り、影響を受けたノードだけを再生成する。"""
+    state = load_build_state(STATE_FILE)
+    lazy_client = _LazyClient()
+    rebuilt = []
+
+    try:
+        raw_input = _read(OPINION_FILE)
+    except Exception as e:
+        print(f"❌ {OPINION_FILE} の読み込みに失敗: {e}")
+        return rebuilt
+
+    try:
+        # --- 法人格 ← opinion.txt ---
+        if _build_text_node(state, 'identity', compute_hash(raw_input), IDENTITY_FILE,
+                            lambda: generate_corporate_identity(lazy_client.get(), raw_input), rebuild_all):
+            rebuilt.append('identity')
+        identity = _read(IDENTITY_FILE)
+
+        # --- サイトマップ ← 法人格 ---
+        if _build_text_node(state, 'sitemap', compute_hash(identity), SITEMAP_FILE,
+                            lambda: generate_final_sitemap(lazy_client.get(), identity), rebuild_all):
+            rebuilt.append('sitemap')
+        sitemap = _read(SITEMAP_FILE)
+
+        # --- コンテンツ戦略 ← 法人格 + サイトマップ ---
+        if _build_text_node(state, 'strategy', compute_hash(identity, sitemap), STRATEGY_FILE,
+                            lambda: generate_content_strategy(lazy_client.get(), identity, sitemap), rebuild_all):
+            rebuilt.append('strategy')
+        strategy = _read(STRATEGY_FILE)
+
+        # --- ターゲットページリスト ← 法人格 + 戦略 ---
+        def build_target_list():
+            target_list = generate_target_page_list(lazy_client.get(), identity, strategy)
+            if not target_list:
+                return "❌ ターゲットリストが空です。"
+            return json.dumps(target_list, indent=2, ensure_ascii=False)
+
+        if _build_text_node(state, 'target_list', compute_hash(identity, strategy), TARGET_LIST_FILE,
+                            build_target_list, rebuild_all):
+            rebuilt.append('target_list')
+        target_pages = json.loads(_read(TARGET_LIST_FILE))
+
+        # --- 各ページHTML ← 法人格 + 戦略 + 自ページのエントリ + ナビゲーション構造 ---
+        # ナビゲーションにはタイトルとファイル名しか埋め込まれないため、
+        # あるページの purpose を編集しても、他のページは再生成されない。
+        nav_structure = nav_structure_for(target_pages)
+        for page in target_pages:
+            name = page_node_name(page['file_name'])
+            artifact_path = os.path.join(OUTPUT_DIR, page['file_name'])
+            input_hash = compute_hash(identity, strategy, page, nav_structure)
+            status = 'stale' if rebuild_all else node_status(state, name, input_hash, artifact_path)
+            if status == 'fresh':
+                continue
+            if status in ('adopt', 'edited'):
+                record_node(state, name, input_hash, artifact_path)
+                continue
+
+            print(f"\n--- 🏭 ページ再生成: {page['title']} ({page['file_name']}) ---")
+            final_html_code = generate_single_page_html(
+                lazy_client.get(),
+                page,
+                identity,
+                strategy,
+                target_pages,
+                retry_attempts=3
+            )
+            if "❌" in final_html_code:
+                print(f"❌ {page['file_name']}: {final_html_code}")
+                continue
+            write_page(OUTPUT_DIR, page['file_name'], final_html_code, store_dir=PAGE_STORE_DIR, **last_generation())
+            record_node(state, name, input_hash, artifact_path)
+            rebuilt.append(name)
+
+        # --- リストから消えたページの成果物を削除 ---
+        current_nodes = {page_node_name(p['file_name']) for p in target_pages}
+        for name in [n for n in state if n.startswith('page:') and n not in current_nodes]:
+            orphan_path = os.path.join(OUTPUT_DIR, name[len('page:'):])
+            if remove_page(OUTPUT_DIR, name[len('page:'):], store_dir=PAGE_STORE_DIR):
+                print(f"🗑️ ターゲットリストから外れたページを削除しました: {orphan_path}")
+            del state[name]
+    except Exception as e:
+        print(f"❌ インクリメンタルビルド中にエラー: {e}")
+    finally:
+        save_build_state(state, STATE_FILE)
+
+    if rebuilt:
+        print(f"✅ 再生成したノード ({len(rebuilt)} 件): {', '.join(rebuilt)}")
+    else:
+        print("✅ 全ノードが最新です。再生成は不要でした。")
+    return rebuilt
+
+
+def watch(interval=WATCH_INTERVAL_SEC):
+    """ソースファイルの変更を監視し、変更のたびに最小限の再ビルドを実行する。"""
+    watched = [OPINION_FILE, IDENTITY_FILE, SITEMAP_FILE, STRATEGY_FILE, TARGET_LIST_FILE]
+    print(f"👀 監視モード開始 ({interval} 秒間隔): {', '.join(watched)}")
+    run_incremental_build()
+    last_snapshot = snapshot_mtimes(watched)
+    try:
+        while True:
+            time.sleep(interval)
+            snapshot = snapshot_mtimes(watched)
+            if snapshot != last_snapshot:
+                changed = [p for p in watched if snapshot.get(p) != last_snapshot.get(p)]
+                print(f"\n🔔 変更を検出: {', '.join(changed)}")
+                run_incremental_build()
+                # 自身が書き込んだ成果物の変更で再トリガーされないよう、ビルド後に取り直す
+                snapshot = snapshot_mtimes(watched)
+            last_snapshot = snapshot
+    except KeyboardInterrupt:
+        print("\n👋 監視モードを終了します。")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="依存グラフに基づくインクリメンタルビルド")
+    parser.add_argument('--watch', action='store_true', help="ソースの変更を監視して自動で再ビルドする")
+    parser.add_argument('--rebuild-all', action='store_true', help="ハッシュを無視して全ノードを再生成する")
+    args = parser.parse_args()
+
+    print("--- 🧩 HPインクリメンタルビルド 開始 ---")
+    if args.watch:
+        watch()
+    else:
+        run_incremental_build(rebuild_all=args.rebuild_all)
+    print("--- 🧩 HPインクリメンタルビルド 完了 ---")
+
+
+if __name__ == "__main__":
+    main()
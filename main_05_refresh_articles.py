@@ -0,0 +1,120 @@
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# モジュールをインポート
+from agents.agent_04_improvement import analyze_article_structure, generate_article_patch_ops
+from main_02_improvement_cycle import setup_client, load_corporate_identity, BASE_DIR, REPORTS_DIR, OPINION_FILE
+from utils.html_patch_utils import summarize_sections, apply_patch_ops
+from utils.model_router import last_generation
+from utils.page_store import write_page, store_dir_for, STORE_DIR
+
+# --- 0. 設定 ---
+MAX_CONCURRENT_PAGES = 4 # 同時に更新するページ数
+TARGET_EXTENSIONS = ('.html', '.htm')
+
+
+def collect_target_files(target, base_dir=BASE_DIR):
+    """対象（ファイルまたは base_dir 配下のディレクトリ）から更新対象のHTMLファイルを列挙する。"""
+    target_path = os.path.join(base_dir, target) if target else base_dir
+    if os.path.isfile(target_path):
+        return [target_path]
+    files = []
+    for root, _, filenames in os.walk(target_path):
+        for filename in filenames:
+            if filename.lower().endswith(TARGET_EXTENSIONS):
+                files.append(os.path.join(root, filename))
+    return sorted(files)
+
+
+def refresh_article(client, file_path, change_goal, identity, base_dir=BASE_DIR, store_dir=STORE_DIR):
+    """1ページ分の編集操作を生成してローカルでDOMに適用し、結果のステータス文字列を返す。"""
+    from bs4 import BeautifulSoup
+    article_data, error = analyze_article_structure(file_path)
+    if article_data is None:
+        return error
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    section_digest = summarize_sections(BeautifulSoup(html, 'html.parser'))
+
+    error_msg, ops = generate_article_patch_ops(client, article_data, section_digest, change_goal, identity)
+    if error_msg:
+        return f"❌ 編集操作の生成に失敗: {error_msg}"
+    if not ops:
+        return "ℹ️ 変更不要"
+
+    updated_html, applied, skipped = apply_patch_ops(html, ops)
+    for op, reason in skipped:
+        print(f"⚠️ 操作をスキップ ({file_path}): {reason}")
+    if not applied:
+        return "⚠️ 適用できた操作がありません"
+
+    write_page(base_dir, os.path.relpath(file_path, base_dir), updated_html, source="refresh", store_dir=store_dir, **last_generation())
+    return f"✅ {len(applied)} 件の操作を適用 (スキップ {len(skipped)} 件)"
+
+
+def run_refresh(gemini_client, target, change_goal, base_dir=BASE_DIR, reports_dir=REPORTS_DIR, opinion_file=OPINION_FILE):
+    """
+    target（base_dir からの相対パス。空なら全体）配下のページを change_goal に沿って差分更新する。
+    戻り値: {パス: ステータス}（対象が無い場合は空の辞書）
+    """
+    target_files = collect_target_files(target, base_dir)
+    if not target_files:
+        print(f"❌ 更新対象のHTMLファイルが見つかりません: {target or base_dir}")
+        return {}
+    CORPORATE_IDENTITY = load_corporate_identity(reports_dir, opinion_file, gemini_client)
+
+    # --- 章単位の編集操作を生成し、ローカルで適用 ---
+    print(f"\n--- 🏭 {len(target_files)} 件のページを差分更新中 ---")
+    results = {}
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PAGES) as executor:
+        futures = {
+            executor.submit(refresh_article, gemini_client, path, change_goal, CORPORATE_IDENTITY, base_dir,
+                            store_dir_for(reports_dir)): path
+            for path in target_files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = f"❌ エラー: {e}"
+            print(f"{path}: {results[path]}")
+
+    print("\n--- 🎉 差分リフレッシュ結果サマリー ---")
+    for path in target_files:
+        print(f"{path.ljust(60)}: {results.get(path)}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="既存記事を章単位で差分更新する")
+    parser.add_argument('--target', help=f"更新対象のファイルまたはディレクトリ ({BASE_DIR} からの相対パス、省略時は全体)")
+    parser.add_argument('--goal', help="変更目標 (例: 2025年の最新動向を反映する)")
+    args = parser.parse_args()
+
+    print("--- ✏️ 記事の差分リフレッシュ 開始 ---")
+
+    # --- 1. 対象と変更目標（引数が無く、端末から実行された場合のみ入力を求める） ---
+    target, change_goal = args.target, args.goal
+    if change_goal is None and sys.stdin.isatty():
+        if target is None:
+            target = input(f"更新対象のファイルまたはディレクトリ ({BASE_DIR} からの相対パス、全体はEnter): ").strip()
+        change_goal = input("変更目標を入力してください (例: 2025年の最新動向を反映する): ").strip()
+    if not change_goal:
+        print("❌ 変更目標が指定されませんでした (--goal)。処理を終了します。")
+        sys.exit(1)
+
+    # --- 2. クライアント初期化 ---
+    gemini_client = setup_client()
+    if gemini_client is None: sys.exit(1)
+
+    if not run_refresh(gemini_client, target or "", change_goal):
+        sys.exit(1)
+    print("--- ✏️ 記事の差分リフレッシュ 完了 ---")
+
+
+if __name__ == "__main__":
+    main()
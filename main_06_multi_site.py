@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import threading
+import argparse
+
+# モジュールをインポート
+from main_01_initial_build import setup_client, run_initial_build
+from main_02_improvement_cycle import run_improvement_cycle
+from main_03_inject_tags import inject_tags
+from utils.fair_scheduler import FairScheduler, SiteStats, ScheduledClient
+
+# --- 0. 設定 ---
+DEFAULT_MANIFEST = "config/sites.json"
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_PROGRESS_INTERVAL_SEC = 30
+SUPPORTED_PIPELINES = ('build', 'improve', 'inject_tags')
+
+
+def load_manifest(manifest_file):
+    """サイトのマニフェスト（JSON）を読み込み、必須項目を検証する。"""
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    names = set()
+    for site in manifest.get('sites', []):
+        if not site.get('name'):
+            raise ValueError("name が指定されていないサイトがあります。")
+        if site['name'] in names:
+            raise ValueError(f"サイト名が重複しています: {site['name']}")
+        names.add(site['name'])
+        site.setdefault('opinion_file', 'config/opinion.txt')
+        site.setdefault('reports_dir', os.path.join('output_reports', site['name']))
+        site.setdefault('output_dir', os.path.join('output_website', site['name']))
+        site.setdefault('docs_dir', os.path.join('sites', site['name'], 'docs'))
+        site.setdefault('pipelines', ['build'])
+        unknown = [p for p in site['pipelines'] if p not in SUPPORTED_PIPELINES]
+        if unknown:
+            raise ValueError(f"[{site['name']}] 未対応のパイプライン: {', '.join(unknown)}")
+    return manifest
+
+
+def run_site(site, client, stats):
+    """1サイト分のパイプラインを順に実行する。例外や sys.exit は他サイトに波及させない。"""
+    stats.status = "running"
+    stats.started_at = time.time()
+    try:
+        for pipeline in site['pipelines']:
+            stats.current_pipeline = pipeline
+            if pipeline == 'build':
+                run_initial_build(
+                    client,
+                    opinion_file=site['opinion_file'],
+                    output_dir=site['output_dir'],
+                    reports_dir=site['reports_dir'],
+                    zip_filename=site['output_dir'].rstrip('/') + '.zip'
+                )
+            elif pipeline == 'improve':
+                run_improvement_cycle(
+                    client,
+                    base_dir=site['docs_dir'],
+                    reports_dir=site['reports_dir'],
+                    opinion_file=site['opinion_file']
+                )
+            elif pipeline == 'inject_tags':
+                if site.get('gtm_id') or site.get('adsense_client_id'):
+                    inject_tags(site['docs_dir'], site.get('gtm_id'), site.get('adsense_client_id'))
+        stats.status = "done"
+    except BaseException as e:  # sys.exit() (SystemExit) もサイト単位の失敗として扱う
+        stats.status = "failed"
+        stats.error = f"{type(e).__name__}: {e}"
+        print(f"❌ [{site['name']}] {stats.current_pipeline} でサイトの処理が失敗しました: {stats.error}")
+    finally:
+        stats.finished_at = time.time()
+
+
+def print_progress(all_stats, started_at):
+    """サイト別の進捗と、全体のスループットを表示する。"""
+    elapsed = max(time.time() - started_at, 1e-9)
+    total_calls = sum(s.calls_done for s in all_stats)
+    total_failed = sum(s.calls_failed for s in all_stats)
+    total_tokens = sum(s.output_tokens for s in all_stats)
+    print(f"\n--- 📊 進捗 (経過 {elapsed:.0f}s) ---")
+    for stats in all_stats:
+        print(f"  {stats.summary_line()}")
+    print(f"  全体: 成功 {total_calls} 件 / 失敗 {total_failed} 件 / "
+          f"{total_calls / elapsed * 60:.1f} 呼び出し/分 / 出力 {total_tokens / elapsed:.0f} トークン/秒")
+
+
+def run_sites(manifest, client):
+    """全サイトを1プロセスで並行実行し、LLM呼び出しを共有の同時実行枠で公平に配分する。"""
+    scheduler = FairScheduler(manifest.get('max_concurrency', DEFAULT_MAX_CONCURRENCY))
+    interval = manifest.get('progress_interval_sec', DEFAULT_PROGRESS_INTERVAL_SEC)
+    sites = manifest.get('sites', [])
+    all_stats = [SiteStats(site['name']) for site in sites]
+
+    started_at = time.time()
+    threads = []
+    for site, stats in zip(sites, all_stats):
+        site_client = ScheduledClient(client, scheduler, stats)
+        thread = threading.Thread(target=run_site, args=(site, site_client, stats), name=f"site-{site['name']}", daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    while any(t.is_alive() for t in threads):
+        for t in threads:
+            t.join(timeout=interval / max(len(threads), 1))
+        print_progress(all_stats, started_at)
+
+    print("\n--- 🎉 マルチサイト実行結果サマリー ---")
+    print_progress(all_stats, started_at)
+    for stats in all_stats:
+        if stats.error:
+            print(f"  ❌ {stats.name}: {stats.error}")
+    return all_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数サイトのパイプラインを1プロセスで実行する")
+    parser.add_argument('manifest', nargs='?', default=DEFAULT_MANIFEST, help="サイトのマニフェスト (JSON)")
+    args = parser.parse_args()
+
+    print("--- 🌐 マルチサイトランナー 開始 ---")
+    try:
+        manifest = load_manifest(args.manifest)
+    except Exception as e:
+        print(f"❌ マニフェスト ({args.manifest}) の読み込みに失敗: {e}")
+        sys.exit(1)
+
+    gemini_client = setup_client()
+    if gemini_client is None:
+        sys.exit(1)
+
+    all_stats = run_sites(manifest, gemini_client)
+    print("--- 🌐 マルチサイトランナー 完了 ---")
+    if any(s.status == "failed" for s in all_stats):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# モジュールをインポート
+from agents.agent_05_translation import translate_strings
+from main_02_improvement_cycle import setup_client, BASE_DIR, REPORTS_DIR
+from utils.file_utils import list_site_pages, DERIVED_SITE_DIRS
+from utils.page_store import write_page, store_dir_for
+from utils.translation_utils import (
+    MEMORY_FILE_TEMPLATE,
+    TARGET_LANGUAGE_NAMES,
+    TranslationMemory,
+    extract_slots,
+    localize_document,
+    pack_batches
+)
+from utils.token_utils import estimate_tokens
+from utils.llm_resilience import print_resilience_report
+from utils.context_cache import print_cache_report, release_caches
+from utils.model_router import load_model_stats, save_model_stats, stats_file_for
+from utils.errors import PipelineError, ConfigurationError
+
+# --- 0. 設定 ---
+DEFAULT_TARGET_LANG = "en"
+MAX_CONCURRENT_BATCHES = 4 # 同時に送る翻訳バッチ数
+MAX_TRANSLATION_PASSES = 2 # 応答から欠けた文字列を再送する回数
+
+
+def collect_site_strings(base_dir, target_lang):
+    """翻訳元の各ページを解析し、{相対パス: (soup, slots)} と重複を除いた原文の一覧（出現順）を返す。"""
+    from bs4 import BeautifulSoup
+    pages = {}
+    unique = {}
+    for rel_path, path in list_site_pages(base_dir, DERIVED_SITE_DIRS).items():
+        with open(path, 'r', encoding='utf-8') as f:
+            soup = BeautifulSoup(f.read(), 'html.parser')
+        slots = extract_slots(soup)
+        pages[rel_path] = (soup, slots)
+        for slot in slots:
+            unique.setdefault(slot.source, None)
+    return pages, list(unique)
+
+
+def translate_missing(gemini_client, strings, memory, target_lang):
+    """翻訳メモリに無い文字列をトークン予算ごとのバッチにまとめて並列に翻訳し、メモリに追加する。"""
+    for attempt in range(1, MAX_TRANSLATION_PASSES + 1):
+        pending = [s for s in strings if s not in memory]
+        if not pending:
+            return 0
+        batches = pack_batches(pending)
+        print(f"  > 🌐 [{attempt}回目] {len(pending)} 件 (約 {sum(map(estimate_tokens, pending)):,} トークン) を {len(batches)} バッチで翻訳します。")
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES) as executor:
+            futures = {executor.submit(translate_strings, gemini_client, batch, target_lang): batch for batch in batches}
+            for future in as_completed(futures):
+                error_msg, translations = future.result()
+                if error_msg:
+                    print(f"⚠️ {error_msg} ({len(futures[future])} 件は次の試行で再送します)")
+                if translations:
+                    memory.update(translations)
+    return sum(1 for s in strings if s not in memory)
+
+
+def run_translation(gemini_client, base_dir=BASE_DIR, reports_dir=REPORTS_DIR, target_lang=DEFAULT_TARGET_LANG, dry_run=False):
+    """
+    公開サイトの全ページを target_lang に翻訳し、base_dir/<target_lang>/ に同じ構成で書き出す。
+    ページ間で重複する文字列は1回だけ送り、翻訳メモリにある文字列は送らない。
+    dry_run=True の場合は、送信が必要な文字列数とトークン数を表示するだけで終了する。
+    target_lang は TARGET_LANGUAGE_NAMES にある言語に限る（翻訳版のディレクトリを記事の走査から除外するため）。
+    """
+    if target_lang not in TARGET_LANGUAGE_NAMES:
+        print(f"❌ 翻訳先の言語 '{target_lang}' は設定されていません（utils/translation_utils.py の TARGET_LANGUAGE_NAMES: {', '.join(TARGET_LANGUAGE_NAMES)}）。")
+        raise ConfigurationError(f"未設定の翻訳先の言語です: {target_lang}")
+    start = time.time()
+    load_model_stats(stats_file_for(reports_dir))
+    print(f"\n--- 🌐 サイト翻訳 ({base_dir} → {os.path.join(base_dir, target_lang)}) ---")
+    memory = TranslationMemory(os.path.join(reports_dir, os.path.basename(MEMORY_FILE_TEMPLATE.format(lang=target_lang))))
+    pages, strings = collect_site_strings(base_dir, target_lang)
+    total_slots = sum(len(slots) for _, slots in pages.values())
+    pending = [s for s in strings if s not in memory]
+    print(f"✅ {len(pages)} ページから {total_slots} か所を抽出 (重複を除いて {len(strings)} 件 / 翻訳メモリに無いもの {len(pending)} 件, "
+          f"約 {sum(map(estimate_tokens, pending)):,} トークン)")
+    if dry_run:
+        print(f"  > 🧮 ドライラン: {len(pack_batches(pending))} バッチを送信する見込みです。")
+        return {}
+
+    untranslated = translate_missing(gemini_client, strings, memory, target_lang) if pending else 0
+    if untranslated:
+        print(f"⚠️ {untranslated} 件は翻訳できなかったため、原文のまま出力します（再実行で再送します）。")
+
+    results = {}
+    for rel_path, (soup, slots) in pages.items():
+        missing = localize_document(soup, slots, memory, target_lang)
+        changed = write_page(os.path.join(base_dir, target_lang), rel_path, str(soup), source="translate",
+                             store_dir=store_dir_for(reports_dir))
+        results[rel_path] = f"⚠️ 未翻訳 {missing} か所" if missing else ("✅ 更新" if changed else "ℹ️ 変更なし")
+
+    updated = sum(1 for status in results.values() if status == "✅ 更新")
+    print(f"✅ {len(results)} ページを出力しました (更新 {updated} 件 / 翻訳メモリ {len(memory)} 件 / {time.time() - start:.1f} 秒)")
+    if pending:
+        print_resilience_report()
+        print_cache_report(gemini_client)
+        release_caches(gemini_client)
+        save_model_stats(stats_file_for(reports_dir), gemini_client)
+    return results
+
+
+def main():
+    print("--- 🌐 サイト翻訳 開始 ---")
+    target_lang = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TARGET_LANG
+
+    gemini_client = setup_client()
+    if gemini_client is None: sys.exit(1)
+
+    try:
+        run_translation(gemini_client, target_lang=target_lang)
+    except PipelineError:
+        sys.exit(1)
+    print("--- 🌐 サイト翻訳 完了 ---")
+
+if __name__ == "__main__":
+    main()
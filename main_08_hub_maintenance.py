@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# モジュールをインポート
+from agents.agent_03_generation import generate_single_page_html, build_page_prompt, extract_html_code
+from agents.agent_04_improvement import analyze_article_structure
+from main_02_improvement_cycle import (
+    setup_client,
+    load_corporate_identity,
+    build_nav_list,
+    build_hub_regeneration_page,
+    refresh_site_indexes,
+    BASE_DIR,
+    REPORTS_DIR,
+    OPINION_FILE
+)
+from utils.file_utils import load_markdown_table_to_list, list_site_pages, DERIVED_SITE_DIRS
+from utils.hub_planner import detect_changed_hubs, record_hubs, section_members, state_file_for
+from utils.build_graph import compute_hash, load_build_state
+from utils.batch_utils import batch_dir_for, make_request, run_batch, archive_batch
+from utils.model_router import load_model_stats, save_model_stats, stats_file_for, route, classify_page, config_dict, last_generation
+from utils.llm_resilience import print_resilience_report
+from utils.context_cache import print_cache_report, release_caches
+from utils.page_store import write_page, store_dir_for
+from utils.errors import PipelineError, GenerationError
+from utils.metrics import METRICS, STATUS_FILE, instrument_client, run_tracked, start_reporting, stop_reporting
+
+# --- 0. 設定 ---
+# ハブの一括メンテナンス: 前回の生成からセクションの所属記事が変わったハブを全て検出し、
+# ナビゲーション・法人格（＝キャッシュされる共通プレフィックス）を共有して1回でまとめて再生成する。
+# 生成結果はいったん全て保存し、全ハブが揃ってから書き込むため、生成の失敗で記事の一覧が食い違うハブが公開されることはない。
+# （書き込み自体はページごとに置き換えるため、書き込み中にプロセスが落ちた場合の扱いは apply_hubs を参照）
+HUB_BATCH_NAME = "hub_maintenance" # バッチ投入モードのジョブ名
+HUB_STAGING_DIR = "hub_staging"    # 書き込み前の生成結果の保存先 (reports_dir 配下)
+HUB_MAX_WORKERS = 4                # リアルタイム生成の同時実行数
+STATUS_LABELS = {'fresh': "✅ 変更なし", 'changed': "🔁 所属記事が変化", 'missing': "🆕 ページなし", 'adopt': "ℹ️ 記録なし（ベースラインとして採用）"}
+
+
+def load_site_plan(base_dir, reports_dir):
+    """
+    サイト計画 (planned_articles.md) のうち実在するページと、計画に無い実在ページ（タイトルはページから読む）を合わせて返す。
+    ハブが実際に公開されている記事の集合とずれないよう、存在しない詳細記事は含めない（存在しないハブは再生成の対象として残す）。
+    """
+    report_file = os.path.join(reports_dir, "planned_articles.md")
+    pages = list_site_pages(base_dir, DERIVED_SITE_DIRS)
+    planned = load_markdown_table_to_list(report_file) if os.path.exists(report_file) else None
+    plans = [p for p in planned or [] if p.get('file_name') in pages or classify_page(p.get('file_name', '')) == "hub"]
+    known = {p['file_name'] for p in plans}
+    for file_name, full_path in pages.items():
+        if file_name in known:
+            continue
+        article_data, _ = analyze_article_structure(full_path)
+        if article_data:
+            plans.append({"file_name": file_name, "title": article_data['page_title'],
+                          "summary": article_data['full_text_excerpt']})
+    return plans
+
+
+def _stage_path(reports_dir, hub_page, identity, nav_list):
+    key = compute_hash(build_page_prompt(hub_page, identity, None, nav_list))[:16]
+    return os.path.join(reports_dir, HUB_STAGING_DIR, f"{key}.json")
+
+
+def _load_staged(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_staged(path, staged):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(staged, f, ensure_ascii=False)
+
+
+def generate_hubs(gemini_client, base_dir, reports_dir, hub_pages, identity, nav_list):
+    """
+    ハブをまとめて並列に生成し、{ハブ: {"html", "model", "prompt_hash"}} を返す（失敗したハブは含めない）。
+    全ハブが同じ法人格とナビゲーションを使うため、共通プレフィックスは1回だけキャッシュされる
+    （キャッシュ最小に届かない場合は連結して送り、キャッシュレポートに表示される）。
+    生成結果は reports_dir/hub_staging に保存し、同じプロンプトで再実行したときは再利用する。
+    """
+    staged, pending = {}, {}
+    for hub, page in hub_pages.items():
+        path = _stage_path(reports_dir, page, identity, nav_list)
+        cached = _load_staged(path)
+        if cached:
+            print(f"  > ♻️ 生成済みのハブを再利用します: {hub}")
+            staged[hub] = cached
+        else:
+            pending[hub] = (page, path)
+
+    def generate(page):
+        html = run_tracked(base_dir, "hubs", generate_single_page_html,
+                           gemini_client, page, identity, None, nav_list, retry_attempts=3)
+        return html, last_generation()
+
+    METRICS.add_phase_total(base_dir, "hubs", len(pending))
+    with ThreadPoolExecutor(max_workers=HUB_MAX_WORKERS) as executor:
+        futures = {hub: executor.submit(generate, page) for hub, (page, _) in pending.items()}
+    for hub, future in futures.items():
+        html, provenance = future.result()
+        if "❌" in html:
+            print(f"❌ [ハブ生成失敗] {hub}: {html}")
+            continue
+        staged[hub] = dict(provenance, html=html)
+        _save_staged(pending[hub][1], staged[hub])
+    return staged
+
+
+def generate_hubs_batch(gemini_client, reports_dir, hub_pages, identity, nav_list):
+    """ハブをまとめて1つのバッチとして投入し、揃った結果を generate_hubs と同じ形で返す（未完了なら揃った分だけ）。"""
+    job_dir = batch_dir_for(reports_dir, HUB_BATCH_NAME)
+    requests = []
+    for hub, page in hub_pages.items():
+        selected = route("page_html", classify_page(hub))
+        requests.append(make_request(hub, selected['model'], build_page_prompt(page, identity, None, nav_list),
+                                     config=config_dict(selected)))
+    results = run_batch(gemini_client, job_dir, requests, validate=extract_html_code)
+    return {
+        r['key']: {"html": extract_html_code(results[r['key']]), "model": r['model'], "prompt_hash": r['prompt_hash']}
+        for r in requests if r['key'] in results
+    }
+
+
+def apply_hubs(base_dir, reports_dir, staged):
+    """
+    生成が揃ったハブを続けて書き込む（各ページはページストア経由で一時ファイルから置き換える）。
+    ハブの集合を一度に切り替える仕組みは無いため、書き込みの途中でプロセスが落ちると、一部のハブだけが新しい状態になる。
+    その場合も所属記事の記録 (hub_state.json) と生成結果 (hub_staging/) は書き込みの完了後にしか更新・削除しないので、
+    再実行すると同じハブが再び対象になり、保存済みの生成結果を APIを呼ばずに書き込んで揃える（書き込み済みのハブは内容が同じため変更なし）。
+    """
+    for hub, entry in sorted(staged.items()):
+        write_page(base_dir, hub, entry['html'], model=entry.get('model'), prompt_hash=entry.get('prompt_hash'),
+                   source="hub_maintenance", store_dir=store_dir_for(reports_dir))
+        print(f"✅ [ハブ更新完了] {os.path.join(base_dir, hub)}")
+
+
+def run_hub_maintenance(gemini_client, base_dir=BASE_DIR, reports_dir=REPORTS_DIR, opinion_file=OPINION_FILE, force=False, batch_mode=False, dry_run=False):
+    """
+    所属記事が前回の生成から変わったハブ（force=True の場合は全ハブ）をまとめて再生成し、全て揃ってから書き込む。
+    1つでも生成できなかった場合はどのハブも書き込まずに GenerationError を送出する（生成済みの分は再実行で再利用する）。
+    batch_mode=True の場合は全ハブを1つのバッチとして投入する。dry_run=True の場合は検出結果を表示するだけで終了する。
+    戻り値: {ハブ: 状態}
+    """
+    load_model_stats(stats_file_for(reports_dir))
+    status_file = os.path.join(reports_dir, os.path.basename(STATUS_FILE))
+    start_reporting(status_file, site=base_dir)
+    client = instrument_client(gemini_client, site=base_dir)
+    try:
+        return _run_hub_maintenance(client, base_dir, reports_dir, opinion_file, force, batch_mode, dry_run)
+    finally:
+        if client is not None:
+            release_caches(client)  # 中断した場合も、この実行のキャッシュと集計を残さない
+        stop_reporting(status_file)
+
+def _run_hub_maintenance(gemini_client, base_dir, reports_dir, opinion_file, force, batch_mode, dry_run):
+    print(f"\n--- 🧭 [ハブの一括メンテナンス] {base_dir} の所属記事の変化を検出中 ---")
+    plans = load_site_plan(base_dir, reports_dir)
+    changes = detect_changed_hubs(plans, load_build_state(state_file_for(reports_dir)), base_dir, force)
+    for hub, change in changes.items():
+        diff = f" (追加 {len(change['added'])} 件 / 削除 {len(change['removed'])} 件)" if change['status'] == 'changed' and not force else ""
+        print(f"  - {hub.ljust(30)} {STATUS_LABELS[change['status']]}{diff}")
+
+    targets = [hub for hub, change in changes.items() if change['status'] in ('changed', 'missing')]
+    adopted = [hub for hub, change in changes.items() if change['status'] == 'adopt']
+    statuses = {hub: STATUS_LABELS[change['status']] for hub, change in changes.items()}
+    if dry_run:
+        print(f"  > 🧮 ドライラン: {len(targets)} 件のハブを再生成する見込みです。")
+        return statuses
+    if adopted:
+        record_hubs(reports_dir, {hub: section_members(plans, hub) for hub in adopted})
+    if not targets:
+        print("✅ 再生成が必要なハブはありません。")
+        return statuses
+
+    # --- 共有コンテキストを1回だけ組み立てる ---
+    identity = load_corporate_identity(reports_dir, opinion_file, gemini_client)
+    nav_list = build_nav_list(plans)
+    hub_pages = {hub: build_hub_regeneration_page(plans, hub, nav_list)[0] for hub in targets}
+
+    print(f"\n--- 🏭 {len(targets)} 件のハブをまとめて再生成します（ナビゲーション {len(nav_list)} ページを共有） ---")
+    if batch_mode:
+        staged = generate_hubs_batch(gemini_client, reports_dir, hub_pages, identity, nav_list)
+    else:
+        staged = generate_hubs(gemini_client, base_dir, reports_dir, hub_pages, identity, nav_list)
+
+    missing = [hub for hub in targets if hub not in staged]
+    if missing:
+        for hub in missing:
+            statuses[hub] = "⏳ 結果待ち" if batch_mode else "❌ 生成失敗"
+        if batch_mode:
+            print(f"⏳ {len(missing)} 件のハブのバッチ結果が揃っていません。再実行すると未完了分から再開します（まだ書き込みません）。")
+            return statuses
+        print(f"❌ {len(missing)} 件のハブを生成できなかったため、どのハブも書き込みません（生成済みの {len(staged)} 件は再実行で再利用します）。")
+        raise GenerationError(f"ハブを生成できませんでした: {', '.join(missing)}")
+
+    # --- 全ハブが揃ってから書き込む（途中で落ちた場合は、記録と保存済みの生成結果が残るので再実行で揃う） ---
+    apply_hubs(base_dir, reports_dir, staged)
+    record_hubs(reports_dir, {hub: section_members(plans, hub) for hub in targets})
+    if batch_mode:
+        archive_batch(batch_dir_for(reports_dir, HUB_BATCH_NAME))
+    shutil.rmtree(os.path.join(reports_dir, HUB_STAGING_DIR), ignore_errors=True)
+    statuses.update({hub: "✅ 再生成" for hub in targets})
+
+    refresh_site_indexes(base_dir, reports_dir)
+    print_resilience_report()
+    print_cache_report(gemini_client)
+    release_caches(gemini_client)
+    save_model_stats(stats_file_for(reports_dir), gemini_client)
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="所属記事が変わったハブをまとめて再生成する")
+    parser.add_argument('--all', action='store_true', help="変化の有無にかかわらず全ハブを再生成する")
+    parser.add_argument('--batch', action='store_true', help="全ハブを1つのバッチとして投入する")
+    parser.add_argument('--dry-run', action='store_true', help="検出結果を表示するだけで終了する")
+    args = parser.parse_args()
+
+    print("--- 🧭 ハブの一括メンテナンス 開始 ---")
+    gemini_client = None if args.dry_run else setup_client()
+    if gemini_client is None and not args.dry_run:
+        sys.exit(1)
+
+    try:
+        run_hub_maintenance(gemini_client, force=args.all, batch_mode=args.batch, dry_run=args.dry_run)
+    except PipelineError:
+        sys.exit(1)
+    print("--- 🧭 ハブの一括メンテナンス 完了 ---")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+hp-generation-agent のライブラリAPI（ジョブワーカーなど、長時間動くプロセスに組み込む場合に使う）。
+
+    from site_builder import SiteBuilder, SiteConfig
+
+    async with SiteBuilder() as builder:
+        config = SiteConfig(name="example", opinion_file="config/opinion.txt")
+        await builder.build(config)
+        await builder.improve(config)
+
+SiteBuilder は Geminiクライアント（とその HTTP 接続プール）を1つだけ作り、全ジョブで使い回す。
+LLM呼び出しは共有の FairScheduler で同時実行数を制限し、ジョブ（サイト）間で公平に配分する。
+失敗は sys.exit ではなく utils/errors.py の PipelineError（とそのサブクラス）として送出する。
+各ジョブは既存の同期パイプライン（main_01 / main_02 / main_03 / main_08）をワーカースレッドで実行する。
+ジョブごとにページストアの実行（マニフェスト）を新しく始め、メトリクス・キャッシュの集計もジョブ単位で分ける。
+同じサイトのジョブは同時に1つだけ実行できる（ストアと状態ファイルがサイトの reports_dir にあるため）。
+"""
+import os
+import time
+import asyncio
+import threading
+from dataclasses import dataclass
+
+from utils.errors import PipelineError, InputNotFoundError, ConfigurationError
+from utils.client_utils import create_client
+from utils.fair_scheduler import FairScheduler, SiteStats, ScheduledClient
+from utils.page_store import begin_run, store_dir_for
+
+# --- 0. 設定 ---
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+@dataclass
+class SiteConfig:
+    """1サイト分の設定（既定値は main_06_multi_site.py のマニフェストと同じ）。"""
+    name: str
+    opinion_file: str = "config/opinion.txt"
+    output_dir: str = None   # 既定: output_website/<name>
+    docs_dir: str = None     # 既定: sites/<name>/docs
+    reports_dir: str = None  # 既定: output_reports/<name>
+    article_count: int = None  # 既定: main_02 の DEFAULT_ARTICLE_COUNT
+    batch_mode: bool = False
+    gtm_id: str = None
+    adsense_client_id: str = None
+
+    def __post_init__(self):
+        if not self.name:
+            raise ConfigurationError("SiteConfig の name が指定されていません。")
+        self.output_dir = self.output_dir or os.path.join('output_website', self.name)
+        self.docs_dir = self.docs_dir or os.path.join('sites', self.name, 'docs')
+        self.reports_dir = self.reports_dir or os.path.join('output_reports', self.name)
+
+
+class SiteBuilder:
+    """
+    サイトの構築・改善・ハブの一括メンテナンス・タグ挿入を非同期に実行する。
+    client を渡さない場合は api_key（省略時は Colab Secrets / 環境変数）からクライアントを作成し、
+    aclose()（または async with の終了）で閉じる。渡したクライアントは閉じない。
+    """
+
+    def __init__(self, client=None, api_key=None, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self._owns_client = client is None
+        self.client = client if client is not None else create_client(api_key)
+        self.scheduler = FairScheduler(max_concurrency)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def stats(self, name):
+        """サイトの呼び出し統計 (SiteStats) を返す。まだジョブを実行していなければ None。"""
+        with self._lock:
+            return self._stats.get(name)
+
+    def _site_client(self, name):
+        """
+        サイトごとの統計を記録し、共有の同時実行枠を使うクライアントを返す（ジョブごとに新しいクライアント）。
+        同じサイトのジョブが実行中なら PipelineError を送出する。
+        """
+        with self._lock:
+            stats = self._stats.setdefault(name, SiteStats(name))
+            if stats.status == "running":
+                raise PipelineError(f"[{name}] {stats.current_pipeline} を実行中です。終わってから次のジョブを実行してください。")
+            stats.status = "running"
+        return ScheduledClient(self.client, self.scheduler, stats), stats
+
+    async def _run(self, config, pipeline, fn, *args, **kwargs):
+        client, stats = self._site_client(config.name)
+        stats.current_pipeline = pipeline
+        stats.started_at, stats.finished_at, stats.error = time.time(), None, None
+        run_id = begin_run(store_dir_for(config.reports_dir))  # このジョブの書き込みは1つのマニフェストにまとまる
+        print(f"--- 🗃️ [{config.name}] {pipeline} を開始します（ページストアの実行ID: {run_id}） ---")
+        try:
+            result = await asyncio.to_thread(fn, client, *args, **kwargs)
+        except SystemExit as e:  # パイプライン内部の sys.exit もライブラリの呼び出し側には例外として返す
+            stats.status = "failed"
+            stats.error = f"{pipeline} が終了コード {e.code} で中断されました。"
+            raise PipelineError(f"[{config.name}] {stats.error}") from e
+        except BaseException as e:
+            stats.status = "failed"
+            stats.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stats.finished_at = time.time()
+        stats.status = "done"
+        return result
+
+    async def build(self, config):
+        """フェーズ1-4（初回構築）を実行し、config.output_dir にサイトを出力する。"""
+        from main_01_initial_build import run_initial_build
+        return await self._run(
+            config, 'build', run_initial_build,
+            opinion_file=config.opinion_file,
+            output_dir=config.output_dir,
+            reports_dir=config.reports_dir,
+            zip_filename=config.output_dir.rstrip('/') + '.zip',
+            batch_mode=config.batch_mode
+        )
+
+    async def improve(self, config):
+        """フェーズ5-8（改善サイクル）を config.docs_dir に対して実行し、新規に生成した記事ファイルのリストを返す。"""
+        from main_02_improvement_cycle import run_improvement_cycle, DEFAULT_ARTICLE_COUNT
+        return await self._run(
+            config, 'improve', run_improvement_cycle,
+            base_dir=config.docs_dir,
+            reports_dir=config.reports_dir,
+            opinion_file=config.opinion_file,
+            article_count=config.article_count or DEFAULT_ARTICLE_COUNT,
+            batch_mode=config.batch_mode
+        )
+
+    async def inject_tags(self, config):
+        """config.docs_dir の全ページに GTM / AdSense タグを挿入する。戻り値: (変更したファイル数, 変更不要だったファイル数)"""
+        from main_03_inject_tags import inject_tags
+        if not config.gtm_id and not config.adsense_client_id:
+            raise ConfigurationError(f"[{config.name}] gtm_id と adsense_client_id のどちらかを指定してください。")
+        if not os.path.isdir(config.docs_dir):
+            raise InputNotFoundError(f"[{config.name}] サイトディレクトリ ({config.docs_dir}) が見つかりません。")
+        return await self._run(
+            config, 'inject_tags',
+            lambda _client: inject_tags(config.docs_dir, config.gtm_id, config.adsense_client_id,
+                                        store_dir_for(config.reports_dir))
+        )
+
+    async def maintain_hubs(self, config, force=False):
+        """所属記事が変わったハブ（force=True なら全ハブ）をまとめて再生成する。戻り値: {ハブ: 状態}"""
+        from main_08_hub_maintenance import run_hub_maintenance
+        return await self._run(
+            config, 'hubs', run_hub_maintenance,
+            base_dir=config.docs_dir,
+            reports_dir=config.reports_dir,
+            opinion_file=config.opinion_file,
+            force=force,
+            batch_mode=config.batch_mode
+        )
+
+    async def aclose(self):
+        """自分で作成したクライアントを閉じる（HTTP 接続プールを解放する）。"""
+        if self._owns_client and self.client is not None:
+            close = getattr(self.client, "close", None)
+            if close is not None:
+                await asyncio.to_thread(close)
+            self.client = None
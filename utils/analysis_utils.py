@@ -1,8 +1,13 @@
-import pandas as pd
-import numpy as np
+import os
 
-def create_placeholder_data(target_articles):
-    """全記事のファイル名をインデックスとし、ダミーのパフォーマンスDFを生成する。"""
+UTILITY_HUB_DIRS = ('legal/', 'contact/', 'about-us/') # バランスの対象外とするハブ
+
+def create_placeholder_data(target_articles, page_audit=None):
+    """
+    全記事のファイル名をインデックスとし、ダミーのパフォーマンスDFを生成する。
+    page_audit (utils.page_audit.audit_site の結果) を渡すと、ページの重さと予算超過の列を追加する。
+    """
+    import pandas as pd
     data = {}
     for item in target_articles:
         file_name_key = item['file_name']
@@ -11,6 +16,39 @@ def create_placeholder_data(target_articles):
             'CVR': 1.5, 'ReadRate_90': 30, 'Keywords': 'データ欠損',
             'Total_Sessions_30D': 2500, 'Article_Title': title
         }
+        audit = (page_audit or {}).get(file_name_key)
+        if audit:
+            data[file_name_key].update({
+                'Page_KB': round(audit['bytes'] / 1024, 1), 'DOM_Nodes': audit['dom_nodes'],
+                'Render_Blocking': audit['render_blocking'], 'Budget_Violations': len(audit['violations'])
+            })
     df_all_data = pd.DataFrame.from_dict(data, orient='index').set_index('Article_Title')
     df_all_data.index.name = 'Article_Title'
     return df_all_data
+
+def build_hub_balance(processed_articles):
+    """
+    「戦略的バランス」を数値化する。各ハブ (*/index.html) 配下の詳細記事数を数え、
+    (ハブごとの記事数, AIに渡すMarkdownのバランスレポート, ユーティリティページを除いたハブのリスト) を返す。
+    """
+    hub_counts = {}
+
+    # 1. ハブを特定
+    for p in processed_articles:
+        if p.get('file_name', '').endswith('index.html'):
+            hub_counts[p['file_name']] = 0 # カウントを0で初期化
+
+    # 2. ハブ配下の記事をカウント
+    for p in processed_articles:
+        if not p.get('file_name', '').endswith('index.html'):
+            parent_dir = os.path.dirname(p.get('file_name', ''))
+            parent_hub = os.path.join(parent_dir, 'index.html').replace(os.path.sep, '/')
+            if parent_hub in hub_counts:
+                hub_counts[parent_hub] += 1
+
+    # 3. AIに渡すためのバランスレポートを作成（ユーティリティページは除外）
+    content_hubs = [hub for hub in hub_counts if not any(d in hub for d in UTILITY_HUB_DIRS)]
+    balance_report = "| ハブページ | 配下の詳細記事数 |\n| :--- | :--- |\n"
+    for hub in content_hubs:
+        balance_report += f"| {hub} | {hub_counts[hub]} |\n"
+    return hub_counts, balance_report, content_hubs
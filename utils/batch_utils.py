@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# --- バッチ投入モード ---
+# 対話的なレイテンシが不要な全体再生成・大きな改善サイクル向けに、
+# ページ生成などの独立したリクエストを1つのバッチファイルにまとめて投入する。
+# 状態は reports_dir/batch/<name>/ に保存され、途中で止めても再実行で再開できる。
+#   requests.jsonl : 投入したリクエスト（key, model, contents, config, meta）
+#   jobs.json      : プロバイダー側のバッチジョブ（モデルごと）と状態
+#   results.jsonl  : 取り込み済みの結果（key, prompt_hash, text / error）
+BATCH_SUBDIR = "batch"
+POLL_INITIAL_SEC = 30
+POLL_MAX_SEC = 600
+POLL_BACKOFF = 1.5
+LOCAL_BATCH_CONCURRENCY = 8
+TERMINAL_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+
+def prompt_hash(contents, model, config=None):
+    payload = json.dumps([model, contents, config or {}], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def make_request(key, model, contents, config=None, meta=None):
+    """バッチの1リクエスト。config は GenerateContentConfig に渡すキーの辞書。"""
+    return {
+        "key": key,
+        "model": model,
+        "contents": contents,
+        "config": config or {},
+        "meta": meta or {},
+        "prompt_hash": prompt_hash(contents, model, config),
+    }
+
+
+def batch_dir_for(reports_dir, name):
+    return os.path.join(reports_dir, BATCH_SUBDIR, name)
+
+
+def load_batch_requests(job_dir):
+    """未完了のバッチがあればそのリクエスト一覧を返す（無ければ None）。"""
+    path = os.path.join(job_dir, "requests.jsonl")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_jsonl(path, rows):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def _load_results(job_dir, requests, validate):
+    """取り込み済みの結果のうち、現在のリクエストと同じプロンプトで、検証を通ったものだけを返す。"""
+    path = os.path.join(job_dir, "results.jsonl")
+    hashes = {r["key"]: r["prompt_hash"] for r in requests}
+    results = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # 書き込み途中で中断された行
+                if hashes.get(row.get("key")) != row.get("prompt_hash") or not row.get("text"):
+                    continue
+                if validate is None or validate(row["text"]):
+                    results[row["key"]] = row["text"]
+    return results
+
+
+class _ResultWriter:
+    """結果を1件ずつ results.jsonl に追記する（中断しても取り込み済みの分は失われない）。"""
+
+    def __init__(self, job_dir, validate, results):
+        self.path = os.path.join(job_dir, "results.jsonl")
+        self.validate = validate
+        self.results = results
+        self._lock = threading.Lock()
+
+    def add(self, request, text=None, error=None):
+        ok = bool(text) and (self.validate is None or bool(self.validate(text)))
+        row = {"key": request["key"], "prompt_hash": request["prompt_hash"], "text": text if ok else None,
+               "error": error or (None if ok else "検証に失敗しました")}
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            if ok:
+                self.results[request["key"]] = text
+        return ok
+
+
+def _supports_batch_api(client):
+    return hasattr(client, "batches") and hasattr(client, "files")
+
+
+def _build_config(config, client):
+    """
+    リクエストの config（辞書）を generate_content に渡す形にする。
+    SDK を使うのは実際のクライアント（バッチAPIを持つ）の場合だけで、FakeClient などには属性で読める単純な形で渡す
+    （google-genai が無い環境でも、ローカルの代替実行が動くように）。
+    """
+    if not config:
+        return None
+    if not _supports_batch_api(client):
+        return SimpleNamespace(**config)
+    from google.genai import types
+    return types.GenerateContentConfig(**config)
+
+
+def _run_local(client, pending, writer, concurrency=LOCAL_BATCH_CONCURRENCY):
+    """ローカルの代替実行。各リクエストを通常の generate_content で処理し、結果を随時追記する。"""
+    print(f"  > 🧪 バッチAPIを使わず、ローカルで {len(pending)} 件を実行します (同時 {concurrency} 件)。")
+
+    def run_one(request):
+        response = client.models.generate_content(
+            model=request["model"], contents=request["contents"], config=_build_config(request["config"], client)
+        )
+        return response.text
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(run_one, r): r for r in pending}
+        for future in as_completed(futures):
+            request = futures[future]
+            try:
+                writer.add(request, text=future.result())
+            except Exception as e:
+                writer.add(request, error=str(e))
+
+
+def _to_batch_line(request):
+    """プロバイダーのバッチ入力形式（1行1リクエスト）に変換する。"""
+    line = {"key": request["key"], "request": {"contents": [{"role": "user", "parts": [{"text": request["contents"]}]}]}}
+    if request["config"]:
+        line["request"]["generation_config"] = request["config"]
+    return line
+
+
+def _response_text(response):
+    parts = (response.get("candidates") or [{}])[0].get("content", {}).get("parts", [])
+    return "".join(p.get("text", "") for p in parts if not p.get("thought"))
+
+
+def _submit_jobs(client, job_dir, name, pending, jobs):
+    """未投入のリクエストをモデルごとに1ジョブとして投入する。"""
+    by_model = {}
+    for request in pending:
+        by_model.setdefault(request["model"], []).append(request)
+    for model, requests in by_model.items():
+        input_path = os.path.join(job_dir, f"input-{model}-{int(time.time())}.jsonl")
+        _write_jsonl(input_path, [_to_batch_line(r) for r in requests])
+        uploaded = client.files.upload(file=input_path, config={"display_name": f"{name}-{model}", "mime_type": "jsonl"})
+        job = client.batches.create(model=model, src=uploaded.name, config={"display_name": f"{name}-{model}"})
+        jobs[job.name] = {"model": model, "keys": [r["key"] for r in requests], "state": "JOB_STATE_PENDING"}
+        print(f"  > 📤 バッチジョブを投入しました: {job.name} ({model}, {len(requests)} 件)")
+    _save_jobs(job_dir, jobs)
+
+
+def _save_jobs(job_dir, jobs):
+    with open(os.path.join(job_dir, "jobs.json"), 'w', encoding='utf-8') as f:
+        json.dump(jobs, f, ensure_ascii=False, indent=2)
+
+
+def _needs_work(info):
+    return info["state"] not in TERMINAL_STATES or (info["state"] == "JOB_STATE_SUCCEEDED" and not info.get("ingested"))
+
+
+def _poll_jobs(client, job_dir, jobs, requests_by_key, writer):
+    """未完了のジョブを間隔を伸ばしながらポーリングし、完了したものから結果を取り込む。"""
+    interval = POLL_INITIAL_SEC
+    while True:
+        active = [n for n, info in jobs.items() if _needs_work(info)]
+        if not active:
+            return
+        for job_name in active:
+            info = jobs[job_name]
+            job = client.batches.get(name=job_name)
+            state = getattr(job.state, "name", str(job.state))
+            if state != info["state"]:
+                print(f"  > 📡 {job_name}: {state}")
+                info["state"] = state
+            if state == "JOB_STATE_SUCCEEDED":
+                _ingest_job(client, job, requests_by_key, writer)
+                info["ingested"] = True
+            _save_jobs(job_dir, jobs)
+        if any(info["state"] not in TERMINAL_STATES for info in jobs.values()):
+            time.sleep(interval)
+            interval = min(interval * POLL_BACKOFF, POLL_MAX_SEC)
+
+
+def _ingest_job(client, job, requests_by_key, writer):
+    dest = getattr(job, "dest", None)
+    file_name = getattr(dest, "file_name", None)
+    if not file_name:
+        print(f"⚠️ {job.name} の結果ファイルが見つかりません。")
+        return
+    content = client.files.download(file=file_name).decode('utf-8')
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        request = requests_by_key.get(row.get("key"))
+        if request is None:
+            continue
+        if "response" in row:
+            writer.add(request, text=_response_text(row["response"]))
+        else:
+            writer.add(request, error=json.dumps(row.get("error"), ensure_ascii=False))
+
+
+def run_batch(client, job_dir, requests, validate=None, local=None):
+    """
+    requests をバッチとして実行し、{key: 応答テキスト} を返す。
+    取り込み済み・検証済みの結果はスキップし、投入済みで未完了のジョブはポーリングを再開する。
+    local=None の場合、クライアントがバッチAPIを持たなければローカルで代替実行する。
+    """
+    os.makedirs(job_dir, exist_ok=True)
+    _write_jsonl(os.path.join(job_dir, "requests.jsonl"), requests)
+    results = _load_results(job_dir, requests, validate)
+    pending = [r for r in requests if r["key"] not in results]
+    print(f"\n--- 📦 バッチ {os.path.basename(job_dir)}: 全 {len(requests)} 件 / 取り込み済み {len(results)} 件 / 未完了 {len(pending)} 件 ---")
+    if not pending:
+        return results
+
+    writer = _ResultWriter(job_dir, validate, results)
+    if local if local is not None else not _supports_batch_api(client):
+        _run_local(client, pending, writer)
+        return results
+
+    jobs_path = os.path.join(job_dir, "jobs.json")
+    jobs = {}
+    if os.path.exists(jobs_path):
+        with open(jobs_path, 'r', encoding='utf-8') as f:
+            jobs = json.load(f)
+    in_flight = {k for info in jobs.values() if _needs_work(info) for k in info["keys"]}
+    to_submit = [r for r in pending if r["key"] not in in_flight]
+    if in_flight:
+        print(f"  > ⏳ 投入済みのジョブ ({len(in_flight)} 件分) のポーリングを再開します。")
+    if to_submit:
+        _submit_jobs(client, job_dir, os.path.basename(job_dir), to_submit, jobs)
+    _poll_jobs(client, job_dir, jobs, {r["key"]: r for r in requests}, writer)
+    return results
+
+
+def archive_batch(job_dir):
+    """全件の取り込みが終わったバッチを退避し、次回の実行が新しいバッチとして始まるようにする。"""
+    if os.path.isdir(job_dir):
+        os.replace(job_dir, f"{job_dir}.done-{time.strftime('%Y%m%d-%H%M%S')}")
@@ -0,0 +1,95 @@
+import os
+import json
+import hashlib
+
+# --- 依存グラフ (成果物の連鎖) ---
+# opinion.txt → 法人格 → サイトマップ → コンテンツ戦略 → ターゲットページリスト → 各ページHTML
+DEFAULT_STATE_FILE = "output_reports/.build_state.json"
+
+
+def compute_hash(*parts):
+    """文字列（または JSON 化可能な値）の並びから sha256 ハッシュを計算する。"""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, ensure_ascii=False, sort_keys=True)
+        h.update(part.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def hash_file(file_path):
+    """ファイル内容のハッシュを返す。ファイルが無い場合は None。"""
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_build_state(state_file=DEFAULT_STATE_FILE):
+    """前回ビルド時の各ノードのハッシュ記録を読み込む。"""
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ ビルド状態ファイル ({state_file}) の読み込みに失敗: {e}")
+        return {}
+
+
+def save_build_state(state, state_file=DEFAULT_STATE_FILE):
+    """各ノードのハッシュ記録を保存する。"""
+    os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def page_node_name(file_name):
+    """ページノードの名前を返す。"""
+    return f"page:{file_name}"
+
+
+def nav_structure_for(page_list):
+    """ページHTMLのプロンプトに埋め込まれるナビゲーション構造（タイトルとファイル名のみ）を返す。"""
+    return [(p.get('title', 'N/A'), p.get('file_name', 'N/A')) for p in page_list]
+
+
+def node_status(state, name, input_hash, artifact_path):
+    """
+    ノードの状態を判定する。
+    - 'fresh'  : 入力ハッシュが前回と同じで、成果物も記録時のまま
+    - 'stale'  : 入力が変わった、または成果物が存在しない
+    - 'edited' : 入力は変わっていないが、成果物が手動で編集された（ソースとして扱い、再生成しない）
+    - 'adopt'  : 記録が無いが成果物は存在する（初回のみ、ベースラインとして採用）
+    """
+    record = state.get(name)
+    output_hash = hash_file(artifact_path)
+    if output_hash is None:
+        return 'stale'
+    if record is None:
+        return 'adopt'
+    if record.get('input_hash') != input_hash:
+        return 'stale'
+    if record.get('output_hash') != output_hash:
+        return 'edited'
+    return 'fresh'
+
+
+def record_node(state, name, input_hash, artifact_path):
+    """ノードの入力ハッシュと成果物ハッシュを記録する。"""
+    state[name] = {
+        'input_hash': input_hash,
+        'output_hash': hash_file(artifact_path),
+    }
+
+
+def snapshot_mtimes(paths):
+    """監視対象ファイルの更新時刻のスナップショットを返す（watch モード用）。"""
+    snapshot = {}
+    for path in paths:
+        try:
+            snapshot[path] = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            snapshot[path] = None
+    return snapshot
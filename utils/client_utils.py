@@ -0,0 +1,41 @@
+import os
+
+from utils.errors import ClientInitError
+from utils.llm_resilience import DEFAULT_HTTP_TIMEOUT_MS
+
+# --- Geminiクライアントの初期化 ---
+# APIキーは Colab Secrets → 環境変数の順に探す。クライアント（とその HTTP 接続プール）は
+# 1回作れば複数のサイト・ジョブで使い回せるため、長時間動くプロセスでは1つだけ作る。
+API_KEY_NAME = "GEMINI_API_KEY"
+
+
+def find_api_key():
+    """Colab Secrets（Colab環境の場合）または環境変数から APIキーを探す。見つからなければ None。"""
+    try:
+        from google.colab import userdata
+        return userdata.get(API_KEY_NAME)
+    except ImportError:
+        return os.environ.get(API_KEY_NAME)
+
+
+def create_client(api_key=None, http_timeout_ms=DEFAULT_HTTP_TIMEOUT_MS):
+    """Geminiクライアントを作成する。失敗した場合は ClientInitError を送出する。"""
+    from google import genai
+    from google.genai import types
+    api_key = api_key or find_api_key()
+    if not api_key:
+        raise ClientInitError(f"{API_KEY_NAME} が Colab Secrets または環境変数に設定されていません。")
+    try:
+        # timeout でハングした呼び出しを打ち切る
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(timeout=http_timeout_ms))
+    except Exception as e:
+        raise ClientInitError(f"クライアントを初期化できません: {e}") from e
+
+
+def setup_client():
+    """Geminiクライアントを初期化（スクリプト用。失敗した場合はメッセージを表示して None を返す）"""
+    try:
+        return create_client()
+    except ClientInitError as e:
+        print(f"❌ クライアント初期化エラー: {e}")
+        return None
@@ -0,0 +1,169 @@
+import time
+import hashlib
+import threading
+
+from utils.token_utils import estimate_tokens
+
+# --- 共通プレフィックスのコンテキストキャッシュ ---
+# ページ生成などのプロンプトを「実行中は変わらないプレフィックス（指示・法人格・全体戦略・ナビゲーション）」と
+# 「ページごとのサフィックス」に分け、プレフィックスはプロバイダーのキャッシュ (client.caches) に1回だけ登録する。
+# キャッシュはモデルとプレフィックスのハッシュの組ごとに作るため、法人格や戦略が変わればハッシュが変わって新しいキャッシュになり、
+# 同じ用途の古いキャッシュは削除される。client.caches を持たないクライアントでは、プレフィックスをそのまま連結して送る。
+CACHE_TTL_SEC = 3600
+CACHE_REFRESH_MARGIN_SEC = 300  # 期限までこれを切ったキャッシュは使わずに作り直す
+# プロバイダーがキャッシュを受け付ける最小トークン数（これ未満のプレフィックスは連結して送る）
+MIN_CACHE_TOKENS = {"gemini-2.5-pro": 4096, "gemini-2.5-flash": 1024}
+
+_lock = threading.Lock()  # _caches / _usage / _skipped の読み書きは全てこのロックの内側で行う
+_key_locks = {}
+# (model, プレフィックスのハッシュ) -> {"name", "expire_at", "label", "client", "users"}
+# client はキャッシュの作成・削除に使うクライアント、users は参照中のクライアント（実行）の一覧。
+# 同じプレフィックスを別のクライアントが参照している間は、作成したクライアントの release_caches でも削除しない。
+_caches = {}
+# 集計は実行（クライアント）ごとに分け、release_caches(client) で捨てる。長時間動くプロセスでもジョブ間で混ざらない。
+_usage = {}       # (id(client), 用途) -> {"calls", "cached_calls", "prompt_tokens", "cached_tokens"}
+_skipped = set()  # 最小トークン数に届かずキャッシュしなかった (id(client), 用途, model)（レポートに表示する）
+
+
+def prefix_hash(prefix):
+    return hashlib.sha256(prefix.encode('utf-8')).hexdigest()[:16]
+
+
+def _key_lock(key):
+    with _lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _attach(entry, client):
+    if not any(user is client for user in entry["users"]):
+        entry["users"].append(client)
+
+
+def _detach(key, client):
+    """client の参照を外し、参照するクライアントが無くなったエントリを取り除いて返す（呼び出し側で _lock を取ること）。"""
+    entry = _caches.get(key)
+    if entry is None:
+        return None
+    entry["users"] = [user for user in entry["users"] if user is not client]
+    if entry["users"]:
+        return None
+    entry["client"] = client  # 最後に参照していたクライアントで削除する
+    return _caches.pop(key)
+
+
+def get_cached_content(client, model, prefix, label):
+    """
+    プレフィックスのキャッシュ名を返す（初回の呼び出しで作成する）。
+    キャッシュを使えない場合（クライアントが未対応、プレフィックスが短い、作成に失敗した）は None を返す。
+    """
+    if not hasattr(client, "caches"):
+        return None
+    tokens = estimate_tokens(prefix)
+    min_tokens = MIN_CACHE_TOKENS.get(model, 4096)
+    if tokens < min_tokens:
+        with _lock:
+            first = (id(client), label, model) not in _skipped
+            _skipped.add((id(client), label, model))
+        if first:
+            print(f"  > ℹ️ {label} の共通プレフィックス (約 {tokens:,} トークン) は {model} のキャッシュ最小 {min_tokens:,} トークン未満のため、連結して送信します。")
+        return None
+    key = (model, prefix_hash(prefix))
+    with _key_lock(key):
+        with _lock:
+            entry = _caches.get(key)
+            if entry and entry["expire_at"] - time.time() > CACHE_REFRESH_MARGIN_SEC:
+                _attach(entry, client)
+                return entry["name"]
+        try:
+            cache = client.caches.create(model=model, config={
+                "contents": [prefix],
+                "ttl": f"{CACHE_TTL_SEC}s",
+                "display_name": f"{label}-{key[1]}",
+            })
+        except Exception as e:
+            print(f"⚠️ {label} のプレフィックスを {model} にキャッシュできません。連結して送信します: {e}")
+            return None
+        print(f"  > 🗄️ {label} の共通プレフィックスを {model} にキャッシュしました ({cache.name}, 約 {tokens:,} トークン)")
+        with _lock:
+            # 法人格や戦略が変わって、このクライアントが使わなくなった同じ用途の古いキャッシュ（他に参照が無いもの）
+            stale_keys = [k for k, e in _caches.items()
+                          if k[0] == model and e["label"] == label and k != key and any(u is client for u in e["users"])]
+            stale = [_detach(k, client) for k in stale_keys]
+            users = entry["users"] if entry else []
+            _caches[key] = {"name": cache.name, "expire_at": time.time() + CACHE_TTL_SEC, "label": label,
+                            "client": client, "users": users}
+            _attach(_caches[key], client)
+    for stale_entry in stale:
+        _delete(stale_entry)
+    return cache.name
+
+
+def _delete(entry):
+    if not entry:
+        return
+    try:
+        entry["client"].caches.delete(name=entry["name"])
+    except Exception as e:
+        print(f"⚠️ キャッシュ {entry['name']} を削除できません（期限切れで自動的に消えます）: {e}")
+
+
+def build_request(client, model, prefix, suffix, label, config_kwargs):
+    """
+    (contents, GenerateContentConfig のキーの辞書) を返す。
+    キャッシュが使えればサフィックスだけを送り、cached_content でプレフィックスを参照する。
+    """
+    name = get_cached_content(client, model, prefix, label)
+    if name:
+        return suffix, dict(config_kwargs, cached_content=name)
+    return prefix + suffix, dict(config_kwargs)
+
+
+def record_usage(label, response, client=None):
+    """応答の usage_metadata から、キャッシュから読まれた入力トークンとそれ以外を、client の実行の用途ごとに集計する。"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+    cached_tokens = getattr(usage, "cached_content_token_count", None) or 0
+    with _lock:
+        entry = _usage.setdefault((id(client), label), {"calls": 0, "cached_calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        entry["calls"] += 1
+        entry["cached_calls"] += 1 if cached_tokens else 0
+        entry["prompt_tokens"] += prompt_tokens
+        entry["cached_tokens"] += cached_tokens
+
+
+def release_caches(client=None):
+    """
+    この実行で作成したキャッシュを削除し、用途ごとの集計を捨てる（期限まで保存料金がかかるため、実行の最後に呼ぶ）。
+    client を渡すと、そのクライアントの参照だけを外し、他のクライアントが参照していないものだけを削除する（複数サイトを並行して実行する場合）。
+    """
+    with _lock:
+        if client is None:
+            entries = [_caches.pop(k) for k in list(_caches)]
+            _usage.clear()
+            _skipped.clear()
+        else:
+            entries = [_detach(k, client) for k in list(_caches)]
+            for key in [k for k in _usage if k[0] == id(client)]:
+                del _usage[key]
+            _skipped.difference_update({k for k in _skipped if k[0] == id(client)})
+    for entry in entries:
+        _delete(entry)
+
+
+def print_cache_report(client=None):
+    """client の実行の、用途ごとのキャッシュから読まれた入力トークンとそれ以外の入力トークンを表示する。"""
+    with _lock:
+        usage = {label: dict(entry) for (owner, label), entry in _usage.items() if owner == id(client)}
+        skipped = sorted((label, model) for owner, label, model in _skipped if owner == id(client))
+    if not usage:
+        return
+    print(f"\n--- 🗄️ コンテキストキャッシュ レポート ---")
+    for label, u in sorted(usage.items()):
+        uncached = u["prompt_tokens"] - u["cached_tokens"]
+        share = u["cached_tokens"] / u["prompt_tokens"] * 100 if u["prompt_tokens"] else 0.0
+        print(f"  {label.ljust(20)} 呼び出し {u['calls']} 件 (キャッシュ利用 {u['cached_calls']} 件) / "
+              f"キャッシュ {u['cached_tokens']:,} トークン / 非キャッシュ {uncached:,} トークン ({share:.0f}% がキャッシュ)")
+    for label, model in skipped:
+        print(f"  ℹ️ {label} ({model}) は共通プレフィックスがキャッシュ最小トークン数未満のため、キャッシュせずに送信しました。")
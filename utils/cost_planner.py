@@ -0,0 +1,155 @@
+import heapq
+
+from utils.token_utils import estimate_tokens, count_tokens
+from utils.model_router import route, average_latency
+from utils.context_cache import MIN_CACHE_TOKENS, CACHE_TTL_SEC
+
+# --- ドライラン用のコスト・時間の見積もり ---
+# 料金は 100万トークンあたりの米ドル（思考トークンは出力として課金される）
+# cached_input はコンテキストキャッシュから読まれる入力、cache_storage はキャッシュの保存料（1時間あたり）
+PRICE_PER_MILLION = {
+    "gemini-2.5-pro": {"input": 1.25, "output": 10.00, "cached_input": 0.31, "cache_storage": 4.50},
+    "gemini-2.5-flash": {"input": 0.30, "output": 2.50, "cached_input": 0.075, "cache_storage": 1.00},
+}
+# タスクごとの想定出力トークン数（思考トークンを除く）
+EXPECTED_OUTPUT_TOKENS = {
+    "identity": 600, "sitemap": 1200, "strategy": 2000, "target_list": 1500,
+    "article_purpose": 80, "priority_section": 150, "article_titles": 600,
+    "page_html": 9000, "page_outline": 500, "page_shell": 3000, "page_section": 1800,
+    "translate_strings": 3000,
+}
+# 思考予算が設定されていない場合に想定する思考トークン数
+DEFAULT_THINKING_TOKENS = {"gemini-2.5-pro": 2000, "gemini-2.5-flash": 800}
+# 統計 (model_stats.json) が無い場合のレイテンシモデル: 固定の待ち時間 + 出力トークン / 生成速度
+BASE_LATENCY_SEC = {"gemini-2.5-pro": 8.0, "gemini-2.5-flash": 2.0}
+OUTPUT_TOKENS_PER_SEC = {"gemini-2.5-pro": 80.0, "gemini-2.5-flash": 200.0}
+TOP_N = 5
+
+
+def planned_call(stage, label, task, prompt, page_class="default", model=None, concurrency=1, components=None, cached_prefix=None):
+    """
+    実行時に送られるはずの1回の呼び出し。
+    model を省略した場合はルーティング設定 (config/model_routing.json) に従う。
+    components には、プロンプトに埋め込まれる大きな部品（法人格・戦略・ナビゲーションなど）を渡す。
+    cached_prefix には、実行時にコンテキストキャッシュから参照する共通プレフィックス（prompt の先頭部分）を渡す。
+    """
+    selected = route(task, page_class) if model is None else {"model": model, "thinking_budget": None}
+    return {
+        "stage": stage, "label": label, "task": task, "page_class": page_class,
+        "model": selected["model"], "thinking_budget": selected.get("thinking_budget"),
+        "concurrency": concurrency, "prompt": prompt, "components": components or {},
+        "cached_prefix": cached_prefix,
+    }
+
+
+def estimate_calls(calls, client=None):
+    """
+    各呼び出しの入力・出力トークン数、コスト、レイテンシを見積もる。client を渡すと count_tokens で数える。
+    共通プレフィックスがモデルのキャッシュ最小トークン数以上なら、その分はキャッシュ済みの入力の料金で数え、
+    プレフィックスごとに1回、キャッシュの保存料 (CACHE_TTL_SEC 分) を最初の呼び出しに加える。
+    """
+    stored = set()
+    for call in calls:
+        model = call["model"]
+        call["prompt_tokens"] = count_tokens(client, model, call["prompt"])
+        thinking = call["thinking_budget"] if call["thinking_budget"] is not None else DEFAULT_THINKING_TOKENS.get(model, 0)
+        call["output_tokens"] = EXPECTED_OUTPUT_TOKENS.get(call["task"], 1000) + thinking
+        price = PRICE_PER_MILLION.get(model, PRICE_PER_MILLION["gemini-2.5-pro"])
+        call["cached_tokens"] = 0
+        storage_cost = 0.0
+        if call["cached_prefix"]:
+            prefix_tokens = count_tokens(client, model, call["cached_prefix"])
+            if prefix_tokens >= MIN_CACHE_TOKENS.get(model, 4096):
+                call["cached_tokens"] = min(prefix_tokens, call["prompt_tokens"])
+                if (model, call["cached_prefix"]) not in stored:
+                    stored.add((model, call["cached_prefix"]))
+                    storage_cost = prefix_tokens * price["cache_storage"] * CACHE_TTL_SEC / 3600 / 1_000_000
+        call["cost"] = ((call["prompt_tokens"] - call["cached_tokens"]) * price["input"]
+                        + call["cached_tokens"] * price["cached_input"]
+                        + call["output_tokens"] * price["output"]) / 1_000_000 + storage_cost
+        recorded = average_latency(call["task"], call["page_class"], model)
+        call["latency_sec"] = recorded if recorded is not None else (
+            BASE_LATENCY_SEC.get(model, 8.0) + call["output_tokens"] / OUTPUT_TOKENS_PER_SEC.get(model, 80.0)
+        )
+        call["component_tokens"] = {name: estimate_tokens(text) for name, text in call["components"].items()}
+    return calls
+
+
+def _stage_wall_time(latencies, concurrency):
+    """同時実行数 concurrency で、長いものから空いた枠に割り当てたときの経過時間。"""
+    workers = [0.0] * max(concurrency, 1)
+    for latency in sorted(latencies, reverse=True):
+        heapq.heapreplace(workers, workers[0] + latency)
+    return max(workers)
+
+
+def summarize(calls):
+    """ステージ順に集計し、(ステージごとの集計リスト, 合計) を返す。ステージは順番に実行されるものとする。"""
+    stages = {}
+    for call in calls:
+        stage = stages.setdefault(call["stage"], {"stage": call["stage"], "calls": 0, "prompt_tokens": 0,
+                                                  "cached_tokens": 0, "output_tokens": 0, "cost": 0.0,
+                                                  "latencies": [], "concurrency": call["concurrency"]})
+        stage["calls"] += 1
+        stage["prompt_tokens"] += call["prompt_tokens"]
+        stage["cached_tokens"] += call["cached_tokens"]
+        stage["output_tokens"] += call["output_tokens"]
+        stage["cost"] += call["cost"]
+        stage["latencies"].append(call["latency_sec"])
+    rows = []
+    for stage in stages.values():
+        stage["wall_sec"] = _stage_wall_time(stage.pop("latencies"), stage["concurrency"])
+        rows.append(stage)
+    total = {key: sum(r[key] for r in rows) for key in ("calls", "prompt_tokens", "cached_tokens", "output_tokens", "cost", "wall_sec")}
+    return rows, total
+
+
+def print_plan(calls, title, top_n=TOP_N):
+    """見積もり結果を表示する。大きいプロンプト・コストへの寄与が大きいプロンプト・大きな部品を上位から示す。"""
+    rows, total = summarize(calls)
+    print(f"\n--- 🧮 ドライラン: {title} ---")
+    print(f"{'ステージ'.ljust(24)} {'呼出':>4} {'同時':>4} {'入力tok':>10} {'出力tok':>10} {'コスト$':>9} {'時間':>8}")
+    for r in rows:
+        print(f"{r['stage'][:24].ljust(24)} {r['calls']:>4} {r['concurrency']:>4} {r['prompt_tokens']:>10,} "
+              f"{r['output_tokens']:>10,} {r['cost']:>9.3f} {_fmt_sec(r['wall_sec']):>8}")
+    print(f"{'合計'.ljust(24)} {total['calls']:>4} {'':>4} {total['prompt_tokens']:>10,} "
+          f"{total['output_tokens']:>10,} {total['cost']:>9.3f} {_fmt_sec(total['wall_sec']):>8}")
+
+    by_model = {}
+    for call in calls:
+        m = by_model.setdefault(call["model"], [0, 0, 0.0])
+        m[0] += call["prompt_tokens"]
+        m[1] += call["output_tokens"]
+        m[2] += call["cost"]
+    for model, (prompt_tokens, output_tokens, cost) in sorted(by_model.items()):
+        print(f"  {model}: 入力 {prompt_tokens:,} / 出力 {output_tokens:,} トークン / ${cost:.3f}")
+    if total["prompt_tokens"]:
+        print(f"  入力のうちキャッシュから読まれる共通プレフィックス: {total['cached_tokens']:,} トークン "
+              f"({total['cached_tokens'] / total['prompt_tokens'] * 100:.0f}%。キャッシュ済みの入力の料金と保存料で計上)")
+
+    print(f"\n[入力が大きいプロンプト 上位 {top_n}]")
+    for call in sorted(calls, key=lambda c: c["prompt_tokens"], reverse=True)[:top_n]:
+        print(f"  {call['prompt_tokens']:>8,} tok  {call['model']:<17} {call['label']}")
+
+    print(f"\n[コストへの寄与が大きいプロンプト 上位 {top_n}]")
+    for call in sorted(calls, key=lambda c: c["cost"], reverse=True)[:top_n]:
+        share = call["cost"] / total["cost"] * 100 if total["cost"] else 0.0
+        print(f"  ${call['cost']:.4f} ({share:4.1f}%)  {call['model']:<17} {call['label']}")
+
+    components = {}
+    for call in calls:
+        for name, tokens in call["component_tokens"].items():
+            components[name] = components.get(name, 0) + tokens
+    if components and total["prompt_tokens"]:
+        print(f"\n[プロンプトに繰り返し埋め込まれる部品（全呼び出しの合計）]")
+        for name, tokens in sorted(components.items(), key=lambda kv: kv[1], reverse=True):
+            print(f"  {name.ljust(20)} {tokens:>10,} tok ({tokens / total['prompt_tokens'] * 100:4.1f}% of 入力)")
+    return total
+
+
+def _fmt_sec(seconds):
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds:.0f}s"
@@ -0,0 +1,21 @@
+class PipelineError(Exception):
+    """
+    パイプラインの失敗。スクリプト (main_XX) では終了コード 1 に変換し、
+    ライブラリAPI (site_builder.py) ではそのまま呼び出し側に送出する。
+    """
+
+
+class ClientInitError(PipelineError):
+    """Geminiクライアントを初期化できない（APIキーが無いなど）。"""
+
+
+class InputNotFoundError(PipelineError):
+    """意見ファイルやサイトディレクトリなど、実行に必要な入力が見つからない。"""
+
+
+class ConfigurationError(PipelineError):
+    """設定が不正（タグIDが1つも指定されていないなど）。"""
+
+
+class GenerationError(PipelineError):
+    """生成結果が後続の処理に使えない（ターゲットリストや記事企画が空、親ハブが計画に無いなど）。"""
@@ -0,0 +1,149 @@
+import time
+import threading
+from collections import deque
+
+
+class FairScheduler:
+    """
+    複数サイトで共有する同時実行枠。
+    空きが出るたびに、待機中のサイトをラウンドロビンで選んで枠を割り当てるため、
+    ページ数の多いサイトが他サイトのLLM呼び出しを締め出すことがない。
+    """
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = {}          # site -> deque[ticket]
+        self._rotation = deque()    # 待機中サイトの巡回順
+        self._granted = set()
+
+    def acquire(self, site):
+        with self._cond:
+            ticket = object()
+            if site not in self._waiting:
+                self._waiting[site] = deque()
+                self._rotation.append(site)
+            self._waiting[site].append(ticket)
+            self._dispatch()
+            while ticket not in self._granted:
+                self._cond.wait()
+            self._granted.discard(ticket)
+
+    def release(self, site):
+        with self._cond:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        """空き枠がある限り、次のサイトの先頭の待機者に枠を渡す。"""
+        granted_any = False
+        while self._in_flight < self.max_concurrency and self._rotation:
+            site = self._rotation.popleft()
+            queue = self._waiting[site]
+            self._granted.add(queue.popleft())
+            self._in_flight += 1
+            granted_any = True
+            if queue:
+                self._rotation.append(site)
+            else:
+                del self._waiting[site]
+        if granted_any:
+            self._cond.notify_all()
+
+
+class SiteStats:
+    """サイト単位の進捗とLLM呼び出しの統計。"""
+
+    def __init__(self, name):
+        self.name = name
+        self.status = "pending"
+        self.current_pipeline = None
+        self.calls_done = 0
+        self.calls_failed = 0
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.output_tokens = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def begin_call(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def record_call(self, waited, elapsed, ok, output_tokens=0):
+        with self._lock:
+            self.in_flight -= 1
+            self.wait_seconds += waited
+            self.busy_seconds += elapsed
+            self.output_tokens += output_tokens or 0
+            if ok:
+                self.calls_done += 1
+            else:
+                self.calls_failed += 1
+
+    def summary_line(self):
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return (f"{self.name.ljust(20)} {self.status.ljust(8)} "
+                f"[{self.current_pipeline or '-'}] 呼び出し {self.calls_done} 件成功 / {self.calls_failed} 件失敗 / "
+                f"実行中 {self.in_flight} / 待機 {self.wait_seconds:.1f}s / 経過 {elapsed:.0f}s")
+
+
+class _ScheduledModels:
+    def __init__(self, models, scheduler, stats):
+        self._models = models
+        self._scheduler = scheduler
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+    def generate_content(self, *args, **kwargs):
+        site = self._stats.name
+        t0 = time.time()
+        self._scheduler.acquire(site)
+        t1 = time.time()
+        self._stats.begin_call()
+        ok = False
+        response = None
+        try:
+            response = self._models.generate_content(*args, **kwargs)
+            ok = True
+            return response
+        finally:
+            self._scheduler.release(site)
+            usage = getattr(response, 'usage_metadata', None)
+            self._stats.record_call(t1 - t0, time.time() - t1, ok, getattr(usage, 'candidates_token_count', 0))
+
+    def generate_content_stream(self, *args, **kwargs):
+        site = self._stats.name
+        t0 = time.time()
+        self._scheduler.acquire(site)
+        t1 = time.time()
+        self._stats.begin_call()
+        ok = False
+        try:
+            for chunk in self._models.generate_content_stream(*args, **kwargs):
+                yield chunk
+            ok = True
+        finally:
+            self._scheduler.release(site)
+            self._stats.record_call(t1 - t0, time.time() - t1, ok)
+
+
+class ScheduledClient:
+    """
+    Geminiクライアントのラッパー。models.generate_content(_stream) の呼び出しを
+    共有の FairScheduler 経由で実行し、サイト単位の統計を記録する。
+    それ以外の属性は元のクライアントにそのまま委譲する。
+    """
+
+    def __init__(self, client, scheduler, stats):
+        self._client = client
+        self.models = _ScheduledModels(client.models, scheduler, stats)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
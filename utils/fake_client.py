@@ -0,0 +1,141 @@
+import re
+import json
+import time
+import threading
+from types import SimpleNamespace
+
+# --- ローカル用のGeminiクライアント代替 ---
+# ベンチマークやドライランで、API を呼ばずにパイプライン全体を実行するために使う。
+# プロンプトの内容から呼び出し元を推定し、各エージェントが期待する形式の応答を返す。
+
+FAKE_SECTION_DIRS = ['vision', 'solutions', 'insights', 'collaboration']
+
+
+def _fake_page_html(title, body="<p>ダミー本文</p>"):
+    return (
+        "<!DOCTYPE html>\n<html lang=\"ja\">\n<head>\n<meta charset=\"utf-8\"/>\n"
+        f"<title>{title}</title>\n<script src=\"https://cdn.tailwindcss.com\"></script>\n</head>\n"
+        f"<body>\n<header><nav><a href=\"index.html\">ホーム</a></nav></header>\n<main>\n<h1>{title}</h1>\n{body}\n</main>\n"
+        "<footer><p>&copy; PEOPLE OPT</p></footer>\n</body>\n</html>"
+    )
+
+
+def _search_int(pattern, text, default):
+    match = re.search(pattern, text)
+    return int(match.group(1)) if match else default
+
+
+def _wrap_code(code):
+    return f"```html\n{code}\n```eof"
+
+
+def default_responder(contents, config=None):
+    """プロンプトから呼び出し元を推定し、それらしい応答テキストを返す。"""
+    prompt = contents if isinstance(contents, str) else json.dumps(contents, ensure_ascii=False, default=str)
+    json_mode = getattr(config, 'response_mime_type', None) == "application/json"
+
+    if json_mode:
+        if '"nav"' in prompt and '"pages"' in prompt:
+            pages = [{"title": "ホーム", "file_name": "index.html", "purpose": "サイトの顔。"}]
+            pages += [{"title": d.upper(), "file_name": f"{d}/index.html", "purpose": f"{d} のハブページ。"} for d in FAKE_SECTION_DIRS]
+            nav = [{"title": p['title'], "file_name": p['file_name']} for p in pages]
+            return json.dumps({"nav": nav, "pages": pages}, ensure_ascii=False)
+        if '固定ページ' in prompt:
+            pages = [{"title": "ホーム", "file_name": "index.html", "purpose": "サイトの顔。"}]
+            pages += [{"title": d.upper(), "file_name": f"{d}/index.html", "purpose": f"{d} のハブページ。"} for d in FAKE_SECTION_DIRS]
+            return json.dumps(pages, ensure_ascii=False)
+        if '次にリソースを投入すべきセクション' in prompt:
+            rows = re.findall(r"\|\s*(\S+index\.html)\s*\|\s*(\d+)\s*\|", prompt)
+            file_name = min(rows, key=lambda r: int(r[1]))[0] if rows else "solutions/index.html"
+            return json.dumps({"file_name": file_name, "reason": "記事数が最も少ないため。"}, ensure_ascii=False)
+        if 'SEOスラッグ' in prompt:
+            count = _search_int(r"を (\d+) 件生成", prompt, 3)
+            start = _search_int(r"考慮し (\d+) から開始", prompt, 1)
+            return json.dumps([
+                {"title": f"ダミー記事 {start + i}", "summary": "ダミー要約", "file_name": f"dummy-article-{start + i}.html"}
+                for i in range(count)
+            ], ensure_ascii=False)
+        if '### 翻訳対象' in prompt:
+            numbered = json.loads(prompt.split('### 翻訳対象', 1)[1].strip())
+            return json.dumps({key: f"[EN] {text}" for key, text in numbered.items()}, ensure_ascii=False)
+        if '章立て' in prompt and '各章の要約' not in prompt:
+            return json.dumps([{"heading": f"第{i + 1}章", "summary": "ダミー"} for i in range(3)], ensure_ascii=False)
+        return "[]"
+
+    section = re.search(r"第(\d+)章だけ", prompt)
+    if section:
+        return _wrap_code(f"<section>\n<h2>第{section.group(1)}章</h2>\n<p>ダミー本文</p>\n</section>")
+    if "<!-- MAIN_CONTENT -->" in prompt:
+        return _wrap_code(_fake_page_html("ダミー", "<!-- MAIN_CONTENT -->"))
+    if "[START HTML CODE]" in prompt:
+        match = re.search(r"ページのタイトル: (.+)", prompt)
+        title = match.group(1).strip() if match else "ダミー"
+        return _wrap_code(_fake_page_html(title))
+    return "**パーパス:** ダミー\n**ミッション:** ダミー\n**ビジョン:** ダミー\n**法人格/トーン:** 論理的"
+
+
+class _FakeModels:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        return self._owner._respond(model, contents, config)
+
+    def generate_content_stream(self, model, contents, config=None, **kwargs):
+        response = self._owner._respond(model, contents, config)
+        text = response.text
+        step = max(len(text) // 8, 1)
+        for i in range(0, len(text), step):
+            yield SimpleNamespace(text=text[i:i + step], usage_metadata=None)
+
+
+class _FakeCaches:
+    """client.caches の代替（コンテキストキャッシュのローカル版）。登録した内容は応答時にプロンプトの前に連結される。"""
+
+    def __init__(self):
+        self.contents = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, config=None, **kwargs):
+        config = config or {}
+        with self._lock:
+            self._count += 1
+            name = f"cachedContents/fake-{self._count}"
+            self.contents[name] = "".join(config.get("contents", []))
+        return SimpleNamespace(name=name, model=model)
+
+    def delete(self, name, **kwargs):
+        with self._lock:
+            self.contents.pop(name, None)
+
+
+class FakeClient:
+    """
+    genai.Client の代替。models.generate_content / generate_content_stream を持ち、
+    latency_sec だけ待ってから responder の応答を返す。呼び出しは calls に記録される。
+    """
+
+    persist_stats = False  # ダミーの呼び出しの統計は model_stats.json に保存しない
+
+    def __init__(self, latency_sec=0.0, responder=default_responder):
+        self.latency_sec = latency_sec
+        self.responder = responder
+        self.calls = []
+        self._lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.caches = _FakeCaches()
+
+    def _respond(self, model, contents, config):
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        cached_name = getattr(config, 'cached_content', None)
+        cached = self.caches.contents[cached_name] if cached_name else ""
+        if cached and isinstance(contents, str):
+            contents = cached + contents
+        text = self.responder(contents, config)
+        prompt_chars = len(contents) if isinstance(contents, str) else 0
+        with self._lock:
+            self.calls.append({"model": model, "prompt_chars": prompt_chars, "output_chars": len(text)})
+        usage = SimpleNamespace(prompt_token_count=prompt_chars, candidates_token_count=len(text), cached_content_token_count=len(cached))
+        return SimpleNamespace(text=text, usage_metadata=usage)
@@ -1,8 +1,30 @@
 import os
-import pandas as pd
 import re
 import json
 
+from utils.translation_utils import TARGET_LANGUAGE_NAMES
+
+# Markdownテーブルの列名 ⇔ 辞書キーの対応
+MARKDOWN_COLUMN_TO_KEY = {
+    'ファイル名': 'file_name',
+    'タイトル': 'title',
+    '生成された目的': 'generated_purpose',
+    '概要・目的': 'summary'
+}
+# ビルド工程が公開サイト内に生成するディレクトリ（検索インデックスと、翻訳先の各言語版）。記事の走査や採番の対象にしない
+DERIVED_SITE_DIRS = ('search',) + tuple(TARGET_LANGUAGE_NAMES)
+_CELL_SPLIT_PATTERN = re.compile(r'(?<!\\)\|')
+_SEPARATOR_CELL_PATTERN = re.compile(r'^:?-+:?$')
+
+def _split_markdown_row(line):
+    """'| a | b |' 形式の行をセルのリストに分割する（'\\|' はセル内の '|' として扱う）。"""
+    cells = _CELL_SPLIT_PATTERN.split(line.strip().strip('|'))
+    return [c.strip().replace('**', '').replace('\\|', '|') for c in cells]
+
+def _is_separator_row(cells):
+    """区切り行（|:---|:---| など）かどうかを判定する。"""
+    return all(_SEPARATOR_CELL_PATTERN.match(c) or not c for c in cells) and any(cells)
+
 def load_markdown_table_to_list(file_path):
     """
     Markdownファイルからテーブルを読み込み、目的の辞書リスト形式に変換する。
@@ -11,30 +33,28 @@ def load_markdown_table_to_list(file_path):
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
 
-        # Pandas DataFrame を使って読み込む
         lines = content.strip().split('\n')
         header_line = next(line for line in lines if line.startswith('|') and 'ファイル名' in line)
-        data_lines = [line for line in lines if line.startswith('|') and '---|---' not in line and 'ファイル名' not in line]
-
-        headers = [h.strip().replace('**', '') for h in header_line.strip('|').split('|')]
-        data = [[c.strip().replace('**', '') for c in row.strip('|').split('|')] for row in data_lines]
+        data_lines = [line for line in lines if line.startswith('|') and line is not header_line]
 
-        df = pd.DataFrame(data, columns=headers)
-
-        # 目的のキーにリネーム
-        df = df.rename(columns={
-            'ファイル名': 'file_name',
-            'タイトル': 'title',
-            '生成された目的': 'generated_purpose',
-            '概要・目的': 'summary'
-        })
+        headers = [MARKDOWN_COLUMN_TO_KEY.get(h, h) for h in _split_markdown_row(header_line)]
+        records = []
+        for line in data_lines:
+            cells = _split_markdown_row(line)
+            if _is_separator_row(cells):
+                continue
+            cells += [''] * (len(headers) - len(cells))
+            records.append(dict(zip(headers, cells)))
 
-        return df.to_dict(orient='records')
+        return records
 
     except Exception as e:
         print(f"❌ Markdown読み込みエラー: {e}")
         return None
 
+def _escape_markdown_cell(value):
+    return str(value if value is not None else '').replace('|', '\\|').replace('\n', ' ')
+
 def save_to_markdown(data_list, output_filename="planned_articles_summary.md"):
     """辞書のリストを受け取り、Markdown形式のテーブルとしてファイルに保存する。"""
     if not data_list:
@@ -42,25 +62,23 @@ def save_to_markdown(data_list, output_filename="planned_articles_summary.md"):
         return
 
     try:
-        df = pd.DataFrame(data_list)
-        df = df.rename(columns={
-            'title': 'タイトル',
-            'summary': '概要・目的',
-            'generated_purpose': '概要・目的',
-            'file_name': 'ファイル名'
-        })
+        # カラムの順序を整える ('summary' と 'generated_purpose' はどちらも「概要・目的」列)
+        has_summary = any(('summary' in item) or ('generated_purpose' in item) for item in data_list)
+        headers = ['ファイル名', 'タイトル'] + (['概要・目的'] if has_summary else [])
 
-        # カラムの順序を整える
-        if '概要・目的' in df.columns:
-            df = df[['ファイル名', 'タイトル', '概要・目的']]
-        else:
-            df = df[['ファイル名', 'タイトル']]
+        rows = []
+        for item in data_list:
+            row = [item.get('file_name'), item.get('title')]
+            if has_summary:
+                row.append(item.get('summary', item.get('generated_purpose')))
+            rows.append(row)
 
-        markdown_table = df.to_markdown(index=False)
+        lines = ["| " + " | ".join(headers) + " |", "|" + "|".join([":---"] * len(headers)) + "|"]
+        lines += ["| " + " | ".join(_escape_markdown_cell(c) for c in row) + " |" for row in rows]
 
         with open(output_filename, 'w', encoding='utf-8') as f:
             f.write("## 📜 コンテンツ全体計画 (既存 + 新規)\n\n")
-            f.write(markdown_table)
+            f.write("\n".join(lines) + "\n")
 
         print(f"✅ 成功: Markdownファイル '{output_filename}' が作成されました。")
     except Exception as e:
@@ -87,7 +105,9 @@ def get_existing_article_count(base_dir):
     count = 0
     if not os.path.isdir(base_dir):
         return 0
-    for root, _, files in os.walk(base_dir):
+    for root, dirs, files in os.walk(base_dir):
+        if root == base_dir:
+            dirs[:] = [d for d in dirs if d not in DERIVED_SITE_DIRS]
         for filename in files:
             if filename.lower().endswith(('.html', '.htm')) and filename.lower() != 'index.html':
                 count += 1
@@ -112,3 +132,36 @@ def get_next_article_number(section_folder, base_dir):
             except ValueError:
                 continue
     return max_num + 1
+
+def write_text_if_changed(path, text):
+    """内容が変わったファイルだけを書き換える（公開サイトの差分とブラウザ・クローラーのキャッシュ無効化を最小にする）。"""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return True
+
+def list_site_pages(base_dir, excluded_dirs=()):
+    """公開サイトのHTMLファイルを {base_dir からの相対パス: パス} で返す（excluded_dirs は直下のディレクトリ名）。"""
+    pages = {}
+    for root, dirs, files in os.walk(base_dir):
+        if root == base_dir:
+            dirs[:] = [d for d in dirs if d not in excluded_dirs]
+        for name in files:
+            if name.lower().endswith(('.html', '.htm')):
+                path = os.path.join(root, name)
+                pages[os.path.relpath(path, base_dir).replace(os.path.sep, '/')] = path
+    return dict(sorted(pages.items()))
+
+def page_url(rel_path):
+    """docs/ からの相対パスを公開URLのパスにする（index.html はディレクトリのURLにする）。"""
+    rel_path = rel_path.replace(os.path.sep, '/')
+    if rel_path == "index.html":
+        return ""
+    if rel_path.endswith("/index.html"):
+        return rel_path[:-len("index.html")]
+    return rel_path
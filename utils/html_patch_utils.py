@@ -0,0 +1,122 @@
+import re
+from bs4 import BeautifulSoup
+
+HEADING_TAGS = ['h1', 'h2', 'h3']
+SUPPORTED_OPS = ('replace_section', 'insert_after_heading', 'insert_section_after', 'rename_heading', 'remove_section')
+HTML_OPS = ('replace_section', 'insert_after_heading', 'insert_section_after')  # html が必須の操作
+MIN_PREFIX_CHARS = 4  # 前方一致で救済する見出しの最小文字数
+
+
+def _heading_level(tag):
+    return int(tag.name[1])
+
+
+def find_heading(soup, heading_text):
+    """
+    <main> 内（無ければ文書全体）から、テキストが一致する見出しを探す。
+    完全一致が無い場合は前方一致で救済するが、対象が短すぎる場合や複数の見出しに一致する場合は None を返す。
+    """
+    scope = soup.find('main') or soup
+    target = (heading_text or '').strip()
+    if not target:
+        return None
+    headings = scope.find_all(HEADING_TAGS)
+    for tag in headings:
+        if tag.get_text().strip() == target:
+            return tag
+    # 完全一致が無い場合は前方一致で救済する（モデルが見出しを省略して返すことがあるため）
+    if len(target) < MIN_PREFIX_CHARS:
+        return None
+    matches = [tag for tag in headings if tag.get_text().strip().startswith(target)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def section_body_nodes(heading):
+    """
+    見出しに続く「章の本文」ノードを返す。
+    同じ親の中で、同レベル以上の次の見出し（またはその見出しを含む要素）が現れるまでが範囲。
+    """
+    level = _heading_level(heading)
+    nodes = []
+    for sibling in heading.next_siblings:
+        if getattr(sibling, 'name', None) in HEADING_TAGS and _heading_level(sibling) <= level:
+            break
+        if hasattr(sibling, 'find'):
+            inner = sibling.find(HEADING_TAGS)
+            if inner is not None and _heading_level(inner) <= level:
+                break
+        nodes.append(sibling)
+    return nodes
+
+
+def summarize_sections(soup, excerpt_chars=300):
+    """各見出しと、その本文の冒頭抜粋のリストを返す（パッチ生成プロンプト用）。"""
+    scope = soup.find('main') or soup
+    digest = []
+    for heading in scope.find_all(HEADING_TAGS):
+        body_text = " ".join(
+            n.get_text(separator=' ', strip=True) if hasattr(n, 'get_text') else str(n).strip()
+            for n in section_body_nodes(heading)
+        ).strip()
+        digest.append({
+            "heading": heading.get_text().strip(),
+            "level": heading.name,
+            "excerpt": body_text[:excerpt_chars],
+        })
+    return digest
+
+
+def _fragment(html):
+    return BeautifulSoup(html, 'html.parser')
+
+
+def apply_patch_ops(html, ops):
+    """
+    章単位の編集操作リストをDOMに適用する。
+    戻り値: (更新後のHTML, 適用できた操作のリスト, スキップした操作と理由のリスト)
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    applied, skipped = [], []
+
+    for op in ops:
+        kind = op.get('op')
+        if kind not in SUPPORTED_OPS:
+            skipped.append((op, f"未対応の操作: {kind}"))
+            continue
+        if not str(op.get('heading') or '').strip():
+            skipped.append((op, "heading がありません"))
+            continue
+        if kind in HTML_OPS and not str(op.get('html') or '').strip():
+            skipped.append((op, "html がありません"))
+            continue
+        heading = find_heading(soup, op['heading'])
+        if heading is None:
+            skipped.append((op, f"見出しが見つかりません: {op.get('heading')}"))
+            continue
+
+        if kind == 'rename_heading':
+            if not op.get('new_heading'):
+                skipped.append((op, "new_heading がありません"))
+                continue
+            heading.string = op['new_heading']
+        elif kind == 'remove_section':
+            for node in section_body_nodes(heading):
+                node.extract()
+            heading.decompose()
+        elif kind == 'replace_section':
+            nodes = section_body_nodes(heading)
+            for node in nodes:
+                node.extract()
+            heading.insert_after(_fragment(op['html']))
+        elif kind == 'insert_after_heading':
+            heading.insert_after(_fragment(op['html']))
+        elif kind == 'insert_section_after':
+            nodes = section_body_nodes(heading)
+            anchor = nodes[-1] if nodes else heading
+            anchor.insert_after(_fragment(op['html']))
+        applied.append(op)
+
+    # main_03 と同様に、BeautifulSoup が付与する空の真偽属性を元の表記に戻す
+    html_output = re.sub(r'async=""', 'async', str(soup))
+    html_output = re.sub(r'crossorigin=""', 'crossorigin', html_output)
+    return html_output, applied, skipped
@@ -0,0 +1,69 @@
+import os
+
+from utils.build_graph import compute_hash, load_build_state, save_build_state
+from utils.model_router import classify_page
+
+# --- ハブの所属記事の変化検出 ---
+# 各ハブ (*/index.html) について、最後に生成したときのセクションの所属記事（同じディレクトリの詳細記事の
+# ファイル名とタイトル）を記録し、サイト計画と比べて所属が変わったハブだけを再生成の対象にする。
+#   output_reports/hub_state.json : {ハブ: {"members_hash", "members": [[ファイル名, タイトル], ...]}}
+HUB_STATE_FILE = "output_reports/hub_state.json"
+
+
+def state_file_for(reports_dir):
+    return os.path.join(reports_dir, os.path.basename(HUB_STATE_FILE))
+
+
+def list_hubs(plans):
+    """計画に含まれるハブ（ユーティリティページを除く）のファイル名を返す。"""
+    return [p['file_name'] for p in plans if classify_page(p['file_name']) == "hub"]
+
+
+def section_members(plans, hub):
+    """ハブと同じディレクトリにある詳細記事の [ファイル名, タイトル] を、ファイル名順に返す。"""
+    hub_dir = os.path.dirname(hub)
+    return sorted([p['file_name'], p['title']] for p in plans
+                  if os.path.dirname(p['file_name']) == hub_dir and p['file_name'] != hub)
+
+
+def detect_changed_hubs(plans, state, base_dir, force=False):
+    """
+    ハブごとの状態を {ハブ: {"status", "added", "removed"}} で返す。status は次のいずれか。
+    - 'fresh'   : 所属記事が前回の生成時と同じ
+    - 'changed' : 所属記事が増えた・減った・タイトルが変わった（または force=True）
+    - 'missing' : ハブのページが存在しない
+    - 'adopt'   : 記録が無いがページは存在する（初回のみ、現在の所属をベースラインとして採用）
+    """
+    results = {}
+    for hub in list_hubs(plans):
+        members = section_members(plans, hub)
+        record = state.get(hub)
+        previous = record.get('members', []) if record else []
+        added = [m for m in members if m not in previous]
+        removed = [m for m in previous if m not in members]
+        if not os.path.exists(os.path.join(base_dir, hub)):
+            status = 'missing'
+        elif force:
+            status = 'changed'
+        elif record is None:
+            status = 'adopt'
+        elif record.get('members_hash') != compute_hash(members):
+            status = 'changed'
+        else:
+            status = 'fresh'
+        results[hub] = {"status": status, "added": added, "removed": removed}
+    return results
+
+
+def record_hub(state, hub, members):
+    """ハブを生成したときの所属記事 (section_members の戻り値) を記録する。"""
+    state[hub] = {"members_hash": compute_hash(members), "members": members}
+
+
+def record_hubs(reports_dir, hub_members):
+    """{ハブ: 所属記事} を reports_dir の状態ファイルに記録する。"""
+    state_file = state_file_for(reports_dir)
+    state = load_build_state(state_file)
+    for hub, members in hub_members.items():
+        record_hub(state, hub, members)
+    save_build_state(state, state_file)
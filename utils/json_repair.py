@@ -0,0 +1,102 @@
+import re
+import json
+
+# --- ほぼ正しいJSON応答のローカル修復 ---
+# JSONモードの応答が壊れていても、呼び出し全体をやり直す前にローカルで修復を試みる。
+#   1. ```json フェンスや前後の説明文を取り除く
+#   2. 閉じ括弧の直前の余分なカンマを取り除く
+#   3. 出力上限で途中で切れた場合は、最後に完結した要素（オブジェクト内ならキーと値の組）までで切り詰めて括弧を閉じる
+# 切り詰めた場合は truncated=True を返すので、呼び出し側は欠けた要素だけを再要求できる。
+_FENCE_PATTERN = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+
+def strip_fences(text):
+    """コードフェンスを除き、最初の '{' / '[' から始まるテキストにする。"""
+    text = _FENCE_PATTERN.sub("", text or "").strip()
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    return text[min(starts):] if starts else text
+
+
+def _scan(text):
+    """
+    文字列リテラルを考慮して走査し、(余分なカンマを除いたテキスト, 最後に完結した要素の直後の位置と
+    その時点で開いている括弧のスタック) を返す。
+    """
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+    pending_comma = None  # 直前のカンマ（次の有効な文字が閉じ括弧なら捨てる）
+    last_complete = (0, [])
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch.isspace():
+            (pending_comma if pending_comma is not None else out).append(ch)
+            continue
+        if pending_comma is not None:
+            if ch not in '}]':
+                out.extend(pending_comma)
+            pending_comma = None
+        if ch == ',':
+            last_complete = (len(out), list(stack))  # カンマの直前までは完結した要素（オブジェクト内ならキーと値の組）
+            pending_comma = [ch]
+            continue
+        out.append(ch)
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append(ch)
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            last_complete = (len(out), list(stack))
+            if not stack:
+                break  # トップレベルの値が閉じた（以降の説明文は無視する）
+    return "".join(out), last_complete
+
+
+def repair_json(text):
+    """
+    応答テキストをJSONとして読み、(値, truncated) を返す。修復できない場合は ValueError を送出する。
+    truncated は、途中で切れていたため最後に完結した要素までで切り詰めたことを示す。
+    """
+    body = strip_fences(text)
+    try:
+        return json.loads(body), False
+    except ValueError:
+        pass
+    cleaned, (end, stack) = _scan(body)
+    try:
+        return json.loads(cleaned), False
+    except ValueError:
+        pass
+    if end:
+        closers = "".join('}' if c == '{' else ']' for c in reversed(stack))
+        try:
+            return json.loads(cleaned[:end] + closers), True
+        except ValueError:
+            pass
+    raise ValueError(f"JSONとして修復できません: {body[:80]!r}")
+
+
+def missing_fields(item, required):
+    """必須フィールドのうち、欠けている（または空文字列の）ものを返す。"""
+    if not isinstance(item, dict):
+        return list(required)
+    return [f for f in required if not (isinstance(item.get(f), str) and item[f].strip())]
+
+
+def split_complete(items, required):
+    """要素を (必須フィールドが揃ったもの, 欠けがあるもの) に分ける。"""
+    complete, incomplete = [], []
+    for item in items if isinstance(items, list) else []:
+        (incomplete if missing_fields(item, required) else complete).append(item)
+    return complete, incomplete
@@ -0,0 +1,67 @@
+import json
+
+
+def iter_completed_array_items(chunks):
+    """
+    ストリーミングで届くJSONテキストの断片 (chunks) を逐次解析し、
+    配列要素（オブジェクト/配列）が閉じた時点で (key, item) を yield する。
+
+    - トップレベルが配列の場合: key は None
+    - トップレベルがオブジェクトの場合: その配列が入っているトップレベルのキー名
+    ```json フェンスなど、最初の '{' / '[' より前のテキストは無視する。
+    """
+    buffer = ""
+    pos = 0
+    stack = []          # 開いているコンテナ ('{' or '[')
+    in_string = False
+    escaped = False
+    string_start = None
+    last_string = None  # トップレベルオブジェクト直下で最後に閉じた文字列（キー候補）
+    current_key = None
+    item_start = None
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        while pos < len(buffer):
+            ch = buffer[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                    if len(stack) == 1 and stack[0] == '{':
+                        last_string = json.loads(buffer[string_start:pos + 1])
+                pos += 1
+                continue
+
+            if ch == '"':
+                if stack:
+                    in_string = True
+                    string_start = pos
+            elif ch == ':' and len(stack) == 1 and stack[0] == '{':
+                current_key = last_string
+            elif ch in '{[':
+                if not stack and ch == '{':
+                    current_key = None
+                if _is_item_container(stack):
+                    item_start = pos
+                stack.append(ch)
+            elif ch in '}]':
+                if stack:
+                    stack.pop()
+                if item_start is not None and _is_item_container(stack):
+                    item = json.loads(buffer[item_start:pos + 1])
+                    item_start = None
+                    yield (current_key if stack[0] == '{' else None), item
+            pos += 1
+
+
+def _is_item_container(stack):
+    """現在のスタック位置が「配列要素の直上」かどうかを判定する。"""
+    if stack == ['[']:
+        return True
+    return len(stack) == 2 and stack[0] == '{' and stack[1] == '['
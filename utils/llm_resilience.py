@@ -0,0 +1,258 @@
+import time
+import threading
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- テールレイテンシ対策の設定 ---
+DEFAULT_HTTP_TIMEOUT_MS = 600_000        # クライアントのHTTPタイムアウト（ハングした呼び出しを打ち切る）
+DEADLINE_GRACE_SEC = 10
+# 1回の呼び出し（ヘッジを含む）の締め切り。HTTPタイムアウトより短いと、締め切り後も通信中の呼び出しが残ったまま
+# 呼び出し側が再試行してしまうため、HTTPタイムアウト以上にする。
+DEFAULT_DEADLINE_SEC = DEFAULT_HTTP_TIMEOUT_MS / 1000 + DEADLINE_GRACE_SEC
+DEFAULT_HEDGE_DELAY_SEC = {"gemini-2.5-pro": 90.0, "gemini-2.5-flash": 20.0}
+# ヘッジ待ち時間の下限。短い呼び出し（章の生成など）の実績や、ダミークライアントの即時応答で
+# 待ち時間が 0 近くまで下がり、全ての呼び出しが重複して送られるのを防ぐ。
+MIN_HEDGE_DELAY_SEC = {"gemini-2.5-pro": 30.0, "gemini-2.5-flash": 5.0}
+HEDGE_PERCENTILE = 0.95
+MIN_SAMPLES_FOR_PERCENTILE = 5
+LATENCY_WINDOW = 50
+FALLBACK_MODEL = "gemini-2.5-flash"
+BREAKER_WINDOW = 20                      # 直近何回の呼び出しでエラー率を見るか
+BREAKER_MIN_CALLS = 5
+BREAKER_ERROR_RATE = 0.5                 # これ以上のエラー率でブレーカーを開く
+BREAKER_COOLDOWN_SEC = 60.0
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-call")
+
+
+class CircuitOpenError(Exception):
+    """ブレーカーが開いており、フォールバック先も無いため呼び出しを行わなかった。"""
+
+
+class LatencyTracker:
+    """
+    モデル × タスクごとの直近のレイテンシを保持し、ヘッジを出すまでの待ち時間 (p95、下限あり) を返す。
+    タスクを分けるのは、短い章の生成の実績で長いページ全体の生成がすぐにヘッジされないようにするため。
+    """
+
+    def __init__(self, model, task=None):
+        self.model = model
+        self.task = task
+        self._samples = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed):
+        with self._lock:
+            self._samples.append(elapsed)
+
+    def hedge_delay(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        floor = MIN_HEDGE_DELAY_SEC.get(self.model, 10.0)
+        if len(samples) < MIN_SAMPLES_FOR_PERCENTILE:
+            default = _SEEDED_DELAYS.get((self.model, self.task), DEFAULT_HEDGE_DELAY_SEC.get(self.model, 60.0))
+            return max(default, floor)
+        return max(samples[min(int(len(samples) * HEDGE_PERCENTILE), len(samples) - 1)], floor)
+
+
+class CircuitBreaker:
+    """直近の呼び出しのエラー率が閾値を超えたら一定時間「開く」サーキットブレーカー。"""
+
+    def __init__(self, model):
+        self.model = model
+        self._results = deque(maxlen=BREAKER_WINDOW)
+        self._opened_at = None
+        self._half_open_trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < BREAKER_COOLDOWN_SEC:
+                return False
+            # クールダウン後は1件だけ試行を通す (half-open)
+            if self._half_open_trial:
+                return False
+            self._half_open_trial = True
+            return True
+
+    def record(self, ok):
+        with self._lock:
+            if self._opened_at is not None and self._half_open_trial:
+                self._half_open_trial = False
+                if ok:
+                    self._opened_at = None
+                    self._results.clear()
+                    print(f"🔌 [ブレーカー] {self.model} を復旧しました。")
+                else:
+                    self._opened_at = time.monotonic()
+                return
+            self._results.append(ok)
+            failures = self._results.count(False)
+            if (self._opened_at is None and len(self._results) >= BREAKER_MIN_CALLS
+                    and failures / len(self._results) >= BREAKER_ERROR_RATE):
+                self._opened_at = time.monotonic()
+                STATS.incr("breaker_trips")
+                print(f"⚡ [ブレーカー] {self.model} のエラー率が {failures}/{len(self._results)} に達したため遮断します。")
+
+
+class ResilienceStats:
+    """
+    ヘッジ・キャンセル・タイムアウト・ブレーカー作動の件数。
+    cancellations は開始前に取り消せた呼び出し、abandoned は実行中だったため結果を破棄しただけの呼び出し
+    （HTTPタイムアウトまでスレッドと通信を使い続ける）。
+    """
+
+    KEYS = ("calls", "hedges", "hedge_wins", "cancellations", "abandoned", "timeouts", "breaker_trips", "downgrades", "shed")
+
+    def __init__(self):
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def incr(self, key, n=1):
+        with self._lock:
+            self._counts[key] += n
+
+    def snapshot(self):
+        with self._lock:
+            return {k: self._counts.get(k, 0) for k in self.KEYS}
+
+
+STATS = ResilienceStats()
+_SEEDED_DELAYS = {}  # (model, task) -> 過去の実行の p95（実行中の計測が揃うまでのヘッジ待ち時間）
+_last_call = threading.local()
+_TRACKERS = {}
+_BREAKERS = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _tracker(model, task=None):
+    with _REGISTRY_LOCK:
+        return _TRACKERS.setdefault((model, task), LatencyTracker(model, task))
+
+
+def _breaker(model):
+    with _REGISTRY_LOCK:
+        return _BREAKERS.setdefault(model, CircuitBreaker(model))
+
+
+def seed_hedge_delay(model, task, seconds):
+    """過去の実行の p95 を、モデル × タスクのヘッジ待ち時間の既定値にする（下限は適用される）。"""
+    _SEEDED_DELAYS[(model, task)] = seconds
+
+
+def last_call_model():
+    """このスレッドで最後に resilient_generate が実際に呼び出したモデル（ブレーカーで格下げされた場合は格下げ先）。"""
+    return getattr(_last_call, "model", None)
+
+
+def _choose_model(model, fallback_model):
+    """ブレーカーの状態に応じて、そのまま使う / 格下げする / 負荷を落とす を決める。"""
+    if _breaker(model).allow():
+        return model
+    if fallback_model and fallback_model != model and _breaker(fallback_model).allow():
+        STATS.incr("downgrades")
+        print(f"↘️ [ブレーカー] {model} が遮断中のため {fallback_model} に格下げします。")
+        return fallback_model
+    STATS.incr("shed")
+    raise CircuitOpenError(f"{model} のブレーカーが開いているため、呼び出しを見送りました。")
+
+
+def _timed_call(client, model, contents, config):
+    start = time.monotonic()
+    if config is None:
+        response = client.models.generate_content(model=model, contents=contents)
+    else:
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+    return response, time.monotonic() - start
+
+
+def _cancel(futures):
+    """残りの呼び出しを取り消す。既に実行中のものは止められないため、結果を破棄するだけ（abandoned として数える）。"""
+    for future in futures:
+        STATS.incr("cancellations" if future.cancel() else "abandoned")
+    futures.clear()
+
+
+def resilient_generate(client, model, contents, config=None, validate=None,
+                       deadline_sec=DEFAULT_DEADLINE_SEC, hedge=True, fallback_model=FALLBACK_MODEL, prepare=None, task=None):
+    """
+    締め切り・ヘッジ・サーキットブレーカー付きで generate_content を呼び出す。
+    - 呼び出しが p95 由来の待ち時間を超えても終わらなければ、同じリクエストをもう1本（ヘッジ）投げる。
+    - validate(response.text) が真になった最初の応答を採用し、残りは取り消す。
+    - 締め切りまでに有効な応答が無ければ、最後に受け取った応答を返すか、TimeoutError を送出する。
+    - prepare(model) を渡すと、ブレーカーで実際に呼び出すモデルが決まった後に (contents, config) を組み立てる
+      （モデルごとに異なるキャッシュを参照する場合など）。
+    - task を渡すと、ヘッジ待ち時間をモデル × タスクごとのレイテンシから決める。
+    """
+    model = _choose_model(model, fallback_model)
+    _last_call.model = model
+    if prepare is not None:
+        contents, config = prepare(model)
+    breaker = _breaker(model)
+    tracker = _tracker(model, task)
+    STATS.incr("calls")
+
+    start = time.monotonic()
+    deadline = start + deadline_sec
+    hedge_at = start + tracker.hedge_delay()
+    futures = {_EXECUTOR.submit(_timed_call, client, model, contents, config): "primary"}
+    hedged = not hedge
+    last_response, last_error = None, None
+
+    while futures:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        timeout = deadline - now
+        if not hedged:
+            timeout = min(timeout, max(hedge_at - now, 0))
+        done, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            if not hedged and time.monotonic() >= hedge_at:
+                hedged = True
+                STATS.incr("hedges")
+                print(f"  > 🪝 {model} の応答が遅いため、ヘッジリクエストを発行します。")
+                futures[_EXECUTOR.submit(_timed_call, client, model, contents, config)] = "hedge"
+            continue
+
+        for future in done:
+            kind = futures.pop(future)
+            try:
+                response, elapsed = future.result()
+            except Exception as e:
+                breaker.record(False)
+                last_error = e
+                continue
+            tracker.record(elapsed)
+            breaker.record(True)
+            if validate is None or validate(response.text):
+                if kind == "hedge":
+                    STATS.incr("hedge_wins")
+                _cancel(futures)
+                return response
+            last_response = response
+
+    if futures:
+        STATS.incr("timeouts")
+        breaker.record(False)
+        _cancel(futures)
+        print(f"  > ⏰ {model} の呼び出しが締め切り ({deadline_sec} 秒) を超えました。")
+    if last_response is not None:
+        return last_response
+    if last_error is not None:
+        raise last_error
+    raise TimeoutError(f"{model} の呼び出しが締め切り ({deadline_sec} 秒) を超えました。")
+
+
+def print_resilience_report():
+    """ヘッジ・キャンセル・ブレーカー作動の集計を表示する。"""
+    s = STATS.snapshot()
+    print(f"\n--- 🛡️ テールレイテンシ対策レポート ---")
+    print(f"  呼び出し: {s['calls']} 件 / ヘッジ: {s['hedges']} 件 (ヘッジ側が先着: {s['hedge_wins']} 件) / "
+          f"取り消し: {s['cancellations']} 件 / 破棄 (実行中): {s['abandoned']} 件 / タイムアウト: {s['timeouts']} 件")
+    print(f"  ブレーカー作動: {s['breaker_trips']} 回 / 格下げ: {s['downgrades']} 件 / 見送り: {s['shed']} 件")
+    for (model, task), tracker in sorted(_TRACKERS.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        print(f"  {model} / {task or '-'}: 現在のヘッジ待ち時間 {tracker.hedge_delay():.1f} 秒")
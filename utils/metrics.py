@@ -0,0 +1,379 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import defaultdict
+
+from utils.llm_resilience import STATS as RESILIENCE_STATS
+
+# --- 長時間の実行のライブ進捗とメトリクス ---
+# クライアントを InstrumentedClient で包み、models.generate_content(_stream) の完了ごとに
+# モデル別のリクエスト数・レイテンシのヒストグラム・トークン数・再試行数を記録する。
+# ページ生成などのフェーズは run_tracked() で包み、完了/失敗/実行中の件数と完了予測時刻を出す。
+# 出力は、定期的に書き換える状態ファイル (JSON) と、ポートを指定した場合のローカルHTTP
+# (/metrics: Prometheus テキスト形式, /status: JSON) の2つ。
+# 記録はサイト（base_dir / output_dir）ごとに分け、start_reporting(site=...) でジョブを始めるたびにそのサイトの記録を捨てる。
+# 長時間動くプロセス (site_builder.py) でも、状態ファイルには各ジョブの記録だけが出る。
+STATUS_FILE = "output_reports/status.json"
+STATUS_INTERVAL_SEC = 10
+METRICS_PORT_ENV = "HPGEN_METRICS_PORT"  # 設定するとローカルHTTPでメトリクスを公開する
+METRICS_HOST = "127.0.0.1"
+LATENCY_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_FIELDS = {
+    "prompt": "prompt_token_count",
+    "output": "candidates_token_count",
+    "cached": "cached_content_token_count",
+    "thoughts": "thoughts_token_count",
+}
+
+
+def _new_model_entry():
+    return {"ok": 0, "error": 0, "retries": 0, "in_flight": 0, "sum": 0.0,
+            "buckets": [0] * (len(LATENCY_BUCKETS) + 1), "tokens": dict.fromkeys(TOKEN_FIELDS, 0)}
+
+
+def _new_phase_entry():
+    return {"total": 0, "done": 0, "failed": 0, "in_flight": 0, "started_at": None}
+
+
+class Metrics:
+    """フェーズ別のページ進捗と、モデル別のLLM呼び出しの統計。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._site_started = {}                       # サイト -> ジョブの開始時刻
+        self._models = defaultdict(_new_model_entry)  # (サイト, モデル) -> 統計
+        self._phases = defaultdict(_new_phase_entry)  # (サイト, フェーズ) -> 件数
+        self._prompts_in_flight = defaultdict(int)    # (サイト, プロンプト) -> 実行中の数
+        self._prompts_seen = defaultdict(set)         # サイト -> 完了したプロンプト（再試行の判定用）
+
+    def begin_job(self, site):
+        """サイトのジョブの開始。そのサイトの前のジョブの記録（フェーズ・呼び出し統計・完了したプロンプト）を捨てる。"""
+        with self._lock:
+            for key in [k for k in self._phases if k[0] == site]:
+                del self._phases[key]
+            for key in [k for k in self._models if k[0] == site]:
+                del self._models[key]
+            self._prompts_seen.pop(site, None)
+            self._site_started[site] = time.time()
+
+    # --- フェーズ ---
+    def add_phase_total(self, site, phase, n=1):
+        with self._lock:
+            entry = self._phases[(site, phase)]
+            entry["total"] += n
+            entry["started_at"] = entry["started_at"] or time.time()
+
+    def page_started(self, site, phase):
+        with self._lock:
+            entry = self._phases[(site, phase)]
+            entry["in_flight"] += 1
+            entry["started_at"] = entry["started_at"] or time.time()
+
+    def page_finished(self, site, phase, ok, was_in_flight=True):
+        with self._lock:
+            entry = self._phases[(site, phase)]
+            entry["in_flight"] -= 1 if was_in_flight else 0
+            entry["done" if ok else "failed"] += 1
+
+    # --- LLM呼び出し ---
+    def begin_call(self, model, prompt_key, site=None):
+        """
+        呼び出しの開始を記録する。同じプロンプトが以前に完了していれば再試行として数える
+        （実行中の同じプロンプトへの重複はヘッジなので数えない）。
+        """
+        with self._lock:
+            entry = self._models[(site, model)]
+            entry["in_flight"] += 1
+            if prompt_key in self._prompts_seen[site] and not self._prompts_in_flight[(site, prompt_key)]:
+                entry["retries"] += 1
+            self._prompts_in_flight[(site, prompt_key)] += 1
+
+    def end_call(self, model, prompt_key, elapsed, ok, response=None, site=None):
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            entry = self._models[(site, model)]
+            entry["in_flight"] -= 1
+            entry["ok" if ok else "error"] += 1
+            entry["sum"] += elapsed
+            entry["buckets"][next((i for i, le in enumerate(LATENCY_BUCKETS) if elapsed <= le), len(LATENCY_BUCKETS))] += 1
+            for name, field in TOKEN_FIELDS.items():
+                entry["tokens"][name] += getattr(usage, field, None) or 0
+            self._prompts_in_flight[(site, prompt_key)] -= 1
+            if not self._prompts_in_flight[(site, prompt_key)]:
+                del self._prompts_in_flight[(site, prompt_key)]
+            self._prompts_seen[site].add(prompt_key)
+
+    # --- 出力 ---
+    def snapshot(self, site=None):
+        """状態ファイル・/status 用の辞書（フェーズ別の完了予測を含む）。site を渡すとそのサイトのジョブの記録だけを返す。"""
+        now = time.time()
+        with self._lock:
+            phases = {key: dict(entry) for key, entry in self._phases.items() if site is None or key[0] == site}
+            models = {key: json.loads(json.dumps(entry)) for key, entry in self._models.items() if site is None or key[0] == site}
+            started_at = self._site_started.get(site, self.started_at) if site is not None else self.started_at
+        elapsed = max(now - started_at, 1e-9)
+        phase_rows, etas = [], []
+        for (site, phase), entry in sorted(phases.items()):
+            finished = entry["done"] + entry["failed"]
+            remaining = max(entry["total"] - finished, 0)
+            eta = None
+            if remaining == 0:
+                eta = 0.0
+            elif finished and entry["started_at"]:
+                eta = remaining / (finished / max(now - entry["started_at"], 1e-9))
+            if eta is not None:
+                etas.append(eta)
+            phase_rows.append({"site": site, "phase": phase, "total": entry["total"], "done": entry["done"],
+                               "failed": entry["failed"], "in_flight": entry["in_flight"],
+                               "eta_sec": None if eta is None else round(eta, 1)})
+        model_rows = []
+        for (model_site, model), entry in sorted(models.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1]))):
+            count = entry["ok"] + entry["error"]
+            model_rows.append({"site": model_site, "model": model, "ok": entry["ok"], "error": entry["error"], "retries": entry["retries"],
+                               "in_flight": entry["in_flight"], "requests_per_min": round(count / elapsed * 60, 2),
+                               "avg_latency_sec": round(entry["sum"] / count, 2) if count else None,
+                               "latency_buckets": dict(zip([str(le) for le in LATENCY_BUCKETS] + ["+Inf"], entry["buckets"])),
+                               "tokens": entry["tokens"]})
+        eta = max(etas) if etas else None
+        return {
+            "updated_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now)),
+            "elapsed_sec": round(elapsed, 1),
+            "eta_sec": None if eta is None else round(eta, 1),
+            "projected_completion": None if eta is None else time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now + eta)),
+            "phases": phase_rows,
+            "models": model_rows,
+            "resilience": RESILIENCE_STATS.snapshot(),
+        }
+
+    def prometheus_text(self):
+        """Prometheus のテキスト形式（/metrics）。"""
+        snap = self.snapshot()
+        with self._lock:
+            # (サイト, モデル) -> Prometheus のラベル文字列
+            models = {f'site="{_escape(site or "")}",model="{model}"': json.loads(json.dumps(entry))
+                      for (site, model), entry in self._models.items()}
+        lines = [
+            "# HELP hpgen_phase_pages Pages per phase by state.",
+            "# TYPE hpgen_phase_pages gauge",
+        ]
+        for row in snap["phases"]:
+            for state in ("total", "done", "failed", "in_flight"):
+                lines.append(f'hpgen_phase_pages{{site="{_escape(row["site"])}",phase="{row["phase"]}",state="{state}"}} {row[state]}')
+        lines += ["# HELP hpgen_phase_eta_seconds Projected seconds until the phase completes.",
+                  "# TYPE hpgen_phase_eta_seconds gauge"]
+        for row in snap["phases"]:
+            if row["eta_sec"] is not None:
+                lines.append(f'hpgen_phase_eta_seconds{{site="{_escape(row["site"])}",phase="{row["phase"]}"}} {row["eta_sec"]}')
+        lines += ["# HELP hpgen_llm_requests_total Completed LLM requests.", "# TYPE hpgen_llm_requests_total counter"]
+        for labels, entry in sorted(models.items()):
+            lines.append(f'hpgen_llm_requests_total{{{labels},status="ok"}} {entry["ok"]}')
+            lines.append(f'hpgen_llm_requests_total{{{labels},status="error"}} {entry["error"]}')
+        lines += ["# HELP hpgen_llm_retries_total Requests that repeated an already completed prompt.",
+                  "# TYPE hpgen_llm_retries_total counter"]
+        lines += [f'hpgen_llm_retries_total{{{labels}}} {e["retries"]}' for labels, e in sorted(models.items())]
+        lines += ["# HELP hpgen_llm_in_flight LLM requests currently in flight.", "# TYPE hpgen_llm_in_flight gauge"]
+        lines += [f'hpgen_llm_in_flight{{{labels}}} {e["in_flight"]}' for labels, e in sorted(models.items())]
+        lines += ["# HELP hpgen_llm_request_duration_seconds LLM request latency.",
+                  "# TYPE hpgen_llm_request_duration_seconds histogram"]
+        for labels, entry in sorted(models.items()):
+            cumulative = 0
+            for le, n in zip([str(le) for le in LATENCY_BUCKETS] + ["+Inf"], entry["buckets"]):
+                cumulative += n
+                lines.append(f'hpgen_llm_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'hpgen_llm_request_duration_seconds_sum{{{labels}}} {entry["sum"]:.3f}')
+            lines.append(f'hpgen_llm_request_duration_seconds_count{{{labels}}} {cumulative}')
+        lines += ["# HELP hpgen_llm_tokens_total Tokens reported in usage metadata.", "# TYPE hpgen_llm_tokens_total counter"]
+        for labels, entry in sorted(models.items()):
+            for kind, n in entry["tokens"].items():
+                lines.append(f'hpgen_llm_tokens_total{{{labels},kind="{kind}"}} {n}')
+        lines += ["# HELP hpgen_llm_resilience_events_total Hedges, timeouts and circuit breaker events.",
+                  "# TYPE hpgen_llm_resilience_events_total counter"]
+        lines += [f'hpgen_llm_resilience_events_total{{event="{k}"}} {v}' for k, v in snap["resilience"].items()]
+        if snap["eta_sec"] is not None:
+            lines += ["# HELP hpgen_eta_seconds Projected seconds until every tracked phase completes.",
+                      "# TYPE hpgen_eta_seconds gauge", f"hpgen_eta_seconds {snap['eta_sec']}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+METRICS = Metrics()
+
+
+def _prompt_key(model, contents):
+    return hashlib.sha256(f"{model}\n{contents!r}".encode('utf-8')).hexdigest()[:16]
+
+
+def run_tracked(site, phase, fn, *args, **kwargs):
+    """
+    1ページ分の処理 fn を実行し、フェーズの実行中/完了/失敗を記録する。
+    戻り値が "❌" を含む文字列（このリポジトリの失敗の表し方）か、例外の場合は失敗として数える。
+    """
+    METRICS.page_started(site, phase)
+    ok = False
+    try:
+        result = fn(*args, **kwargs)
+        ok = not (isinstance(result, str) and "❌" in result)
+        return result
+    finally:
+        METRICS.page_finished(site, phase, ok)
+
+
+class _InstrumentedModels:
+    def __init__(self, models, site=None):
+        self._models = models
+        self._site = site
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+    def generate_content(self, *args, **kwargs):
+        model = kwargs.get("model", args[0] if args else None)
+        key = _prompt_key(model, kwargs.get("contents", args[1] if len(args) > 1 else None))
+        METRICS.begin_call(model, key, self._site)
+        start = time.monotonic()
+        ok, response = False, None
+        try:
+            response = self._models.generate_content(*args, **kwargs)
+            ok = True
+            return response
+        finally:
+            METRICS.end_call(model, key, time.monotonic() - start, ok, response, self._site)
+
+    def generate_content_stream(self, *args, **kwargs):
+        model = kwargs.get("model", args[0] if args else None)
+        key = _prompt_key(model, kwargs.get("contents", args[1] if len(args) > 1 else None))
+        METRICS.begin_call(model, key, self._site)
+        start = time.monotonic()
+        ok, last_chunk = False, None
+        try:
+            for chunk in self._models.generate_content_stream(*args, **kwargs):
+                last_chunk = chunk
+                yield chunk
+            ok = True
+        finally:
+            METRICS.end_call(model, key, time.monotonic() - start, ok, last_chunk, self._site)
+
+
+class InstrumentedClient:
+    """
+    Geminiクライアントのラッパー。models.generate_content(_stream) の完了ごとに、site のメトリクスとして記録する。
+    それ以外の属性（caches / batches / files など）は元のクライアントにそのまま委譲する。
+    """
+
+    def __init__(self, client, site=None):
+        self._client = client
+        self.models = _InstrumentedModels(client.models, site)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument_client(client, site=None):
+    """クライアントを InstrumentedClient で包む（既に包まれていればそのまま返す）。"""
+    if client is None or isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client, site)
+
+
+# --- 状態ファイルとHTTPエンドポイント ---
+_reporter_lock = threading.Lock()
+_reporter = {"refs": 0, "stop": None, "thread": None, "server": None, "status_files": []}
+
+
+def write_status(status_file, site=None):
+    os.makedirs(os.path.dirname(status_file) or '.', exist_ok=True)
+    tmp_path = status_file + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(METRICS.snapshot(site), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, status_file)
+
+
+def _write_all_status():
+    with _reporter_lock:
+        status_files = list(_reporter["status_files"])
+    for status_file, site in status_files:
+        try:
+            write_status(status_file, site)
+        except OSError as e:
+            print(f"⚠️ 状態ファイル ({status_file}) を書き込めません: {e}")
+
+
+def _status_loop(stop, interval):
+    while not stop.wait(interval):
+        _write_all_status()
+
+
+def _start_http_server(port):
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics"):
+                body, content_type = METRICS.prometheus_text(), "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path.startswith("/status"):
+                body, content_type = json.dumps(METRICS.snapshot(), ensure_ascii=False, indent=2), "application/json; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # アクセスログで進捗表示を埋めない
+
+    server = ThreadingHTTPServer((METRICS_HOST, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📈 メトリクスを http://{METRICS_HOST}:{port}/metrics (Prometheus) と /status (JSON) で公開しています。")
+    return server
+
+
+def start_reporting(status_file=STATUS_FILE, port=None, interval=STATUS_INTERVAL_SEC, site=None):
+    """
+    状態ファイルの定期書き換えと（ポートがあれば）HTTPエンドポイントを開始する。
+    site を渡すとそのサイトのジョブを始め（前のジョブの記録を捨てる）、状態ファイルにはそのサイトの記録だけを書く。
+    複数サイトを並行して実行する場合に備えて参照カウントし、最後の stop_reporting() で止める。
+    port を省略すると環境変数 HPGEN_METRICS_PORT を使う。
+    """
+    port = port or (int(os.environ[METRICS_PORT_ENV]) if os.environ.get(METRICS_PORT_ENV) else None)
+    if site is not None:
+        METRICS.begin_job(site)
+    with _reporter_lock:
+        _reporter["refs"] += 1
+        _reporter["status_files"].append((status_file, site))
+        if _reporter["thread"] is not None:
+            return
+        stop = threading.Event()
+        _reporter["stop"] = stop
+        _reporter["thread"] = threading.Thread(target=_status_loop, args=(stop, interval), name="metrics-status", daemon=True)
+        _reporter["thread"].start()
+        if port:
+            try:
+                _reporter["server"] = _start_http_server(port)
+            except OSError as e:
+                print(f"⚠️ メトリクスのHTTPエンドポイント (ポート {port}) を開始できません。状態ファイルのみ更新します: {e}")
+
+
+def stop_reporting(status_file=STATUS_FILE):
+    """最終状態を書き込み、最後の参照であれば定期書き換えとHTTPエンドポイントを止める。"""
+    _write_all_status()
+    with _reporter_lock:
+        for entry in [e for e in _reporter["status_files"] if e[0] == status_file][:1]:
+            _reporter["status_files"].remove(entry)
+        _reporter["refs"] = max(_reporter["refs"] - 1, 0)
+        if _reporter["refs"] or _reporter["thread"] is None:
+            return
+        _reporter["stop"].set()
+        server, _reporter["server"], _reporter["thread"] = _reporter["server"], None, None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
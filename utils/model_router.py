@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import threading
+
+from utils.llm_resilience import resilient_generate, seed_hedge_delay, last_call_model
+from utils.context_cache import build_request, record_usage
+from utils.json_repair import repair_json
+from utils.batch_utils import prompt_hash
+
+# --- タスク × ページ種別ごとのモデル振り分け ---
+ROUTING_FILE = "config/model_routing.json"
+STATS_FILE = "output_reports/model_stats.json"  # 既定の保存先（実行時は reports_dir 配下の同名ファイル）
+FEEDBACK_MIN_CALLS = 10        # 統計をデフォルトに反映するのに必要な呼び出し数
+FEEDBACK_MIN_SUCCESS = 0.7     # 成功率がこれを下回る段は、最初から上位モデルで呼び出す
+STATS_LATENCY_WINDOW = 50
+STATS_DECAY_CALLS = 100        # これを超えたら件数を半減させ、古い実行の影響を薄める
+PROBE_EVERY = 10               # 引き上げ中も、この回数に1回は設定どおりの段で試す
+
+_DEFAULT_ROUTE = {"model": "gemini-2.5-pro", "max_output_tokens": None, "thinking_budget": None}
+
+_lock = threading.Lock()
+_last_generation = threading.local()  # スレッドごとの直近の呼び出し（ページストアの来歴に使う）
+_routing = None
+_stats = None
+_promotions = {}
+
+
+def load_routing(path=ROUTING_FILE):
+    """ルーティング設定を読み込む（初回のみ）。ファイルが無ければ従来どおり全て pro を使う。"""
+    global _routing
+    if _routing is None:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                _routing = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ ルーティング設定 ({path}) を読み込めません。既定のモデルを使用します: {e}")
+            _routing = {"routes": {}, "escalation": {}, "utility_patterns": []}
+    return _routing
+
+
+def classify_page(file_name):
+    """ページを hub / article / utility に分類する。"""
+    patterns = load_routing().get("utility_patterns", [])
+    normalized = file_name.replace(os.path.sep, '/').lower()
+    if any(p in normalized for p in patterns):
+        return "utility"
+    if normalized.endswith("index.html"):
+        return "hub"
+    return "article"
+
+
+def _stats_key(task, page_class, model):
+    return f"{task}/{page_class}/{model}"
+
+
+def stats_file_for(reports_dir):
+    return os.path.join(reports_dir, os.path.basename(STATS_FILE))
+
+
+def load_model_stats(path=STATS_FILE):
+    """
+    過去の実行の統計 (reports_dir/model_stats.json) を読み込み、モデル × タスクごとの p95 をヘッジ待ち時間の既定値に反映する。
+    統計はプロセス内で共有し、既に読み込んだ統計に無い段だけを追加する（複数サイトを1プロセスで実行する場合）。
+    """
+    global _stats
+    loaded = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                loaded = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            loaded = {}
+    with _lock:
+        if _stats is None:
+            _stats = {}
+        for key, entry in loaded.items():
+            _stats.setdefault(key, entry)
+        stats = dict(_stats)
+
+    latencies = {}
+    for key, entry in stats.items():
+        task, _, model = key.split('/', 2)
+        latencies.setdefault((model, task), []).extend(entry.get("latencies", []))
+    for (model, task), samples in latencies.items():
+        if len(samples) >= FEEDBACK_MIN_CALLS:
+            samples = sorted(samples)
+            seed_hedge_delay(model, task, samples[min(int(len(samples) * 0.95), len(samples) - 1)])
+    return stats
+
+
+def _load_stats():
+    """プロセス内の統計（まだ読み込んでいなければ既定の保存先から読み込む）。"""
+    if _stats is None:
+        load_model_stats()
+    return _stats
+
+
+def route(task, page_class="default"):
+    """
+    タスクとページ種別から {model, max_output_tokens, thinking_budget} を決める。
+    過去の統計でその段の成功率が低い場合は、最初から上位モデルに引き上げる。
+    """
+    routing = load_routing()
+    task_routes = routing.get("routes", {}).get(task, {})
+    chosen = dict(task_routes.get(page_class) or task_routes.get("default") or _DEFAULT_ROUTE)
+
+    stats = _load_stats()
+    with _lock:
+        entry = stats.get(_stats_key(task, page_class, chosen["model"]))
+    if entry and entry["calls"] >= FEEDBACK_MIN_CALLS and entry["ok"] / entry["calls"] < FEEDBACK_MIN_SUCCESS:
+        key = (task, page_class)
+        _promotions[key] = _promotions.get(key, 0) + 1
+        stronger = escalate(chosen)
+        if stronger and _promotions[key] % PROBE_EVERY:
+            print(f"  > 📈 {task}/{page_class} は {chosen['model']} の成功率が低いため {stronger['model']} で開始します。")
+            return stronger
+    return chosen
+
+
+def escalate(current):
+    """一段上位のモデルのルートを返す。上位が無ければ None。"""
+    stronger = load_routing().get("escalation", {}).get(current["model"])
+    if not stronger:
+        return None
+    # 上位モデルでは出力上限を絞らず、思考予算はモデルの既定値に任せる
+    return {"model": stronger, "max_output_tokens": current.get("max_output_tokens"), "thinking_budget": None}
+
+
+def config_dict(selected, **config_kwargs):
+    """ルートを GenerateContentConfig のキーの辞書にする（バッチファイルにもそのまま書ける形式）。"""
+    if selected.get("max_output_tokens"):
+        config_kwargs.setdefault("max_output_tokens", selected["max_output_tokens"])
+    if selected.get("thinking_budget") is not None:
+        config_kwargs.setdefault("thinking_config", {"thinking_budget": selected["thinking_budget"]})
+    return config_kwargs
+
+
+def build_config(selected, **config_kwargs):
+    """ルートから GenerateContentConfig を組み立てる。"""
+    from google.genai import types
+    config_kwargs = config_dict(selected, **config_kwargs)
+    return types.GenerateContentConfig(**config_kwargs) if config_kwargs else None
+
+
+def record(task, page_class, model, elapsed, ok):
+    """1回の呼び出しの結果（レイテンシと検証の成否）を記録する。"""
+    stats = _load_stats()
+    with _lock:
+        entry = stats.setdefault(_stats_key(task, page_class, model),
+                                 {"calls": 0, "ok": 0, "total_sec": 0.0, "latencies": []})
+        entry["calls"] += 1
+        entry["ok"] += 1 if ok else 0
+        entry["total_sec"] = round(entry["total_sec"] + elapsed, 3)
+        entry["latencies"] = (entry["latencies"] + [round(elapsed, 3)])[-STATS_LATENCY_WINDOW:]
+        if entry["calls"] > STATS_DECAY_CALLS:
+            entry["calls"] //= 2
+            entry["ok"] //= 2
+            entry["total_sec"] = round(entry["total_sec"] / 2, 3)
+
+
+def is_json_list(text):
+    """
+    応答が空でないJSON配列として読めるか（モデル引き上げの判定用）。
+    フェンス・余分なカンマ・途中で切れた配列はローカルで修復できるため、上位モデルへの再呼び出しはしない。
+    """
+    try:
+        parsed, _ = repair_json(text)
+    except ValueError:
+        return False
+    return isinstance(parsed, list) and len(parsed) > 0
+
+
+def _cached_prepare(client, selected, cached_prefix, contents, task, config_kwargs):
+    """cached_prefix を使う呼び出しで、モデルが決まってからリクエストと設定を組み立てる関数（resilient_generate の prepare）。"""
+    def prepare(model):
+        request_contents, kwargs = build_request(client, model, cached_prefix, contents, task, config_kwargs)
+        return request_contents, build_config(selected, **kwargs)
+    return prepare
+
+
+def generate_routed(client, task, contents, page_class="default", validate=None, cached_prefix=None, **config_kwargs):
+    """
+    ルートに従ってモデルを選んで呼び出し、validate(response.text) が偽か呼び出しが例外（タイムアウト・ブレーカーなど）で
+    失敗したら上位モデルに引き上げて再度呼び出す。
+    最初に検証を通った応答を返す（どの段でも通らなければ最後の応答を返し、最後の段が例外ならその例外を送出する）。
+    cached_prefix を渡すと contents はサフィックスとして扱い、プレフィックスはモデルごとのコンテキストキャッシュから参照する。
+    """
+    selected = route(task, page_class)
+    response = None
+    while selected:
+        start = time.time()
+        ok, error = False, None
+        prepare = (_cached_prepare(client, selected, cached_prefix, contents, task, config_kwargs)
+                   if cached_prefix is not None else None)
+        try:
+            response = resilient_generate(client, selected["model"], contents,
+                                          config=build_config(selected, **config_kwargs), validate=validate,
+                                          prepare=prepare, task=task)
+            record_usage(task, response, client)
+            _last_generation.value = {"model": last_call_model(),
+                                      "prompt_hash": prompt_hash([cached_prefix, contents], last_call_model())}
+            ok = validate is None or bool(validate(response.text))
+        except Exception as e:
+            if not escalate(selected):
+                raise
+            error = e
+        finally:
+            # ブレーカーで格下げされた場合は、実際に応答したモデルの段として記録する
+            record(task, page_class, last_call_model() or selected["model"], time.time() - start, ok)
+        if ok:
+            return response
+        selected = escalate(selected)
+        if selected:
+            cause = f"呼び出しに失敗した ({error})" if error else "検証に失敗した"
+            print(f"  > ⬆️ {task}/{page_class} の{cause}ため {selected['model']} に引き上げます。")
+    return response
+
+
+def last_generation():
+    """このスレッドで最後に generate_routed が応答を得たモデルとプロンプトのハッシュ（ページストアに記録する来歴）。"""
+    return dict(getattr(_last_generation, "value", None) or {"model": None, "prompt_hash": None})
+
+
+def average_latency(task, page_class, model):
+    """過去の実行で記録された、その段の平均レイテンシ（秒）。記録が無ければ None。"""
+    stats = _load_stats()
+    with _lock:
+        entry = stats.get(_stats_key(task, page_class, model))
+    if not entry or not entry["calls"]:
+        return None
+    return entry["total_sec"] / entry["calls"]
+
+
+def save_model_stats(path=STATS_FILE, client=None):
+    """
+    段ごとの統計を保存し、一覧を表示する。次回の実行ではこの統計が既定値に反映される。
+    client がダミー（persist_stats = False。ベンチマークやドライラン用）の場合は、実運用の統計を汚さないよう保存しない。
+    """
+    if client is not None and not getattr(client, "persist_stats", True):
+        return
+    stats = _load_stats()
+    with _lock:
+        stats = dict(stats)
+    if not stats:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+
+    print(f"\n--- 🧭 モデル段ごとの統計 ({path}) ---")
+    for key, entry in sorted(stats.items()):
+        avg = entry["total_sec"] / entry["calls"] if entry["calls"] else 0.0
+        print(f"  {key.ljust(45)} 成功 {entry['ok']}/{entry['calls']} / 平均 {avg:.1f} 秒")
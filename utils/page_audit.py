@@ -0,0 +1,215 @@
+import os
+import json
+import hashlib
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.file_utils import list_site_pages
+
+# --- ページの重さ・レンダリングブロックの監査 ---
+# 公開サイトの各ページを標準ライブラリの HTMLParser で1回だけ走査し、バイト数・DOMノード数・
+# レンダリングをブロックするリソース数・重複したインラインアセットを数えて、予算 (config/page_budgets.json) と比較する。
+# 結果はハブ単位にも集計し、優先セクション選定のパフォーマンスデータに列として追加できる。
+BUDGETS_FILE = "config/page_budgets.json"
+REPORT_FILE = "output_reports/page_audit.md"
+EXCLUDED_DIRS = ("search",)
+PARALLEL_MIN_PAGES = 200  # これより少ないページ数ではプロセス起動の方が高くつくため、逐次で処理する
+_DEFAULT_BUDGET = {"max_kb": 60, "max_dom_nodes": 1500, "max_render_blocking": 2, "max_duplicate_inline": 0}
+
+
+class _AuditParser(HTMLParser):
+    """要素数、<head> 内の同期読み込み、インラインの script/style を数える。"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.dom_nodes = 0
+        self.render_blocking = []
+        self.external_hosts = set()
+        self.inline_blocks = []  # (種類, ハッシュ, バイト数)
+        self._in_head = False
+        self._inline_tag = None
+        self._inline_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        self.dom_nodes += 1
+        attrs = {k: (v or "") for k, v in attrs}
+        if tag == "head":
+            self._in_head = True
+        elif tag == "body":
+            self._in_head = False
+        src = attrs.get("src") or (attrs.get("href") if tag == "link" else "")
+        if src.startswith(("http://", "https://", "//")):
+            self.external_hosts.add(urlparse(src if not src.startswith("//") else "https:" + src).netloc)
+
+        if tag == "script":
+            if "src" in attrs:
+                sync = "async" not in attrs and "defer" not in attrs and attrs.get("type") != "module"
+                if sync and self._in_head:
+                    self.render_blocking.append(attrs["src"])
+            elif attrs.get("type", "text/javascript") in ("", "text/javascript", "module", "application/javascript"):
+                self._start_inline("script")
+        elif tag == "style":
+            self._start_inline("style")
+        elif tag == "link" and "stylesheet" in attrs.get("rel", "").lower().split():
+            if attrs.get("media", "all") in ("", "all", "screen") and self._in_head:
+                self.render_blocking.append(attrs.get("href", ""))
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self._in_head = False
+        if self._inline_tag == tag:
+            body = "".join(self._inline_parts).strip()
+            if body:
+                data = " ".join(body.split()).encode('utf-8')
+                self.inline_blocks.append((tag, hashlib.sha1(data).hexdigest(), len(data)))
+            self._inline_tag = None
+
+    def handle_data(self, data):
+        if self._inline_tag:
+            self._inline_parts.append(data)
+
+    def _start_inline(self, tag):
+        self._inline_tag = tag
+        self._inline_parts = []
+
+
+def audit_page(path):
+    """1ページの計測値を返す（プロセスプールから呼ばれるため、モジュールのトップレベルに置く）。"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    parser = _AuditParser()
+    parser.feed(raw.decode('utf-8', errors='replace'))
+    parser.close()
+    seen = set()
+    duplicates = 0
+    for _, digest, _ in parser.inline_blocks:
+        duplicates += digest in seen
+        seen.add(digest)
+    return {
+        "bytes": len(raw),
+        "dom_nodes": parser.dom_nodes,
+        "render_blocking": len(parser.render_blocking),
+        "blocking_resources": parser.render_blocking,
+        "external_hosts": len(parser.external_hosts),
+        "inline_script_bytes": sum(size for kind, _, size in parser.inline_blocks if kind == "script"),
+        "inline_style_bytes": sum(size for kind, _, size in parser.inline_blocks if kind == "style"),
+        "duplicate_inline": duplicates,
+        "inline_blocks": parser.inline_blocks,
+    }
+
+
+def load_budgets(path=BUDGETS_FILE):
+    """予算設定を読み込む。ページ種別 (hub / article / utility) ごとの値は default を上書きする。"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            budgets = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ 予算設定 ({path}) を読み込めません。既定値を使用します: {e}")
+        budgets = {}
+    default = dict(_DEFAULT_BUDGET, **budgets.get("default", {}))
+    return {page_class: dict(default, **budgets.get(page_class, {})) for page_class in ("hub", "article", "utility")}
+
+
+def _violations(row, budget):
+    checks = [
+        ("KB", row["bytes"] / 1024, budget["max_kb"]),
+        ("DOM", row["dom_nodes"], budget["max_dom_nodes"]),
+        ("ブロック", row["render_blocking"], budget["max_render_blocking"]),
+        ("重複インライン", row["duplicate_inline"], budget["max_duplicate_inline"]),
+    ]
+    return [f"{name} {value:.0f}>{limit}" for name, value, limit in checks if value > limit]
+
+
+def hub_of(file_name):
+    """ページの属するハブ（直下のファイルはトップページ）を返す。"""
+    section = file_name.split('/')[0] if '/' in file_name else ""
+    return f"{section}/index.html" if section else "index.html"
+
+
+def audit_site(base_dir="docs", budgets_file=BUDGETS_FILE, max_workers=None):
+    """
+    サイト全体を監査し、{ファイル名: 計測値} を返す。
+    計測値には予算超過の一覧 (violations) と、他のページと同一のインラインブロックのバイト数 (shared_inline_bytes) を含む。
+    """
+    from utils.model_router import classify_page
+    pages = list_site_pages(base_dir, EXCLUDED_DIRS)
+    paths = list(pages.values())
+    if len(paths) >= PARALLEL_MIN_PAGES:
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(audit_page, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    else:
+        results = [audit_page(p) for p in paths]
+    rows = dict(zip(pages, results))
+
+    # 複数ページに同じ内容で埋め込まれているインラインブロックは、外部ファイルにすればキャッシュが効く
+    pages_per_block = {}
+    for row in rows.values():
+        for digest in {digest for _, digest, _ in row["inline_blocks"]}:
+            pages_per_block[digest] = pages_per_block.get(digest, 0) + 1
+
+    budgets = load_budgets(budgets_file)
+    for file_name, row in rows.items():
+        row["shared_inline_bytes"] = sum(size for _, digest, size in row.pop("inline_blocks") if pages_per_block[digest] > 1)
+        row["page_class"] = classify_page(file_name)
+        row["violations"] = _violations(row, budgets[row["page_class"]])
+    return rows
+
+
+def aggregate_by_hub(rows):
+    """ハブ単位の集計 {ハブ: {pages, avg_kb, max_kb, avg_dom_nodes, render_blocking, violations}} を返す。"""
+    hubs = {}
+    for file_name, row in rows.items():
+        hub = hubs.setdefault(hub_of(file_name), {"pages": 0, "bytes": 0, "max_bytes": 0, "dom_nodes": 0,
+                                                  "render_blocking": 0, "violations": 0})
+        hub["pages"] += 1
+        hub["bytes"] += row["bytes"]
+        hub["max_bytes"] = max(hub["max_bytes"], row["bytes"])
+        hub["dom_nodes"] += row["dom_nodes"]
+        hub["render_blocking"] += row["render_blocking"]
+        hub["violations"] += bool(row["violations"])
+    return {
+        hub: {"pages": h["pages"], "avg_kb": h["bytes"] / h["pages"] / 1024, "max_kb": h["max_bytes"] / 1024,
+              "avg_dom_nodes": h["dom_nodes"] / h["pages"], "render_blocking": h["render_blocking"],
+              "violations": h["violations"]}
+        for hub, h in sorted(hubs.items())
+    }
+
+
+def build_audit_report(rows):
+    """ページ単位とハブ単位のMarkdownテーブルを返す。"""
+    lines = ["# ページの重さ・レンダリングブロック監査", "", "## ハブ単位", "",
+             "| ハブ | ページ数 | 平均KB | 最大KB | 平均DOM | ブロック計 | 予算超過ページ |",
+             "| :--- | ---: | ---: | ---: | ---: | ---: | ---: |"]
+    for hub, h in aggregate_by_hub(rows).items():
+        lines.append(f"| {hub} | {h['pages']} | {h['avg_kb']:.1f} | {h['max_kb']:.1f} | {h['avg_dom_nodes']:.0f} "
+                     f"| {h['render_blocking']} | {h['violations']} |")
+    lines += ["", "## ページ単位", "",
+              "| ファイル名 | KB | DOM | ブロック | 外部ホスト | インラインJS | インラインCSS | 重複 | 共通インライン | 予算超過 |",
+              "| :--- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: | :--- |"]
+    for file_name, r in rows.items():
+        lines.append(f"| {file_name} | {r['bytes'] / 1024:.1f} | {r['dom_nodes']} | {r['render_blocking']} "
+                     f"| {r['external_hosts']} | {r['inline_script_bytes']:,} | {r['inline_style_bytes']:,} "
+                     f"| {r['duplicate_inline']} | {r['shared_inline_bytes']:,} | {', '.join(r['violations']) or '-'} |")
+    return "\n".join(lines) + "\n"
+
+
+def run_page_audit(base_dir="docs", report_file=REPORT_FILE, budgets_file=BUDGETS_FILE):
+    """監査を実行してレポートを保存し、(計測値, 予算超過ページ数) を返す。"""
+    print(f"\n--- 📏 ページの重さ・レンダリングブロック監査 ({base_dir}) ---")
+    rows = audit_site(base_dir, budgets_file)
+    os.makedirs(os.path.dirname(report_file) or '.', exist_ok=True)
+    with open(report_file, 'w', encoding='utf-8') as f:
+        f.write(build_audit_report(rows))
+
+    for hub, h in aggregate_by_hub(rows).items():
+        print(f"  - {hub.ljust(24)} {h['pages']:>4} ページ / 平均 {h['avg_kb']:6.1f} KB / 平均DOM {h['avg_dom_nodes']:6.0f} "
+              f"/ ブロック {h['render_blocking']:>4} / 予算超過 {h['violations']} ページ")
+    over = [name for name, row in rows.items() if row["violations"]]
+    for name in over[:10]:
+        print(f"  ⚠️ {name}: {', '.join(rows[name]['violations'])}")
+    if len(over) > 10:
+        print(f"  ... ほか {len(over) - 10} ページ")
+    print(f"✅ {len(rows)} ページを監査しました (予算超過 {len(over)} ページ)。詳細: {report_file}")
+    return rows, len(over)
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+
+from utils.file_utils import list_site_pages
+
+# --- 内容アドレス方式のページストア ---
+# 公開サイト（docs/ や output_website/）に書き込むページを、本文の SHA-256 をキーに重複なく保存する。
+# ストアはサイトごとの reports_dir/page_store に置く（store_dir_for）。複数サイトやベンチマークの実行が互いの履歴や gc の保持数に混ざらない。
+#   objects/<先頭2桁>/<ハッシュ> : zlib 圧縮したページ本文（同じ内容は1回だけ保存される）
+#   runs/<実行ID>.jsonl          : 実行ごとのマニフェスト（サイト・パス・新旧のハッシュ・プロンプトのハッシュ・モデル・書き込み元）
+# 書き込む前にディスク上の内容も保存するため、ストア導入前のページや手動の編集にも戻せる。
+# ロールバックはマニフェストから戻し先のハッシュを引いてオブジェクトを書き戻すだけで、APIは呼ばない。
+# ロールバック自体も1件の書き込みとして記録されるので、ロールバックも取り消せる。
+STORE_DIR = "output_reports/page_store"  # 既定の reports_dir (output_reports) のストア
+KEEP_RUNS = 30  # gc で保持する直近の実行数（これより古いマニフェストと、どこからも参照されないオブジェクトを削除する）
+
+_lock = threading.Lock()
+_run_ids = {}  # ストア -> 現在の実行ID（begin_run で新しい実行を始める）
+_run_seq = 0
+_removed = {}  # この実行で削除したページ (サイト, パス) -> 削除前のハッシュ（作り直したページの previous にする）
+
+
+def store_dir_for(reports_dir):
+    return os.path.join(reports_dir, os.path.basename(STORE_DIR))
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def begin_run(store_dir=STORE_DIR):
+    """
+    store_dir で新しい実行を始め、その実行IDを返す（以降の書き込みはこの実行のマニフェストに記録される）。
+    長時間動くプロセス (site_builder.py) では、ジョブごとに呼んでマニフェストを分ける。
+    """
+    global _run_seq
+    with _lock:
+        _run_seq += 1
+        _run_ids[store_dir] = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{_run_seq}"
+        return _run_ids[store_dir]
+
+
+def current_run_id(store_dir=STORE_DIR):
+    """store_dir の現在の実行ID（begin_run を呼んでいなければ最初の書き込みで決まり、プロセスの間は変わらない）。"""
+    with _lock:
+        if store_dir not in _run_ids:
+            _run_ids[store_dir] = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        return _run_ids[store_dir]
+
+
+def _object_path(store_dir, digest):
+    return os.path.join(store_dir, "objects", digest[:2], digest[2:])
+
+
+def _site_key(base_dir):
+    return os.path.normpath(base_dir).replace(os.path.sep, '/')
+
+
+def _page_path(site, rel_path):
+    return os.path.join(site, *rel_path.split('/'))
+
+
+def _atomic_write(path, data, mode='w'):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def put_object(text, store_dir=STORE_DIR):
+    """本文をオブジェクトとして保存し、ハッシュを返す（同じ内容が既にあれば書き込まない）。"""
+    digest = content_hash(text)
+    path = _object_path(store_dir, digest)
+    if not os.path.exists(path):
+        _atomic_write(path, zlib.compress(text.encode('utf-8')), 'wb')
+    return digest
+
+
+def get_object(digest, store_dir=STORE_DIR):
+    with open(_object_path(store_dir, digest), 'rb') as f:
+        return zlib.decompress(f.read()).decode('utf-8')
+
+
+def _read_page(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _record(store_dir, entry):
+    """現在の実行のマニフェストに1行追記する。"""
+    path = os.path.join(store_dir, "runs", f"{current_run_id(store_dir)}.jsonl")
+    line = json.dumps(dict(entry, time=time.strftime('%Y-%m-%dT%H:%M:%S')), ensure_ascii=False)
+    with _lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+def write_page(base_dir, rel_path, text, model=None, prompt_hash=None, source="generate", store_dir=STORE_DIR):
+    """
+    ページを base_dir/rel_path に書き込み、新旧の本文をストアに保存してマニフェストに記録する。
+    内容が変わらない場合は何もせず False を返す。
+    """
+    site, rel_path = _site_key(base_dir), rel_path.replace(os.path.sep, '/')
+    path = _page_path(site, rel_path)
+    old_text = _read_page(path)
+    if old_text == text:
+        return False
+    if old_text is not None:
+        previous = put_object(old_text, store_dir)
+    else:
+        with _lock:
+            previous = _removed.pop((site, rel_path), None)
+    digest = put_object(text, store_dir)
+    _atomic_write(path, text)
+    _record(store_dir, {"site": site, "path": rel_path, "hash": digest, "previous": previous,
+                        "model": model, "prompt_hash": prompt_hash, "source": source})
+    return True
+
+
+def remove_page(base_dir, rel_path, source="remove", store_dir=STORE_DIR):
+    """ページを削除する（削除前の本文は保存され、ロールバックで戻せる）。削除したら True。"""
+    site, rel_path = _site_key(base_dir), rel_path.replace(os.path.sep, '/')
+    path = _page_path(site, rel_path)
+    old_text = _read_page(path)
+    if old_text is None:
+        return False
+    previous = put_object(old_text, store_dir)
+    os.remove(path)
+    with _lock:
+        _removed[(site, rel_path)] = previous
+    _record(store_dir, {"site": site, "path": rel_path, "hash": None, "previous": previous,
+                        "model": None, "prompt_hash": None, "source": source})
+    return True
+
+
+def capture_site(base_dir, source="remove", store_dir=STORE_DIR):
+    """ディレクトリごと削除する前に、全ページを削除として記録する（初回構築の作り直しなど）。記録した件数を返す。"""
+    return sum(remove_page(base_dir, rel_path, source, store_dir) for rel_path in list_site_pages(base_dir))
+
+
+def list_runs(store_dir=STORE_DIR):
+    """実行IDを古い順に返す。"""
+    runs_dir = os.path.join(store_dir, "runs")
+    if not os.path.isdir(runs_dir):
+        return []
+    return sorted(name[:-len(".jsonl")] for name in os.listdir(runs_dir) if name.endswith(".jsonl"))
+
+
+def load_manifest(run_id, store_dir=STORE_DIR):
+    path = os.path.join(store_dir, "runs", f"{run_id}.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [dict(json.loads(line), run=run_id) for line in f if line.strip()]
+
+
+def page_history(base_dir, rel_path, store_dir=STORE_DIR):
+    """ページの書き込み記録を古い順に返す。"""
+    site, rel_path = _site_key(base_dir), rel_path.replace(os.path.sep, '/')
+    return [e for run_id in list_runs(store_dir) for e in load_manifest(run_id, store_dir)
+            if e["site"] == site and e["path"] == rel_path]
+
+
+def _checkout(site, rel_path, digest, source, store_dir):
+    """ページをストアのバージョン（None なら削除）に切り替える。"""
+    if digest is None:
+        remove_page(site, rel_path, source, store_dir)
+    else:
+        write_page(site, rel_path, get_object(digest, store_dir), source=source, store_dir=store_dir)
+
+
+def rollback_page(base_dir, rel_path, store_dir=STORE_DIR):
+    """
+    ページを1つ前のバージョンに戻す。続けて呼ぶと、さらに前のバージョンに戻る
+    （戻し先は、現在の本文を書き込んだロールバック以外の記録の previous）。
+    """
+    site, rel_path = _site_key(base_dir), rel_path.replace(os.path.sep, '/')
+    current_text = _read_page(_page_path(site, rel_path))
+    current = content_hash(current_text) if current_text is not None else None
+    history = page_history(site, rel_path, store_dir)
+    for entry in reversed(history):
+        if entry["source"] != "rollback" and entry["hash"] == current:
+            _checkout(site, rel_path, entry["previous"], "rollback", store_dir)
+            target = entry["previous"][:12] if entry["previous"] else "削除"
+            return f"✅ {rel_path} を {entry['run']} より前のバージョン ({target}) に戻しました。"
+    if any(entry["previous"] == current for entry in history):
+        return f"ℹ️ {rel_path} は記録上最も古いバージョンです（これより前には戻せません）。"
+    return f"❌ {rel_path} の現在の内容はストアの記録にありません（戻し先が分かりません）。"
+
+
+def rollback_section(base_dir, section, store_dir=STORE_DIR):
+    """セクション（base_dir からの相対ディレクトリ）配下の、記録のある全ページを1つ前のバージョンに戻す。"""
+    site = _site_key(base_dir)
+    prefix = section.strip('/').replace(os.path.sep, '/') + '/'
+    paths = sorted({e["path"] for run_id in list_runs(store_dir) for e in load_manifest(run_id, store_dir)
+                    if e["site"] == site and e["path"].startswith(prefix)})
+    return {path: rollback_page(site, path, store_dir) for path in paths}
+
+
+def rollback_run(run_id, store_dir=STORE_DIR, force=False):
+    """
+    実行が書き込んだ全ページを、その実行の前の状態（実行で新規作成されたページは削除）に戻す。
+    その実行の後に別の実行や手動の編集で変わったページは、後の変更を消さないよう戻さずに ⚠️ で報告する
+    （force=True なら後の変更ごと戻す）。
+    """
+    before, after = {}, {}
+    for entry in load_manifest(run_id, store_dir):
+        key = (entry["site"], entry["path"])
+        before.setdefault(key, entry["previous"])
+        after[key] = entry["hash"]
+    if not before:
+        return {run_id: f"❌ 実行 {run_id} のマニフェストが見つかりません。"}
+    results = {}
+    for (site, rel_path), digest in sorted(before.items()):
+        current_text = _read_page(_page_path(site, rel_path))
+        current = content_hash(current_text) if current_text is not None else None
+        if current == digest:
+            results[f"{site}/{rel_path}"] = "ℹ️ 既にこの実行の前の状態です"
+            continue
+        if current != after[(site, rel_path)] and not force:
+            results[f"{site}/{rel_path}"] = "⚠️ この実行の後に変更されているため戻しません（--force で後の変更ごと戻す）"
+            continue
+        _checkout(site, rel_path, digest, "rollback", store_dir)
+        results[f"{site}/{rel_path}"] = f"✅ {digest[:12] if digest else '削除'}"
+    return results
+
+
+def gc(keep_runs=KEEP_RUNS, store_dir=STORE_DIR):
+    """
+    直近 keep_runs 件より古いマニフェストを削除し、残りのマニフェストにも現在の公開ページにも
+    参照されないオブジェクトを削除する。(削除した実行数, 削除したオブジェクト数, 解放したバイト数) を返す。
+    """
+    runs = list_runs(store_dir)
+    expired = runs[:-keep_runs] if keep_runs > 0 else runs
+    for run_id in expired:
+        os.remove(os.path.join(store_dir, "runs", f"{run_id}.jsonl"))
+
+    referenced, sites = set(), set()
+    for run_id in runs[len(expired):]:
+        for entry in load_manifest(run_id, store_dir):
+            referenced.update(h for h in (entry["hash"], entry["previous"]) if h)
+            sites.add(entry["site"])
+    for site in sites:
+        if os.path.isdir(site):
+            for path in list_site_pages(site).values():
+                referenced.add(content_hash(_read_page(path)))
+
+    removed, freed = 0, 0
+    objects_dir = os.path.join(store_dir, "objects")
+    for root, _, files in os.walk(objects_dir):
+        for name in files:
+            if os.path.basename(root) + name not in referenced:
+                path = os.path.join(root, name)
+                freed += os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+    return len(expired), removed, freed
+
+
+def print_page_log(base_dir=None, rel_path=None, store_dir=STORE_DIR, limit=20):
+    """直近の実行（rel_path を渡すとそのページの履歴）を表示する。"""
+    if rel_path:
+        entries = page_history(base_dir, rel_path, store_dir)[-limit:]
+        print(f"--- 🗃️ {rel_path} の履歴 ({_site_key(base_dir)}) ---")
+        for e in entries:
+            print(f"  {e['run']}  {(e['hash'] or '(削除)')[:12]} ← {(e['previous'] or '(新規)')[:12]}  "
+                  f"{e['source']:<12} {e.get('model') or '-'}  prompt={e.get('prompt_hash') or '-'}")
+        return
+    print(f"--- 🗃️ ページストアの実行 ({store_dir}) ---")
+    for run_id in list_runs(store_dir)[-limit:]:
+        entries = load_manifest(run_id, store_dir)
+        if base_dir:
+            entries = [e for e in entries if e["site"] == _site_key(base_dir)]
+        sources = sorted({e["source"] for e in entries})
+        sites = sorted({e["site"] for e in entries})
+        print(f"  {run_id}  {len(entries):>4} 件  {', '.join(sources)}  ({', '.join(sites)})")
@@ -0,0 +1,263 @@
+import os
+import re
+import json
+import unicodedata
+
+from utils.build_graph import hash_file
+from utils.file_utils import write_text_if_changed, list_site_pages, page_url, DERIVED_SITE_DIRS
+
+# --- サイト内検索インデックス (静的サイト向けの転置インデックス) ---
+# 公開サイト (docs/) の各ページから本文を抽出し、語 → [文書ID, 重み, ...] の転置インデックスを
+# 語のハッシュでシャードに分割して docs/search/ に書き出す。ブラウザはクエリに含まれる語のシャードだけを取得する。
+#   docs/search/docs.json         : シャード数と文書一覧 [URL, タイトル, 抜粋]
+#   docs/search/shard-XX.json     : {語: [文書ID, 重み, 文書ID, 重み, ...]}
+#   docs/search/search.js         : ローダー（トークナイズとシャードの取得・スコアリング）
+# 日本語は分かち書きせず、連続するかな・漢字を文字2-gram に分割する（クエリ側も同じ分割で AND 検索する）。
+SEARCH_SUBDIR = "search"
+STATE_FILE = "output_reports/.search_index_state.json"
+TERMS_PER_SHARD = 2000     # 1シャードあたりの語数の目安（シャード数は2の冪に丸める）
+MAX_SHARDS = 256
+TITLE_WEIGHT = 10          # タイトル・見出しに含まれる語は本文より重く数える
+HEADING_WEIGHT = 3
+MAX_TERM_LENGTH = 32
+EXCERPT_CHARS = 120
+
+_CJK_RUN_PATTERN = re.compile("[\u3005\u3041-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """
+    テキストを検索語のリストにする。NFKC 正規化と小文字化の後、
+    かな・漢字の連続は文字2-gram（1文字だけの場合はその1文字）、英数字は単語単位に分割する。
+    search.js の tokenize と同じ規則でなければならない。
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    terms = []
+    for run in _CJK_RUN_PATTERN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _WORD_PATTERN.findall(text):
+        if len(word) >= 2:
+            terms.append(word[:MAX_TERM_LENGTH])
+    return terms
+
+
+def shard_of(term, shard_count):
+    """語のシャード番号。UTF-16 のコード単位に対する FNV-1a (32bit) で、search.js と同じ計算をする。"""
+    h = 0x811c9dc5
+    data = term.encode('utf-16-le')
+    for i in range(0, len(data), 2):
+        h ^= data[i] | (data[i + 1] << 8)
+        h = (h * 0x01000193) & 0xffffffff
+    return h % shard_count
+
+
+def _weighted_terms(extracted):
+    """抽出結果から {語: 重み} を作る。"""
+    weights = {}
+    for term in tokenize(extracted["page_title"]):
+        weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+    for _, heading in extracted["headings"]:
+        for term in tokenize(heading):
+            weights[term] = weights.get(term, 0) + HEADING_WEIGHT
+    for term in tokenize(extracted["text"]):
+        weights[term] = weights.get(term, 0) + 1
+    return weights
+
+
+def _index_page(file_path, fallback_title):
+    from agents.agent_04_improvement import extract_article_text
+    with open(file_path, 'r', encoding='utf-8') as f:
+        extracted = extract_article_text(f.read(), fallback_title)
+    return {
+        "title": extracted["page_title"],
+        "excerpt": extracted["text"][:EXCERPT_CHARS].replace('\n', ' ').strip(),
+        "terms": _weighted_terms(extracted),
+    }
+
+
+def _load_state(state_file):
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ 検索インデックスの状態ファイル ({state_file}) を読み込めません。全ページを再解析します: {e}")
+        return {}
+
+
+def _shard_count(term_count):
+    count = 1
+    while count * TERMS_PER_SHARD < term_count and count < MAX_SHARDS:
+        count *= 2
+    return count
+
+
+def build_search_index(base_dir="docs", state_file=STATE_FILE):
+    """
+    公開サイトの検索インデックスを更新する。ファイル内容のハッシュが前回と同じページは解析をスキップし、
+    前回の語の集計を再利用する。書き換えたシャード数を返す。
+    """
+    print(f"\n--- 🔎 検索インデックスの更新 ({base_dir}) ---")
+    previous = _load_state(state_file).get("pages", {})
+    pages = {}
+    parsed = 0
+    for rel_path, path in list_site_pages(base_dir, DERIVED_SITE_DIRS).items():
+        content_hash = hash_file(path)
+        cached = previous.get(rel_path)
+        if cached and cached.get("hash") == content_hash:
+            pages[rel_path] = cached
+            continue
+        try:
+            pages[rel_path] = dict(_index_page(path, os.path.basename(path)), hash=content_hash)
+            parsed += 1
+        except Exception as e:
+            print(f"⚠️ {rel_path} を解析できません: {e}")
+    removed = len(set(previous) - set(pages))
+
+    # 文書IDは相対パス順の連番。語ごとの転置リストを作り、シャードに振り分ける
+    postings = {}
+    for doc_id, entry in enumerate(pages.values()):
+        for term, weight in entry["terms"].items():
+            postings.setdefault(term, []).extend((doc_id, weight))
+    shard_count = _shard_count(len(postings))
+    shards = [{} for _ in range(shard_count)]
+    for term in sorted(postings):
+        shards[shard_of(term, shard_count)][term] = postings[term]
+
+    out_dir = os.path.join(base_dir, SEARCH_SUBDIR)
+    os.makedirs(out_dir, exist_ok=True)
+    docs = {"shards": shard_count,
+            "docs": [[page_url(rel), e["title"], e["excerpt"]] for rel, e in pages.items()]}
+    write_text_if_changed(os.path.join(out_dir, "docs.json"), json.dumps(docs, ensure_ascii=False, separators=(',', ':')))
+    write_text_if_changed(os.path.join(out_dir, "search.js"), SEARCH_LOADER_JS)
+    written = 0
+    for i, shard in enumerate(shards):
+        written += write_text_if_changed(os.path.join(out_dir, f"shard-{i:02x}.json"),
+                                     json.dumps(shard, ensure_ascii=False, separators=(',', ':')))
+    # シャード数が減った場合に残る古いシャードを削除する
+    for name in os.listdir(out_dir):
+        if name.startswith("shard-") and name.endswith(".json") and int(name[6:-5], 16) >= shard_count:
+            os.remove(os.path.join(out_dir, name))
+
+    os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump({"pages": pages}, f, ensure_ascii=False)
+    print(f"✅ {len(pages)} ページ / {len(postings):,} 語 / {shard_count} シャード "
+          f"(再解析 {parsed} 件, 削除 {removed} 件, 書き換えたシャード {written} 件)")
+    return written
+
+
+# ブラウザ側のローダー。<script src=".../search/search.js" defer></script> で読み込み、
+# <input data-site-search data-results="結果を表示する要素のid"> を置くと検索ボックスになる。
+# スクリプトからは SiteSearch.search(query, limit) で [{url, title, excerpt, score}] を得られる。
+SEARCH_LOADER_JS = r"""(function () {
+  "use strict";
+  var script = document.currentScript;
+  var base = script ? script.src.replace(/search\/search\.js(\?.*)?$/, "") : "/";
+  var cjkRun = /[\u3005\u3041-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+/g;
+  var wordRun = /[a-z0-9]+/g;
+  var meta = null;
+  var shards = {};
+
+  function tokenize(text) {
+    text = (text || "").normalize("NFKC").toLowerCase();
+    var terms = [], m, i;
+    while ((m = cjkRun.exec(text)) !== null) {
+      var run = m[0];
+      if (run.length === 1) { terms.push(run); }
+      for (i = 0; i < run.length - 1; i++) { terms.push(run.substr(i, 2)); }
+    }
+    while ((m = wordRun.exec(text)) !== null) {
+      if (m[0].length >= 2) { terms.push(m[0].substr(0, 32)); }
+    }
+    return terms.filter(function (t, idx) { return terms.indexOf(t) === idx; });
+  }
+
+  function shardOf(term, count) {
+    var h = 0x811c9dc5;
+    for (var i = 0; i < term.length; i++) {
+      h ^= term.charCodeAt(i);
+      h = Math.imul(h, 0x01000193) >>> 0;
+    }
+    return h % count;
+  }
+
+  function fetchJson(path) {
+    return fetch(base + "search/" + path).then(function (r) { return r.json(); });
+  }
+
+  function loadShard(id) {
+    if (!shards[id]) {
+      var name = "shard-" + (id < 16 ? "0" : "") + id.toString(16) + ".json";
+      shards[id] = fetchJson(name);
+    }
+    return shards[id];
+  }
+
+  function search(query, limit) {
+    var terms = tokenize(query);
+    if (!terms.length) { return Promise.resolve([]); }
+    return (meta || (meta = fetchJson("docs.json"))).then(function (index) {
+      var ids = [];
+      terms.forEach(function (t) {
+        var id = shardOf(t, index.shards);
+        if (ids.indexOf(id) < 0) { ids.push(id); }
+      });
+      return Promise.all(ids.map(loadShard)).then(function (loaded) {
+        var byShard = {};
+        ids.forEach(function (id, i) { byShard[id] = loaded[i]; });
+        var scores = null;
+        terms.forEach(function (t) {
+          var list = byShard[shardOf(t, index.shards)][t] || [];
+          var next = {};
+          for (var i = 0; i < list.length; i += 2) {
+            if (scores === null || scores[list[i]] !== undefined) {
+              next[list[i]] = (scores === null ? 0 : scores[list[i]]) + list[i + 1];
+            }
+          }
+          scores = next;
+        });
+        return Object.keys(scores).map(function (id) {
+          var doc = index.docs[id];
+          return { url: base + doc[0], title: doc[1], excerpt: doc[2], score: scores[id] };
+        }).sort(function (a, b) { return b.score - a.score; }).slice(0, limit || 10);
+      });
+    });
+  }
+
+  function bind(input) {
+    var target = document.getElementById(input.getAttribute("data-results"));
+    var timer = null;
+    input.addEventListener("input", function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        search(input.value).then(function (results) {
+          if (!target) { return; }
+          target.innerHTML = "";
+          results.forEach(function (r) {
+            var item = document.createElement("li");
+            var link = document.createElement("a");
+            link.href = r.url;
+            link.textContent = r.title;
+            var excerpt = document.createElement("p");
+            excerpt.textContent = r.excerpt;
+            item.appendChild(link);
+            item.appendChild(excerpt);
+            target.appendChild(item);
+          });
+        });
+      }, 200);
+    });
+  }
+
+  window.SiteSearch = { search: search, tokenize: tokenize };
+  document.addEventListener("DOMContentLoaded", function () {
+    Array.prototype.forEach.call(document.querySelectorAll("input[data-site-search]"), bind);
+  });
+})();
+"""
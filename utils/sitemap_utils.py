@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import hashlib
+import datetime
+from xml.sax.saxutils import escape
+
+from utils.file_utils import write_text_if_changed, list_site_pages, page_url
+
+# --- sitemap.xml / robots.txt の生成 ---
+# lastmod は「本文 (<main>) の内容が前回から変わった日」。タグの挿入やナビゲーションの差し替えだけでは更新しない。
+# ページごとの本文ハッシュと lastmod は状態ファイルに記録し、実行のたびに差分だけを反映する。
+# URL数が上限を超える場合は sitemap-N.xml に分割し、sitemap.xml をサイトマップインデックスにする。
+BASE_URL = "https://LOU-Ark.github.io/hp-generation-agent/"
+STATE_FILE = "output_reports/.sitemap_state.json"
+MAX_URLS_PER_SITEMAP = 50000  # プロトコル上の1ファイルあたりの上限
+EXCLUDED_DIRS = ("search",)
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+_MAIN_PATTERN = re.compile(r"<main\b.*?</main>", re.IGNORECASE | re.DOTALL)
+_BODY_PATTERN = re.compile(r"<body\b.*?</body>", re.IGNORECASE | re.DOTALL)
+_SCRIPT_PATTERN = re.compile(r"<(script|style)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+_NOINDEX_PATTERN = re.compile(r"<meta[^>]+name=[\"']robots[\"'][^>]+noindex", re.IGNORECASE)
+_SPACE_PATTERN = re.compile(r"\s+")
+_LASTMOD_ENTRY_PATTERN = re.compile(r"<loc>(.*?)</loc>\s*<lastmod>(.*?)</lastmod>", re.DOTALL)
+
+
+def content_hash(html):
+    """本文 (<main>、無ければ <body>) の script/style を除いた部分を空白を正規化してハッシュする。"""
+    match = _MAIN_PATTERN.search(html) or _BODY_PATTERN.search(html)
+    body = _SCRIPT_PATTERN.sub("", match.group(0) if match else html)
+    return hashlib.sha256(_SPACE_PATTERN.sub(" ", body).strip().encode('utf-8')).hexdigest()
+
+
+def _load_state(state_file):
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ サイトマップの状態ファイル ({state_file}) を読み込めません: {e}")
+        return {}
+
+
+def _existing_lastmods(base_dir):
+    """状態ファイルが無い初回用に、既存の sitemap.xml（分割済みならその全ファイル）の lastmod を読み込む。"""
+    lastmods = {}
+    for name in os.listdir(base_dir) if os.path.isdir(base_dir) else []:
+        if name.startswith("sitemap") and name.endswith(".xml"):
+            with open(os.path.join(base_dir, name), 'r', encoding='utf-8') as f:
+                for loc, lastmod in _LASTMOD_ENTRY_PATTERN.findall(f.read()):
+                    lastmods[loc.strip()] = lastmod.strip()
+    return lastmods
+
+
+def _urlset(entries):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<urlset xmlns="{SITEMAP_NS}">']
+    for loc, lastmod in entries:
+        lines += ["  <url>", f"    <loc>{escape(loc)}</loc>", f"    <lastmod>{lastmod}</lastmod>", "  </url>"]
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def _sitemap_index(shards, base_url):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<sitemapindex xmlns="{SITEMAP_NS}">']
+    for name, lastmod in shards:
+        lines += ["  <sitemap>", f"    <loc>{escape(base_url + name)}</loc>", f"    <lastmod>{lastmod}</lastmod>", "  </sitemap>"]
+    lines.append("</sitemapindex>")
+    return "\n".join(lines) + "\n"
+
+
+def build_robots_txt(base_url=BASE_URL):
+    return (
+        "# すべてのクローラー (*) に対して\n"
+        "User-agent: *\n"
+        "# サイト全体 (/) のクロールを許可\n"
+        "Allow: /\n"
+        "\n"
+        "# サイトマップの場所を通知\n"
+        f"Sitemap: {base_url}sitemap.xml\n"
+    )
+
+
+def update_sitemap(base_dir="docs", state_file=STATE_FILE, base_url=BASE_URL, today=None):
+    """
+    公開サイトのページを走査し、本文が変わったページの lastmod を today に更新して
+    sitemap.xml（必要なら分割とインデックス）と robots.txt を書き出す。内容が変わらないファイルは書き換えない。
+    (URL数, lastmod を更新したページ数) を返す。
+    """
+    today = today or datetime.date.today().isoformat()
+    print(f"\n--- 🗺️ サイトマップの更新 ({base_dir}) ---")
+    state = _load_state(state_file)
+    seed = _existing_lastmods(base_dir) if not state else {}
+
+    pages = {}
+    changed = 0
+    for rel_path, path in list_site_pages(base_dir, EXCLUDED_DIRS).items():
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        if _NOINDEX_PATTERN.search(html):
+            continue
+        digest = content_hash(html)
+        previous = state.get(rel_path)
+        if previous and previous["hash"] == digest:
+            pages[rel_path] = previous
+            continue
+        # 状態が無い初回は、既存の sitemap.xml の lastmod を引き継ぐ
+        lastmod = seed.get(base_url + page_url(rel_path)) if previous is None else None
+        pages[rel_path] = {"hash": digest, "lastmod": lastmod or today}
+        changed += lastmod is None
+    removed = len(set(state) - set(pages))
+
+    entries = [(base_url + page_url(rel), entry["lastmod"]) for rel, entry in pages.items()]
+    old_shards = {n for n in os.listdir(base_dir) if re.fullmatch(r"sitemap-\d+\.xml", n)}
+    if len(entries) <= MAX_URLS_PER_SITEMAP:
+        write_text_if_changed(os.path.join(base_dir, "sitemap.xml"), _urlset(entries))
+        new_shards = set()
+    else:
+        shards = []
+        for i in range(0, len(entries), MAX_URLS_PER_SITEMAP):
+            chunk = entries[i:i + MAX_URLS_PER_SITEMAP]
+            name = f"sitemap-{i // MAX_URLS_PER_SITEMAP + 1}.xml"
+            write_text_if_changed(os.path.join(base_dir, name), _urlset(chunk))
+            shards.append((name, max(lastmod for _, lastmod in chunk)))
+        write_text_if_changed(os.path.join(base_dir, "sitemap.xml"), _sitemap_index(shards, base_url))
+        new_shards = {name for name, _ in shards}
+    for name in old_shards - new_shards:
+        os.remove(os.path.join(base_dir, name))
+    write_text_if_changed(os.path.join(base_dir, "robots.txt"), build_robots_txt(base_url))
+
+    os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(pages, f, ensure_ascii=False, indent=2, sort_keys=True)
+    layout = f"{len(new_shards)} ファイルに分割" if new_shards else "1 ファイル"
+    print(f"✅ {len(entries)} URL ({layout}) / lastmod 更新 {changed} 件 / 削除 {removed} 件")
+    return len(entries), changed
@@ -0,0 +1,33 @@
+import re
+
+# --- トークン数の見積もり ---
+# API を呼ばずにプロンプトの大きさを見積もるための簡易ヒューリスティック。
+# Gemini のトークナイザーでは、日本語（かな・漢字）はおおむね1文字 ≒ 0.7〜1トークン、
+# 英数字・記号はおおむね4文字 ≒ 1トークンになる。
+CJK_TOKENS_PER_CHAR = 0.8
+ASCII_CHARS_PER_TOKEN = 4.0
+_CJK_PATTERN = re.compile("[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef\uac00-\ud7af]")
+_SPACE_RUN_PATTERN = re.compile(r"[ \t]{2,}")
+
+
+def estimate_tokens(text):
+    """テキストのトークン数をローカルで見積もる（日本語と英数字で文字あたりのトークン数を変える）。"""
+    if not text:
+        return 0
+    text = _SPACE_RUN_PATTERN.sub(" ", text) # インデントの連続した空白はほぼ1トークンにまとまる
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return int(cjk * CJK_TOKENS_PER_CHAR + other / ASCII_CHARS_PER_TOKEN) + 1
+
+
+def count_tokens(client, model, text):
+    """
+    client.models.count_tokens で正確なトークン数を数える。
+    クライアントが無い、または呼び出しに失敗した場合はローカルの見積もりを返す。
+    """
+    if client is not None:
+        try:
+            return client.models.count_tokens(model=model, contents=text).total_tokens
+        except Exception as e:
+            print(f"⚠️ count_tokens に失敗したため、ローカルの見積もりを使用します: {e}")
+    return estimate_tokens(text)
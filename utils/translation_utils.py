@@ -0,0 +1,121 @@
+import os
+import re
+import json
+import threading
+
+from utils.token_utils import estimate_tokens
+
+# --- 構造を保ったままの翻訳 ---
+# ページのHTMLを再生成せず、翻訳が必要なテキストノードと属性だけを抽出して翻訳し、元のDOMに書き戻す。
+# 訳文は翻訳メモリ (原文 → 訳文) に保存し、同じ原文（共通のナビゲーション・フッターなど）は二度と送らない。
+MEMORY_FILE_TEMPLATE = "output_reports/translation_memory.{lang}.json"
+TARGET_LANGUAGE_NAMES = {"en": "English", "zh": "Simplified Chinese", "ko": "Korean"}  # 翻訳先の言語（docs/<lang>/ に出力する）
+BATCH_TOKEN_BUDGET = 2500  # 1回の呼び出しに詰める原文のトークン数の目安（訳文も同程度の出力になる）
+BATCH_MAX_STRINGS = 200
+TRANSLATABLE_ATTRS = ("alt", "title", "placeholder", "aria-label")
+TRANSLATABLE_META = ("description", "og:title", "og:description", "twitter:title", "twitter:description")
+SKIP_TAGS = {"script", "style", "noscript", "code", "pre", "template", "svg"}
+_NEEDS_TRANSLATION_PATTERN = re.compile("[\u3005\u3041-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff66-\uff9f]")
+_EDGE_SPACE_PATTERN = re.compile(r"^(\s*)(.*?)(\s*)$", re.DOTALL)
+
+
+class _Slot:
+    """DOM上の翻訳対象1か所（テキストノード、または要素の属性）。前後の空白は翻訳せずに保持する。"""
+
+    def __init__(self, node, attr, value):
+        self.node = node
+        self.attr = attr
+        self.lead, self.source, self.trail = _EDGE_SPACE_PATTERN.match(value).groups()
+
+    def apply(self, translation):
+        text = f"{self.lead}{translation}{self.trail}"
+        if self.attr:
+            self.node[self.attr] = text
+        else:
+            self.node.replace_with(text)
+
+
+def needs_translation(text):
+    return bool(text) and bool(_NEEDS_TRANSLATION_PATTERN.search(text))
+
+
+def extract_slots(soup):
+    """翻訳対象のテキストノードと属性を文書順に返す（日本語を含まないもの、script/style などの中身は除く）。"""
+    from bs4 import NavigableString
+    slots = []
+    for node in soup.find_all(string=True):
+        if type(node) is not NavigableString or not needs_translation(node):
+            continue  # コメント・DOCTYPE・script/style の中身は NavigableString のサブクラスになる
+        if any(parent.name in SKIP_TAGS for parent in node.parents):
+            continue
+        slots.append(_Slot(node, None, str(node)))
+    for tag in soup.find_all(True):
+        for attr in TRANSLATABLE_ATTRS:
+            if isinstance(tag.get(attr), str) and needs_translation(tag[attr]):
+                slots.append(_Slot(tag, attr, tag[attr]))
+        if tag.name == "meta" and (tag.get("name") or tag.get("property")) in TRANSLATABLE_META:
+            if needs_translation(tag.get("content")):
+                slots.append(_Slot(tag, "content", tag["content"]))
+    return slots
+
+
+def localize_document(soup, slots, memory, target_lang):
+    """翻訳メモリにある訳文を書き戻し、<html lang> を変更する。訳文が無く原文のまま残った数を返す。"""
+    missing = 0
+    for slot in slots:
+        translation = memory.get(slot.source)
+        if translation is None:
+            missing += 1
+        else:
+            slot.apply(translation)
+    if soup.html is not None:
+        soup.html["lang"] = target_lang
+    return missing
+
+
+def pack_batches(strings, token_budget=BATCH_TOKEN_BUDGET, max_strings=BATCH_MAX_STRINGS):
+    """文字列を、原文のトークン数の合計が予算内に収まるバッチに詰める（予算を超える1件は単独のバッチにする）。"""
+    batches, current, current_tokens = [], [], 0
+    for text in strings:
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_strings):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class TranslationMemory:
+    """原文 → 訳文の辞書。追加のたびにファイルへ保存し、中断しても翻訳済みの分は失われない。"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ 翻訳メモリ ({path}) を読み込めません。空の状態から始めます: {e}")
+
+    def get(self, source):
+        return self.entries.get(source)
+
+    def __contains__(self, source):
+        return source in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self, translations):
+        with self._lock:
+            self.entries.update(translations)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)